@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# ⏱️ Benchmark des backends de lecture JSON lines (orjson, pyarrow.json, pandas) sur des logs API synthétiques
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+# 📁 Ajout du chemin racine pour import des modules
+PIPELINE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PIPELINE_ROOT)
+
+from transformations.data_reader import available_json_backends, iter_json_chunks, load_column_types
+from benchmarks.generators import generate_api_logs
+
+
+def run_backend(path: str, backend: str, chunksize: int, column_types) -> dict:
+    start = time.perf_counter()
+    rows = 0
+    for chunk in iter_json_chunks(path, chunksize, column_types=column_types, backend=backend):
+        rows += len(chunk)
+        memory = int(chunk.memory_usage(deep=True).sum())
+    seconds = time.perf_counter() - start
+    return {
+        "backend": backend,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": int(rows / seconds) if seconds else None,
+        "last_chunk_bytes": memory,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare les backends de lecture JSON lines (lignes/s)")
+    parser.add_argument('--rows', type=int, default=500_000, help="Nombre de logs générés")
+    parser.add_argument('--chunksize', type=int, default=100_000, help="Taille des chunks")
+    parser.add_argument('--seed', type=int, default=42, help="Graine du générateur")
+    parser.add_argument('--backends', nargs="*", default=None, help="Backends à comparer (défaut : tous ceux installés)")
+    parser.add_argument('--output', default=None, help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    backends = args.backends or available_json_backends()
+    column_types = load_column_types("logs")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "api_logs_bench.json")
+        print(f"🧪 Génération de {args.rows:,} logs (seed={args.seed})")
+        generate_api_logs(path, args.rows, args.seed)
+        size_mb = os.path.getsize(path) / 1e6
+
+        results = []
+        for backend in backends:
+            result = run_backend(path, backend, args.chunksize, column_types)
+            result["file_mb"] = round(size_mb, 1)
+            results.append(result)
+            print(f"   {backend:<8} {result['seconds']:>8.2f}s  {result['rows_per_sec']:>12,} lignes/s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"rows": args.rows, "chunksize": args.chunksize, "results": results}, f, indent=4)
+        print(f"📝 Résultats : {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
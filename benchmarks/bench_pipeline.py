@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# ⏱️ Benchmark de bout en bout : validation, processeurs et jointure sur des données synthétiques
+#
+# Pour chaque échelle (--rows), les sources sont générées (benchmarks/generators.py) dans un dossier
+# data/ isolé (PIPELINE_DATA_DIR), puis chaque étape est lancée comme en production (un processus par script) :
+#   data_validator.py (par source) → processeurs (api_logs, sessions, users, products) → data_joiner.py
+# Mesures par étape : temps, lignes/s, pic RSS du processus, taille des sorties ; détail par sous-étape
+# issu de monitoring/instrumentation.py. Résultats en JSON, comparables à une référence (--baseline).
+#
+# Usage : python benchmarks/bench_pipeline.py --rows 10000 1000000 [--baseline benchmarks/results/ref.json]
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+from typing import List, Optional
+
+import pandas as pd
+
+# 📁 Ajout du chemin racine pour import des modules
+PIPELINE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PIPELINE_ROOT)
+
+from transformations.data_storage import load_pipeline_config
+from monitoring.instrumentation import summarize
+from benchmarks.generators import FILE_NAMES, source_sizes
+
+RESULTS_DIR = os.path.join(PIPELINE_ROOT, "benchmarks", "results")
+
+PROCESSORS = {
+    "logs": "processing/api_log_processor.py",
+    "sessions": "processing/session_processor.py",
+    "users": "processing/business_processor.py",
+    "products": "processing/product_processor.py",
+}
+
+# Dossiers de data/ qui ne sont pas des sorties du pipeline
+NOT_OUTPUT = ("staging",)
+
+
+def dir_size(path: str, exclude=()) -> int:
+    total = 0
+    for root, dirs, files in os.walk(path):
+        if root == path:
+            dirs[:] = [d for d in dirs if d not in exclude]
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def run_step(name: str, args: List[str], env: dict, data_dir: str, log_path: str, rows: int) -> dict:
+    """
+    Lance un script du pipeline et mesure : temps réel, pic RSS (wait4, processus et enfants attendus),
+    taille ajoutée sous data/ (hors staging), code retour. La sortie du script va dans log_path.
+    """
+    before = dir_size(data_dir, NOT_OUTPUT)
+    with open(log_path, "a", encoding="utf-8") as log:
+        log.write(f"\n===== {name} : {' '.join(args)}\n")
+        log.flush()
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, *args], cwd=PIPELINE_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+        seconds = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        "step": name,
+        "returncode": proc.returncode,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": int(rows / seconds) if seconds else None,
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+        "output_bytes": dir_size(data_dir, NOT_OUTPUT) - before,
+    }
+
+
+def step_failed(step: dict) -> bool:
+    """Le validateur sort en 1 si la qualité est insuffisante : seul un crash est une erreur."""
+    if step["step"].startswith("validate/"):
+        return step["returncode"] not in (0, 1)
+    return step["returncode"] != 0
+
+
+def load_stage_records(logs_dir: str, run_id: str) -> list:
+    path = os.path.join(logs_dir, f"metrics_{run_id}.jsonl")
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run_scale(rows: int, workdir: str, chunksize: int, seed: int, sources: List[str], join: bool) -> dict:
+    """Génère une échelle puis exécute validation, processeurs et jointure dans workdir."""
+    data_dir = os.path.join(workdir, "data")
+    logs_dir = os.path.join(workdir, "logs")
+    os.makedirs(logs_dir, exist_ok=True)
+    run_id = f"bench_{rows}_{datetime.now():%Y%m%d_%H%M%S}"
+    env = {**os.environ, "PIPELINE_DATA_DIR": data_dir, "PIPELINE_LOGS_DIR": logs_dir, "PIPELINE_RUN_ID": run_id}
+    log_path = os.path.join(logs_dir, "bench_output.log")
+
+    # Génération dans un processus séparé : le pic RSS du runner (hérité au lancement des scripts,
+    # ru_maxrss conserve le maximum de l'ancien espace mémoire à l'exec) reste celui d'un interpréteur nu
+    print(f"🧪 Génération : {rows:,} logs API (seed={seed})")
+    staging = os.path.join(data_dir, "staging")
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "benchmarks/generators.py", "--rows", str(rows), "--output", staging,
+         "--seed", str(seed), "--sources", *sources],
+        cwd=PIPELINE_ROOT, check=True, stdout=subprocess.DEVNULL,
+    )
+    sizes = source_sizes(rows)
+    generated = {}
+    for source in sources:
+        path = os.path.join(staging, FILE_NAMES[source])
+        generated[source] = {"path": path, "rows": sizes[source], "bytes": os.path.getsize(path)}
+    print(f"   {sum(g['bytes'] for g in generated.values()) / 1e6:.1f} Mo en {time.perf_counter() - start:.1f}s")
+
+    steps = []
+    for source, info in generated.items():
+        steps.append(run_step(
+            f"validate/{source}",
+            ["processing/data_validator.py", "--input", info["path"], "--source", source,
+             "--check-schema", "--chunksize", str(chunksize)],
+            env, data_dir, log_path, info["rows"],
+        ))
+    for source, info in generated.items():
+        steps.append(run_step(
+            f"process/{source}",
+            [PROCESSORS[source], "--input", info["path"], "--chunksize", str(chunksize), "--force"],
+            env, data_dir, log_path, info["rows"],
+        ))
+    if join:
+        steps.append(run_step(
+            "join", ["transformations/data_joiner.py", "--chunksize", str(chunksize), "--no-cache"],
+            env, data_dir, log_path, generated.get("sessions", {}).get("rows", 0),
+        ))
+
+    for step in steps:
+        flag = f" ❌ code {step['returncode']}" if step_failed(step) else ""
+        print(f"   {step['step']:<20} {step['seconds']:>9.2f}s {step['rows_per_sec'] or 0:>12,} lignes/s "
+              f"{step['peak_rss_mb']:>8.0f} Mo RSS {step['output_bytes'] / 1e6:>9.1f} Mo écrits{flag}")
+
+    return {
+        "rows": rows,
+        "run_id": run_id,
+        "inputs": {source: {"rows": g["rows"], "bytes": g["bytes"]} for source, g in generated.items()},
+        "steps": steps,
+        "stages": summarize(load_stage_records(logs_dir, run_id)),
+    }
+
+
+# ==============================
+# 📊 Comparaison à une référence
+# ==============================
+
+def compare(results: dict, baseline: dict) -> None:
+    """Écart de débit (lignes/s) et de pic mémoire par étape, pour les échelles présentes dans les deux fichiers."""
+    reference = {(s["rows"], step["step"]): step for s in baseline.get("scales", []) for step in s["steps"]}
+    print(f"📊 Comparaison avec la référence ({baseline.get('git_commit') or '?'} du {baseline.get('created_at', '?')})")
+    for scale in results["scales"]:
+        for step in scale["steps"]:
+            ref = reference.get((scale["rows"], step["step"]))
+            if not ref or not ref.get("rows_per_sec") or not ref.get("peak_rss_mb"):
+                continue
+            speed = 100 * ((step["rows_per_sec"] or 0) / ref["rows_per_sec"] - 1)
+            memory = 100 * (step["peak_rss_mb"] / ref["peak_rss_mb"] - 1)
+            print(f"   {scale['rows']:>12,} {step['step']:<20} débit {speed:+7.1f}%  mémoire {memory:+7.1f}%")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PIPELINE_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    config = load_pipeline_config()
+
+    parser = argparse.ArgumentParser(description="Benchmark de bout en bout du pipeline (données synthétiques)")
+    parser.add_argument('--rows', type=int, nargs="+", default=[100_000],
+                        help="Échelle(s) : nombre de logs API, les autres sources en proportion (ex : 10000 1000000 50000000)")
+    parser.add_argument('--chunksize', type=int, default=config.get("chunk_size_rows", 100_000), help="Taille des chunks")
+    parser.add_argument('--seed', type=int, default=42, help="Graine du générateur")
+    parser.add_argument('--sources', nargs="*", choices=list(PROCESSORS), default=None, help="Sources à générer (défaut : toutes)")
+    parser.add_argument('--no-join', action='store_true', help="Ne pas lancer data_joiner.py")
+    parser.add_argument('--workdir', default=None, help="Dossier de travail conservé (défaut : dossier temporaire supprimé)")
+    parser.add_argument('--output', default=None, help="Fichier JSON de résultats (défaut : benchmarks/results/pipeline_<date>.json)")
+    parser.add_argument('--baseline', default=None, help="Fichier JSON de résultats de référence à comparer")
+    args = parser.parse_args()
+
+    sources = args.sources or list(PROCESSORS)
+    join = not args.no_join and {"logs", "sessions", "users"} <= set(sources)
+
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "chunksize": args.chunksize,
+        "seed": args.seed,
+        "config": {k: config.get(k) for k in ("output_format", "json_backend", "join_mode", "dedup_mode", "export_threads")},
+        "scales": [],
+    }
+    for rows in args.rows:
+        workdir = os.path.join(args.workdir, f"rows_{rows}") if args.workdir else tempfile.mkdtemp(prefix="pipeline_bench_")
+        try:
+            results["scales"].append(run_scale(rows, workdir, args.chunksize, args.seed, sources, join))
+        finally:
+            if not args.workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4, ensure_ascii=False)
+    print(f"📝 Résultats : {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+    return 1 if any(step_failed(s) for scale in results["scales"] for s in scale["steps"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# 🧪 Générateurs de données synthétiques reproductibles (logs API, sessions, produits, utilisateurs)
+#
+# Colonnes conformes à config/data_schemas.json, identifiants cohérents entre sources
+# (les logs et sessions référencent les users générés) et ~1 % de lignes « sales »
+# (doublons, valeurs manquantes, dates invalides) pour exercer les nettoyeurs.
+# Écriture par blocs : la mémoire reste bornée jusqu'à plusieurs dizaines de millions de lignes.
+#
+# Usage : python benchmarks/generators.py --rows 1000000 --output /tmp/staging
+
+import os
+import sys
+import argparse
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# 📁 Ajout du chemin racine pour import des modules
+PIPELINE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PIPELINE_ROOT)
+
+from transformations.data_reader import load_source_schema
+
+START = pd.Timestamp("2025-07-01")
+DAYS = 7
+BLOCK_ROWS = 500_000
+DIRTY_RATE = 0.01
+
+# Volume de chaque source relativement à --rows (nombre de logs API)
+SOURCE_RATIOS = {"logs": 1.0, "sessions": 0.25, "users": 0.02, "products": 0.002}
+MIN_ROWS = 100
+
+FILE_NAMES = {
+    "logs": "api_logs_bench.json",
+    "sessions": "sessions_bench.csv",
+    "users": "users_database.csv",
+    "products": "products_catalog.csv",
+}
+
+COUNTRIES = {"FR": ("France", ["Paris", "Lyon", "Marseille"]), "US": ("USA", ["New York", "Chicago", "Austin"]),
+             "DE": ("Germany", ["Berlin", "Munich"]), "ES": ("Spain", ["Madrid", "Barcelona"]),
+             "GB": ("UK", ["London", "Manchester"])}
+ENDPOINTS = ["/api/products/42", "/api/products/7", "/api/categories/3", "/api/cart", "/api/checkout",
+             "/api/login", "/api/auth/refresh", "/api/search"]
+
+
+def source_sizes(rows: int, ratios: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+    """Nombre de lignes par source pour une échelle donnée (nombre de logs API)."""
+    ratios = ratios or SOURCE_RATIOS
+    return {source: max(MIN_ROWS, int(rows * ratio)) for source, ratio in ratios.items()}
+
+
+def _ids(prefix: str, values: np.ndarray, width: int) -> pd.Series:
+    return prefix + pd.Series(values).astype(str).str.zfill(width)
+
+
+def _timestamps(rng: np.random.Generator, n: int) -> pd.DatetimeIndex:
+    return START + pd.to_timedelta(rng.integers(0, DAYS * 86400, n), unit="s")
+
+
+def _dirty(rng: np.random.Generator, n: int, rate: float = DIRTY_RATE) -> np.ndarray:
+    return rng.random(n) < rate
+
+
+def _duplicate_ids(rng: np.random.Generator, ids: np.ndarray, rate: float = DIRTY_RATE) -> np.ndarray:
+    """Remplace ~rate des identifiants par un identifiant antérieur du bloc (doublons)."""
+    ids = ids.copy()
+    dup = np.flatnonzero(_dirty(rng, len(ids), rate))
+    dup = dup[dup > 0]
+    ids[dup] = ids[rng.integers(0, dup)]
+    return ids
+
+
+# ==============================
+# 🧱 Blocs par source (offset = rang de la première ligne du bloc)
+# ==============================
+
+def api_logs_block(rng: np.random.Generator, offset: int, n: int, sizes: Dict[str, int]) -> pd.DataFrame:
+    status = rng.choice([200, 201, 204, 400, 404, 500], n, p=[0.7, 0.08, 0.04, 0.07, 0.08, 0.03])
+    error = np.where(status >= 400, rng.choice(["timeout", "not found", "bad request"], n), "none")
+    df = pd.DataFrame({
+        "timestamp": _timestamps(rng, n).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "request_id": _ids("req_", _duplicate_ids(rng, np.arange(offset, offset + n)), 10),
+        "user_id": _ids("user_", rng.integers(0, sizes["users"], n), 8),
+        "session_id": _ids("sess_", rng.integers(0, sizes["sessions"], n), 9),
+        "endpoint": rng.choice(ENDPOINTS, n),
+        "method": rng.choice(["GET", "POST", "PUT", "DELETE"], n, p=[0.7, 0.2, 0.05, 0.05]),
+        "status_code": status,
+        "response_time_ms": rng.gamma(2.0, 80.0, n).round(3),
+        "user_agent": rng.choice(["Mozilla/5.0 (X11; Linux)", "Mozilla/5.0 (iPhone)", "curl/8.0"], n),
+        "ip_address": [f"10.{a}.{b}.{c}" for a, b, c in rng.integers(0, 255, (n, 3))],
+        "country_code": rng.choice(list(COUNTRIES), n),
+        "payload_size_bytes": rng.integers(100, 50_000, n),
+        "cache_hit": rng.random(n) < 0.4,
+        "error_message": error,
+    })
+    df.loc[_dirty(rng, n), "user_id"] = None
+    return df
+
+
+def sessions_block(rng: np.random.Generator, offset: int, n: int, sizes: Dict[str, int]) -> pd.DataFrame:
+    start = _timestamps(rng, n)
+    duration = rng.gamma(2.0, 600.0, n).astype(int) + 5
+    pages = rng.poisson(6, n)
+    viewed = rng.binomial(pages, 0.5)
+    added = rng.binomial(viewed, 0.2)
+    conversion = (added > 0) & (rng.random(n) < 0.4)
+    codes = rng.choice(list(COUNTRIES), n)
+    df = pd.DataFrame({
+        "session_id": _ids("sess_", _duplicate_ids(rng, np.arange(offset, offset + n)), 9),
+        "user_id": _ids("user_", rng.integers(0, sizes["users"], n), 8),
+        "start_time": start.strftime("%Y-%m-%d %H:%M:%S"),
+        "end_time": (start + pd.to_timedelta(duration, unit="s")).strftime("%Y-%m-%d %H:%M:%S"),
+        "duration_seconds": duration,
+        "pages_visited": pages,
+        "products_viewed": viewed,
+        "products_added_to_cart": added,
+        "conversion": conversion,
+        "total_spent": np.where(conversion, rng.gamma(2.0, 40.0, n), 0.0).round(2),
+        "device_type": rng.choice(["desktop", "mobile", "tablet"], n, p=[0.45, 0.45, 0.1]),
+        "browser": rng.choice(["Chrome", "Safari", "Firefox", "Edge"], n, p=[0.6, 0.25, 0.1, 0.05]),
+        "referrer": rng.choice(["google_ads", "facebook", "social_media", "direct", "newsletter", None], n),
+        "bounce_rate": pages <= 1,
+        "country": [COUNTRIES[c][0] for c in codes],
+        "city": [COUNTRIES[c][1][i % len(COUNTRIES[c][1])] for c, i in zip(codes, rng.integers(0, 6, n))],
+    })
+    df.loc[_dirty(rng, n), "end_time"] = "not-a-date"
+    return df
+
+
+def users_block(rng: np.random.Generator, offset: int, n: int, sizes: Dict[str, int]) -> pd.DataFrame:
+    user_ids = _ids("user_", _duplicate_ids(rng, np.arange(offset, offset + n)), 8)
+    codes = rng.choice(list(COUNTRIES), n)
+    registration = START - pd.to_timedelta(rng.integers(30, 3 * 365, n), unit="D")
+    orders = rng.poisson(4, n)
+    df = pd.DataFrame({
+        "user_id": user_ids,
+        "email": user_ids + "@example.net",
+        "first_name": rng.choice(["Alice", "Bruno", "Chloé", "David", "Emma", "Farid"], n),
+        "last_name": rng.choice(["Martin", "Bernard", "Smith", "Müller", "García"], n),
+        "age": rng.integers(16, 90, n),
+        "gender": rng.choice(["M", "F", "Other"], n, p=[0.48, 0.48, 0.04]),
+        "country": [COUNTRIES[c][0] for c in codes],
+        "city": [COUNTRIES[c][1][0] for c in codes],
+        "registration_date": registration.strftime("%Y-%m-%d"),
+        "is_premium": rng.random(n) < 0.15,
+        "total_orders": orders,
+        "total_spent": (orders * rng.gamma(2.0, 35.0, n)).round(2),
+        "last_login": (START - pd.to_timedelta(rng.integers(0, 30, n), unit="D")).strftime("%Y-%m-%d"),
+    })
+    df.loc[_dirty(rng, n), "last_login"] = None
+    return df
+
+
+def products_block(rng: np.random.Generator, offset: int, n: int, sizes: Dict[str, int]) -> pd.DataFrame:
+    price = rng.gamma(2.0, 30.0, n).round(2) + 1
+    df = pd.DataFrame({
+        "product_id": _ids("prod_", _duplicate_ids(rng, np.arange(offset, offset + n)), 7),
+        "name": _ids("Produit ", np.arange(offset, offset + n), 1),
+        "category": rng.choice(["Vêtements", "Chaussures", "Accessoires", "Électronique"], n),
+        "price": price,
+        "cost": (price * rng.uniform(0.3, 0.8, n)).round(2),
+        "stock": rng.integers(0, 500, n),
+        "brand": rng.choice(["Acme", "Globex", "Initech", "Umbrella"], n),
+        "created_at": (START - pd.to_timedelta(rng.integers(0, 2 * 365, n), unit="D")).strftime("%Y-%m-%d"),
+        "is_active": rng.random(n) < 0.9,
+        "rating": rng.uniform(0, 5, n).round(1),
+        "review_count": rng.poisson(25, n),
+    })
+    df.loc[_dirty(rng, n), "price"] = np.nan
+    return df
+
+
+GENERATORS: Dict[str, Callable] = {
+    "logs": api_logs_block,
+    "sessions": sessions_block,
+    "users": users_block,
+    "products": products_block,
+}
+
+
+# ==============================
+# 💾 Écriture
+# ==============================
+
+def generate_source(source: str, path: str, rows: int, sizes: Dict[str, int], seed: int = 42,
+                    block_rows: int = BLOCK_ROWS) -> int:
+    """
+    Écrit `rows` lignes de la source dans path (JSON lines pour les logs, CSV sinon), bloc par bloc.
+    Chaque bloc a sa propre graine (seed, source, n° de bloc) : résultat reproductible.
+    Retourne la taille du fichier (octets).
+    """
+    block = GENERATORS[source]
+    source_id = list(GENERATORS).index(source)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for i, offset in enumerate(range(0, rows, block_rows)):
+            rng = np.random.default_rng([seed, source_id, i])
+            df = block(rng, offset, min(block_rows, rows - offset), sizes)
+            # Colonnes dans l'ordre du schéma (colonnes hors schéma en fin)
+            columns = list(load_source_schema(source)["types"])
+            df = df[[c for c in columns if c in df.columns] + [c for c in df.columns if c not in columns]]
+            if source == "logs":
+                df.to_json(f, orient="records", lines=True, force_ascii=False)
+            else:
+                df.to_csv(f, index=False, header=(i == 0))
+    return os.path.getsize(path)
+
+
+def generate_api_logs(path: str, rows: int, seed: int = 42) -> None:
+    """Écrit un fichier JSON lines de logs API (mêmes colonnes que api_logs.zip), reproductible."""
+    generate_source("logs", path, rows, source_sizes(rows), seed)
+
+
+def generate_all(output_dir: str, rows: int, seed: int = 42, sources=None,
+                 ratios: Optional[Dict[str, float]] = None) -> Dict[str, dict]:
+    """
+    Génère toutes les sources (ou `sources`) dans output_dir pour une échelle de `rows` logs API.
+    Retourne {source: {"path", "rows", "bytes"}}.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    sizes = source_sizes(rows, ratios)
+    generated = {}
+    for source in sources or GENERATORS:
+        path = os.path.join(output_dir, FILE_NAMES[source])
+        size = generate_source(source, path, sizes[source], sizes, seed)
+        generated[source] = {"path": path, "rows": sizes[source], "bytes": size}
+    return generated
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Génère des données synthétiques pour toutes les sources")
+    parser.add_argument('--rows', type=int, default=100_000, help="Nombre de logs API (les autres sources en proportion)")
+    parser.add_argument('--output', required=True, help="Dossier de sortie (ex : data/staging)")
+    parser.add_argument('--seed', type=int, default=42, help="Graine du générateur")
+    parser.add_argument('--sources', nargs="*", choices=list(GENERATORS), default=None, help="Sources à générer (défaut : toutes)")
+    args = parser.parse_args()
+
+    for source, info in generate_all(args.output, args.rows, args.seed, args.sources).items():
+        print(f"🧪 {source:<9} {info['rows']:>12,} lignes  {info['bytes'] / 1e6:>9.1f} Mo  {info['path']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,48 +1,58 @@
 #!/usr/bin/env python3
 # Analyse des rapports qualité et simulation d'alerte email enrichie
+#
+# Seuls les rapports en échec sont lus, depuis data/quality/quality_index.db (monitoring/quality_index.py) ;
+# les échecs apparus depuis la précédente alerte sont signalés comme nouveaux.
+# Dérives (monitoring/data_metrics.py) : ex. volume d'une source < 50 % de la médiane des 7 derniers jours.
 
 
 import os
 import sys
-import json
 from datetime import datetime
 
-QUALITY_DIR = os.path.join(os.path.dirname(__file__), "../data/quality")
+PIPELINE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PIPELINE_ROOT)
+
+from monitoring.data_metrics import MetricsStore
+from monitoring.quality_index import QUALITY_DIR, QualityIndex
+
 ALERT_FILE = os.path.join(QUALITY_DIR, "quality_alert.txt")
 EMAIL_DEST = "tanouti.jaouad@labom2iformation.fr"
+CURSOR = "alert_manager"
 
-failed_reports = []
+with QualityIndex() as index:
+    index.sync_directory()
+    last_alert_seq = index.cursor(CURSOR)
+    failed_reports = list(index.reports(status="failed"))
+    index.set_cursor(CURSOR, index.last_seq())
 
-# Parcours des fichiers de validation
-for file in os.listdir(QUALITY_DIR):
-    if file.startswith("validation_report_") and file.endswith(".json"):
-        path = os.path.join(QUALITY_DIR, file)
-        with open(path, "r") as f:
-            try:
-                report = json.load(f)
-                if report.get("status") == "failed":
-                    failed_reports.append(report)
-            except:
-                continue
+with MetricsStore() as store:
+    drift_alerts = store.detect_drift()
 
 # Génération d'une alerte si nécessaire
-if failed_reports:
+if failed_reports or drift_alerts:
+    new_failures = sum(r["seq"] > last_alert_seq for r in failed_reports)
     with open(ALERT_FILE, "w") as alert:
         alert.write("🚨 ALERTE QUALITÉ - ÉCHEC DÉTECTÉ\n")
         alert.write(f"Date : {datetime.utcnow().isoformat()}Z\n")
-        alert.write(f"Destinataire simulé : {EMAIL_DEST}\n\n")
+        alert.write(f"Destinataire simulé : {EMAIL_DEST}\n")
+        alert.write(f"Échecs : {len(failed_reports)} (dont {new_failures} nouveau(x) depuis la dernière alerte)\n\n")
+        for d in drift_alerts:
+            alert.write(f"📉 Dérive : {d['message']}\n")
+        if drift_alerts:
+            alert.write("\n")
         for r in failed_reports:
-            alert.write(f"❌ {r['filename']}\n")
+            alert.write(f"❌ {r['filename']}{' 🆕' if r['seq'] > last_alert_seq else ''}\n")
             alert.write(f"   - Complétude : {r['completeness']}% (Seuil : {r['threshold']}%)\n")
             if r.get("errors"):
                 for err in r["errors"]:
                     alert.write(f"   - 📌 {err}\n")
             alert.write("\n")
-    
+
     print(f"📩 Alerte générée : {ALERT_FILE}")
 else:
     print("✅ Tous les fichiers ont passé les contrôles qualité.")
-if failed_reports:
+if failed_reports or drift_alerts:
     sys.exit(1)
 else:
-    sys.exit(0)
\ No newline at end of file
+    sys.exit(0)
@@ -1,35 +1,32 @@
 #!/usr/bin/env python3
-# Génère un tableau HTML scrollable (compact) à partir des rapports qualité JSON
+# Génère un tableau HTML scrollable (compact) à partir de l'index des rapports qualité
+#
+# Les rapports sont lus dans data/quality/quality_index.db (monitoring/quality_index.py), échecs d'abord,
+# et écrits en flux, page par page (dashboard.html, dashboard_2.html, ...). Sans nouveau rapport depuis
+# la dernière génération, les pages existantes sont conservées (--force pour régénérer).
+# En page 1 : tendances par source (lignes, complétude, violations) issues de data/metrics_history.db.
 
 import os
-import json
-
-QUALITY_DIR = os.path.join(os.path.dirname(__file__), "../data/quality")
-OUTPUT_FILE = os.path.join(os.path.dirname(__file__), "../data/quality/dashboard.html")
-
-os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-
-rows = []
-for file in os.listdir(QUALITY_DIR):
-    if file.startswith("validation_report_") and file.endswith(".json"):
-        path = os.path.join(QUALITY_DIR, file)
-        try:
-            with open(path, encoding="utf-8") as f:
-                report = json.load(f)
-                rows.append({
-                    "filename": report.get("filename", ""),
-                    "completeness": report.get("completeness", 0),
-                    "threshold": report.get("threshold", 0),
-                    "status": report.get("status", "unknown"),
-                    "errors": report.get("errors", []),
-                })
-        except Exception:
-            continue
-
-# (optionnel) tri par statut puis nom
-rows.sort(key=lambda r: (r["status"] != "failed", r["filename"]))
-
-html = """<!DOCTYPE html>
+import sys
+import glob
+import html
+import argparse
+from datetime import datetime, timedelta
+
+PIPELINE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PIPELINE_ROOT)
+
+from monitoring.data_metrics import MetricsStore
+from monitoring.quality_index import QUALITY_DIR, QualityIndex
+
+OUTPUT_FILE = os.path.join(QUALITY_DIR, "dashboard.html")
+CURSOR = "dashboard"
+PAGE_SIZE = 500
+TREND_DAYS = 30
+# Tendances en page 1 : (métrique, agrégat par exécution, libellé)
+TRENDS = [("rows", "SUM", "Lignes"), ("completeness", "AVG", "Complétude (%)"), ("violations", "SUM", "Violations")]
+
+HEADER = """<!DOCTYPE html>
 <html>
 <head>
 <meta charset="UTF-8">
@@ -37,6 +34,8 @@ html = """<!DOCTYPE html>
 <style>
   body { font-family: Arial, sans-serif; margin: 24px; background: #f5f5f5; }
   h1 { text-align: center; margin-bottom: 12px; }
+  .summary, .pages { text-align: center; margin: 8px 0; }
+  .pages a, .pages strong { margin: 0 4px; }
   .scroll-box {
     max-height: 85vh; overflow-y: auto; border: 1px solid #ccc; background: #fff;
     padding: 10px; box-shadow: 0 0 6px rgba(0,0,0,0.08); border-radius: 6px;
@@ -47,11 +46,16 @@ html = """<!DOCTYPE html>
   .passed { background: #d4edda; }
   .failed { background: #f8d7da; }
   .error-list { color: #a94442; font-size: 0.9em; margin: 0; padding-left: 16px; }
+  .trends { margin: 0 auto 16px; background: #fff; border: 1px solid #ccc; border-radius: 6px; }
+  .trends td { font-size: 13px; vertical-align: middle; }
+  .trends svg { display: block; }
 </style>
 </head>
 <body>
   <h1>📊 Dashboard de Qualité des Données</h1>
-  <div class="scroll-box">
+"""
+
+TABLE_START = """  <div class="scroll-box">
     <table>
       <thead>
         <tr>
@@ -65,19 +69,7 @@ html = """<!DOCTYPE html>
       <tbody>
 """
 
-for r in rows:
-    status_class = "passed" if r["status"] == "passed" else "failed"
-    html += f"<tr class='{status_class}'>"
-    html += f"<td>{r['filename']}</td>"
-    html += f"<td>{r['completeness']}</td>"
-    html += f"<td>{r['threshold']}</td>"
-    html += f"<td>{r['status'].capitalize()}</td>"
-    html += "<td><ul class='error-list'>" + "".join(
-        f"<li>{e}</li>" for e in (r['errors'] or [])
-    ) + "</ul></td>"
-    html += "</tr>"
-
-html += """
+FOOTER = """
       </tbody>
     </table>
   </div>
@@ -85,7 +77,107 @@ html += """
 </html>
 """
 
-with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-    f.write(html)
 
-print(f"✅ Dashboard HTML généré : {OUTPUT_FILE}")
+def page_file(page: int) -> str:
+    return OUTPUT_FILE if page == 1 else OUTPUT_FILE.replace(".html", f"_{page}.html")
+
+
+def page_links(page: int, pages: int) -> str:
+    if pages <= 1:
+        return ""
+    links = [
+        f"<strong>{p}</strong>" if p == page else f"<a href='{os.path.basename(page_file(p))}'>{p}</a>"
+        for p in range(1, pages + 1)
+    ]
+    return f"  <div class='pages'>Pages : {' '.join(links)}</div>\n"
+
+
+def sparkline(values, width: int = 160, height: int = 28) -> str:
+    """Mini-courbe SVG inline (une exécution par point)."""
+    if len(values) < 2:
+        return ""
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    step = width / (len(values) - 1)
+    points = " ".join(f"{i * step:.1f},{height - 2 - (v - low) / span * (height - 4):.1f}" for i, v in enumerate(values))
+    return (f"<svg width='{width}' height='{height}'><polyline fill='none' stroke='#3b73b9' stroke-width='1.5' "
+            f"points='{points}'/></svg>")
+
+
+def render_trends(store: MetricsStore, days: int = TREND_DAYS) -> str:
+    """Tableau des tendances par source (historique data_metrics), dernière valeur + sparkline."""
+    start = (datetime.utcnow() - timedelta(days=days)).isoformat(timespec="seconds")
+    rows = []
+    for source in sorted(set().union(*(store.sources(metric) for metric, _, _ in TRENDS))):
+        cells = []
+        for metric, agg, _ in TRENDS:
+            values = [v for _, _, v in store.per_run(metric, source, start, agg)]
+            last = f"{values[-1]:,.2f}".rstrip("0").rstrip(".") if values else "-"
+            cells.append(f"<td>{last}</td><td>{sparkline(values)}</td>")
+        rows.append(f"<tr><td>{html.escape(source)}</td>{''.join(cells)}</tr>\n")
+    if not rows:
+        return ""
+    headers = "".join(f"<th colspan='2'>{label}</th>" for _, _, label in TRENDS)
+    return (f"  <table class='trends'><thead><tr><th>Source ({days} derniers jours)</th>{headers}</tr></thead>\n"
+            f"  <tbody>\n{''.join(rows)}  </tbody></table>\n")
+
+
+def render_row(r: dict) -> str:
+    status_class = "passed" if r["status"] == "passed" else "failed"
+    errors = "".join(f"<li>{html.escape(str(e))}</li>" for e in r["errors"] or [])
+    return (
+        f"<tr class='{status_class}'><td>{html.escape(r['filename'])}</td><td>{r['completeness']}</td>"
+        f"<td>{r['threshold']}</td><td>{html.escape(r['status'].capitalize())}</td>"
+        f"<td><ul class='error-list'>{errors}</ul></td></tr>\n"
+    )
+
+
+def write_page(index: QualityIndex, page: int, pages: int, page_size: int, counts: dict, trends: str = "") -> None:
+    """Écrit une page : en-tête, tendances (page 1), lignes lues au fil du curseur SQLite, pied de page."""
+    summary = ", ".join(f"{html.escape(k)} : {v}" for k, v in sorted(counts.items()))
+    tmp = f"{page_file(page)}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(HEADER)
+        f.write(f"  <div class='summary'>{sum(counts.values())} rapports ({summary})</div>\n")
+        if page == 1:
+            f.write(trends)
+        f.write(page_links(page, pages))
+        f.write(TABLE_START)
+        f.writelines(render_row(r) for r in index.reports(limit=page_size, offset=(page - 1) * page_size))
+        f.write(FOOTER)
+    os.replace(tmp, page_file(page))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Dashboard HTML des rapports qualité")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help="Rapports par page HTML")
+    parser.add_argument('--force', action='store_true', help="Régénère même sans nouveau rapport")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
+    with QualityIndex() as index:
+        index.sync_directory()
+        last_seq = index.last_seq()
+        if not args.force and index.cursor(CURSOR) == last_seq and os.path.exists(OUTPUT_FILE):
+            print(f"⏭️  Aucun nouveau rapport : dashboard inchangé ({OUTPUT_FILE})")
+            return 0
+
+        counts = index.counts()
+        pages = max(1, -(-sum(counts.values()) // args.page_size))
+        with MetricsStore() as store:
+            trends = render_trends(store)
+        for page in range(1, pages + 1):
+            write_page(index, page, pages, args.page_size, counts, trends)
+        # Pages d'une génération précédente plus longue
+        for stale in glob.glob(OUTPUT_FILE.replace(".html", "_*.html")):
+            suffix = stale[len(OUTPUT_FILE) - len(".html") + 1:-len(".html")]
+            if suffix.isdigit() and int(suffix) > pages:
+                os.remove(stale)
+        index.set_cursor(CURSOR, last_seq)
+
+    print(f"✅ Dashboard HTML généré : {OUTPUT_FILE} ({pages} page(s))")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
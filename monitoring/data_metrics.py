@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# 📈 Historique des métriques qualité et d'exécution (data/metrics_history.db) + détection de dérive
+#
+# Une ligne par mesure (format long) : ts, run_id, source, entity, metric, value, indexée par
+# (metric, source, ts) pour les requêtes par intervalle de temps.
+# - Rapports de validation (écrits par write_report) : rows, completeness, missing_values, violations
+#   (total et par règle : violations:<colonne>.<règle>), failed, anomalies (--check-anomalies)
+# - Étapes du pipeline (monitoring/instrumentation.py) : wall_s, cpu_s, max_rss_mb, rows par component/stage
+# Les rapports JSON sont écrasés à chaque validation : l'historique ne vit qu'ici.
+#
+# Usage : python3 monitoring/data_metrics.py record-stages --run-id ID | drift | series --metric rows --source logs
+
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import statistics
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+PIPELINE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PIPELINE_ROOT)
+
+from transformations.data_storage import data_path
+
+METRICS_DB = data_path("metrics_history.db")
+
+# Règles de dérive : (métrique, agrégat par exécution, sens, écart relatif toléré)
+# ex : rows chute de plus de 50 % par rapport à la médiane des 7 derniers jours
+DRIFT_RULES = [
+    ("rows", "SUM", "drop", 0.5),
+    ("completeness", "AVG", "drop", 0.05),
+    ("violations", "SUM", "rise", 1.0),
+]
+DRIFT_WINDOW_DAYS = 7
+DRIFT_MIN_RUNS = 3
+
+Row = Tuple[str, Optional[str], str, Optional[str], str, float]
+
+
+def utc_now() -> str:
+    return datetime.utcnow().isoformat(timespec="seconds") + "Z"
+
+
+class MetricsStore:
+    """Série temporelle SQLite : metrics(ts, run_id, source, entity, metric, value)."""
+
+    def __init__(self, db_path: str = METRICS_DB):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS metrics (
+                ts TEXT NOT NULL,
+                run_id TEXT,
+                source TEXT NOT NULL,
+                entity TEXT,
+                metric TEXT NOT NULL,
+                value REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS metrics_series ON metrics (metric, source, ts);
+            CREATE INDEX IF NOT EXISTS metrics_run ON metrics (run_id);
+            """
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ==============================
+    # ✍️ Enregistrement
+    # ==============================
+
+    def record(self, rows: Iterable[Row]) -> int:
+        rows = list(rows)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO metrics (ts, run_id, source, entity, metric, value) VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def record_report(self, report: dict, run_id: Optional[str] = None) -> int:
+        """Mesures d'un rapport de validation (une source, un fichier)."""
+        ts = report.get("validated_at") or utc_now()
+        source = report.get("source") or "unknown"
+        entity = report.get("filename")
+        violations = report.get("violations") or {}
+        values = {
+            "rows": report.get("rows"),
+            "completeness": report.get("completeness"),
+            "missing_values": report.get("missing_values"),
+            "violations": sum(violations.values()),
+            "failed": int(report.get("status") == "failed"),
+            "anomalies": len(report["anomalies"]) if report.get("anomalies") is not None else None,
+            **{f"violations:{rule}": n for rule, n in violations.items()},
+        }
+        return self.record(
+            (ts, run_id, source, entity, metric, float(value))
+            for metric, value in values.items()
+            if value is not None and value == value  # NaN (fichier vide) non enregistré
+        )
+
+    def record_stages(self, records: List[dict]) -> int:
+        """Mesures brutes d'instrumentation.py (une ligne par étape / chunk)."""
+        rows = []
+        for r in records:
+            if r.get("status") != "ok":
+                continue
+            ts = r.get("started_at") or utc_now()
+            for metric in ("wall_s", "cpu_s", "max_rss_mb", "rows_out"):
+                if r.get(metric) is not None:
+                    rows.append((ts, r.get("run_id"), r["component"], r["stage"], metric, float(r[metric])))
+        return self.record(rows)
+
+    # ==============================
+    # 🔎 Requêtes
+    # ==============================
+
+    def series(self, metric: str, source: Optional[str] = None, entity: Optional[str] = None,
+               start: Optional[str] = None, end: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Points (ts, value) d'une métrique sur [start, end[ (bornes ISO, optionnelles)."""
+        query, params = "SELECT ts, value FROM metrics WHERE metric = ?", [metric]
+        for clause, value in (("source = ?", source), ("entity = ?", entity), ("ts >= ?", start), ("ts < ?", end)):
+            if value is not None:
+                query += f" AND {clause}"
+                params.append(value)
+        return self.conn.execute(query + " ORDER BY ts", params).fetchall()
+
+    def per_run(self, metric: str, source: str, start: Optional[str] = None, agg: str = "SUM") -> List[Tuple[str, str, float]]:
+        """Valeur par exécution (run_id, premier ts, agrégat des fichiers/étapes), ordre chronologique."""
+        if agg not in ("SUM", "AVG", "MAX", "MIN"):
+            raise ValueError(f"❌ Agrégat non supporté : {agg}")
+        query = (
+            f"SELECT COALESCE(run_id, ts) AS run, MIN(ts) AS first_ts, {agg}(value) FROM metrics "
+            "WHERE metric = ? AND source = ?"
+        )
+        params = [metric, source]
+        if start is not None:
+            query += " AND ts >= ?"
+            params.append(start)
+        return self.conn.execute(query + " GROUP BY run ORDER BY first_ts", params).fetchall()
+
+    def sources(self, metric: str) -> List[str]:
+        return [r[0] for r in self.conn.execute("SELECT DISTINCT source FROM metrics WHERE metric = ?", (metric,))]
+
+    # ==============================
+    # 🚨 Dérive
+    # ==============================
+
+    def detect_drift(self, rules=DRIFT_RULES, window_days: int = DRIFT_WINDOW_DAYS,
+                     min_runs: int = DRIFT_MIN_RUNS, now: Optional[datetime] = None) -> List[dict]:
+        """
+        Compare la dernière exécution de chaque source à la médiane des exécutions précédentes
+        des window_days derniers jours (au moins min_runs exécutions de référence).
+        """
+        now = now or datetime.utcnow()
+        start = (now - timedelta(days=window_days)).isoformat(timespec="seconds")
+        alerts = []
+        for metric, agg, direction, tolerance in rules:
+            for source in self.sources(metric):
+                runs = self.per_run(metric, source, start, agg)
+                if len(runs) < min_runs + 1:
+                    continue
+                run_id, ts, value = runs[-1]
+                median = statistics.median(v for _, _, v in runs[:-1])
+                if median <= 0:
+                    continue
+                if direction == "drop":
+                    drifted = value < median * (1 - tolerance)
+                else:
+                    drifted = value > median * (1 + tolerance)
+                if drifted:
+                    change = 100 * (value / median - 1)
+                    alerts.append({
+                        "source": source, "metric": metric, "run_id": run_id, "ts": ts,
+                        "value": value, "median": median, "change_pct": round(change, 1),
+                        "message": f"{source} : {metric} = {value:g} ({change:+.0f}% vs médiane {window_days} j = {median:g})",
+                    })
+        return alerts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Historique des métriques qualité / exécution")
+    sub = parser.add_subparsers(dest="action", required=True)
+    stages = sub.add_parser("record-stages", help="Enregistre les métriques d'étapes d'une exécution (instrumentation)")
+    stages.add_argument("--run-id", default=None, help="Exécution (défaut : PIPELINE_RUN_ID ou la plus récente)")
+    sub.add_parser("drift", help="Dérives de la dernière exécution vs médiane des 7 derniers jours")
+    series = sub.add_parser("series", help="Série temporelle d'une métrique")
+    series.add_argument("--metric", required=True)
+    series.add_argument("--source", default=None)
+    series.add_argument("--days", type=int, default=30)
+    parser.add_argument("--db", default=METRICS_DB, help="Base SQLite de l'historique")
+    args = parser.parse_args()
+
+    with MetricsStore(args.db) as store:
+        if args.action == "record-stages":
+            from monitoring import instrumentation
+            runs = instrumentation.list_runs()
+            run_id = args.run_id or os.environ.get("PIPELINE_RUN_ID")
+            run_id = run_id if run_id in runs else (runs[-1] if runs and not args.run_id else None)
+            if run_id is None:
+                print("⚠️  Aucune métrique d'exécution à enregistrer")
+                return 1
+            n = store.record_stages(instrumentation.load_records(run_id))
+            print(f"📈 {n} mesures d'étapes enregistrées ({run_id}) : {args.db}")
+        elif args.action == "drift":
+            alerts = store.detect_drift()
+            for alert in alerts:
+                print(f"📉 {alert['message']}")
+            if not alerts:
+                print("✅ Aucune dérive détectée")
+            return 1 if alerts else 0
+        else:
+            start = (datetime.utcnow() - timedelta(days=args.days)).isoformat(timespec="seconds")
+            print(json.dumps(store.series(args.metric, args.source, start=start), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
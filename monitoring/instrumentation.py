@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# ⏱️ Instrumentation des étapes du pipeline : temps, CPU, mémoire, volumes, octets lus/écrits
+#
+# Chaque étape (lecture, nettoyage, enrichissement, agrégation, export...) produit une ligne JSON
+# dans logs/metrics_<run_id>.jsonl. PIPELINE_RUN_ID (exporté par pipeline_master.sh) regroupe
+# tous les processus d'une même exécution.
+#
+# Résumé d'une exécution : python3 monitoring/instrumentation.py summary [--run-id ID] [--baseline ID]
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+
+PIPELINE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+METRICS_DIR = os.environ.get("PIPELINE_LOGS_DIR") or os.path.join(PIPELINE_ROOT, "logs")
+METRICS_PREFIX = "metrics_"
+
+# Identifiant partagé avec les sous-processus (pools, scripts enfants)
+RUN_ID = os.environ.setdefault("PIPELINE_RUN_ID", datetime.now().strftime("%Y%m%d_%H%M%S") + f"_{os.getpid()}")
+
+
+def metrics_path(run_id: str = RUN_ID) -> str:
+    return os.path.join(METRICS_DIR, f"{METRICS_PREFIX}{run_id}.jsonl")
+
+
+def _read_proc_io() -> Dict[str, int]:
+    """Compteurs d'E/S du processus (Linux) ; vide si /proc/self/io est indisponible."""
+    try:
+        with open("/proc/self/io") as f:
+            return {k: int(v) for k, v in (line.split(": ") for line in f.read().splitlines())}
+    except (OSError, ValueError):
+        return {}
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss : pic de mémoire résidente du processus, en Ko sous Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def write_record(record: dict) -> None:
+    """Ajoute une ligne JSON (un seul write en O_APPEND : pas d'entrelacement entre processus)."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+    fd = os.open(metrics_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def stage(component: str, name: str, source: Optional[str] = None, chunk: Optional[int] = None, **fields):
+    """
+    Mesure une étape et écrit son enregistrement à la sortie du bloc.
+    Le dict produit peut être complété dans le bloc (ex : record["rows_out"] = len(df)) ;
+    record["discard"] = True annule l'écriture.
+    """
+    record = {"run_id": RUN_ID, "component": component, "stage": name, "source": source, "chunk": chunk, **fields}
+    io_start = _read_proc_io()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    record["started_at"] = datetime.utcnow().isoformat() + "Z"
+    status = "ok"
+    try:
+        yield record
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        io_end = _read_proc_io()
+        record.update({
+            "status": status,
+            "pid": os.getpid(),
+            "wall_s": round(time.perf_counter() - wall_start, 4),
+            "cpu_s": round(time.process_time() - cpu_start, 4),
+            "max_rss_mb": _max_rss_mb(),
+            "bytes_read": io_end.get("rchar", 0) - io_start.get("rchar", 0) if io_start else None,
+            "bytes_written": io_end.get("wchar", 0) - io_start.get("wchar", 0) if io_start else None,
+            "disk_read_bytes": io_end.get("read_bytes", 0) - io_start.get("read_bytes", 0) if io_start else None,
+            "disk_write_bytes": io_end.get("write_bytes", 0) - io_start.get("write_bytes", 0) if io_start else None,
+        })
+        if not record.pop("discard", False):
+            write_record(record)
+
+
+def iter_stage(component: str, name: str, chunks: Iterable, source: Optional[str] = None) -> Iterator:
+    """
+    Mesure la production de chaque élément d'un itérateur (ex : lecture par chunks) :
+    un enregistrement par chunk, rows_out = nombre de lignes du chunk.
+    """
+    iterator = iter(chunks)
+    i = 0
+    while True:
+        with stage(component, name, source=source, chunk=i) as record:
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                record["discard"] = True
+                break
+            record["rows_out"] = len(chunk)
+        yield chunk
+        i += 1
+
+
+# ==============================
+# 📊 Résumé d'une exécution
+# ==============================
+
+def list_runs() -> list:
+    if not os.path.isdir(METRICS_DIR):
+        return []
+    return sorted(
+        f[len(METRICS_PREFIX):-len(".jsonl")]
+        for f in os.listdir(METRICS_DIR)
+        if f.startswith(METRICS_PREFIX) and f.endswith(".jsonl")
+    )
+
+
+def load_records(run_id: str) -> list:
+    records = []
+    with open(metrics_path(run_id), encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return records
+
+
+def summarize(records: list) -> Dict[str, dict]:
+    """Totaux par component/stage : appels, temps, CPU, pic RSS, lignes, octets, erreurs."""
+    summary = {}
+    for r in records:
+        key = f"{r['component']}/{r['stage']}"
+        s = summary.setdefault(key, {
+            "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "max_rss_mb": 0.0,
+            "rows_in": 0, "rows_out": 0, "bytes_read": 0, "bytes_written": 0, "errors": 0,
+        })
+        s["calls"] += 1
+        s["wall_s"] += r.get("wall_s") or 0
+        s["cpu_s"] += r.get("cpu_s") or 0
+        s["max_rss_mb"] = max(s["max_rss_mb"], r.get("max_rss_mb") or 0)
+        for k in ("rows_in", "rows_out", "bytes_read", "bytes_written"):
+            s[k] += r.get(k) or 0
+        s["errors"] += r.get("status") == "error"
+    for s in summary.values():
+        s["wall_s"] = round(s["wall_s"], 3)
+        s["cpu_s"] = round(s["cpu_s"], 3)
+    return summary
+
+
+def print_summary(run_id: str, summary: Dict[str, dict], baseline: Optional[Dict[str, dict]] = None) -> None:
+    # Les étapes "total" englobent les autres : exclues du dénominateur des pourcentages
+    total = sum(s["wall_s"] for key, s in summary.items() if not key.endswith("/total")) or 1
+    print(f"📊 Exécution {run_id} — étapes triées par temps cumulé")
+    print(f"{'étape':<32} {'appels':>7} {'wall s':>9} {'%':>6} {'cpu s':>9} {'rss Mo':>8} {'lignes':>11} {'Mo lus':>8} {'Mo écrits':>9}  {'vs réf.':>8}")
+    for key, s in sorted(summary.items(), key=lambda kv: kv[1]["wall_s"], reverse=True):
+        delta = ""
+        if baseline and key in baseline and baseline[key]["wall_s"]:
+            delta = f"{100 * (s['wall_s'] / baseline[key]['wall_s'] - 1):+.0f}%"
+        rows = s["rows_out"] or s["rows_in"]
+        flag = " ❌" if s["errors"] else ""
+        print(
+            f"{key:<32} {s['calls']:>7} {s['wall_s']:>9.2f} {100 * s['wall_s'] / total:>5.1f}% {s['cpu_s']:>9.2f} "
+            f"{s['max_rss_mb']:>8.0f} {rows:>11,} {s['bytes_read'] / 1e6:>8.1f} {s['bytes_written'] / 1e6:>9.1f}  {delta:>8}{flag}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Résumé des métriques d'exécution du pipeline")
+    parser.add_argument("action", choices=["summary", "runs"])
+    parser.add_argument("--run-id", default=None, help="Exécution à résumer (défaut : la plus récente)")
+    parser.add_argument("--baseline", default=None, help="Exécution de référence (défaut : la précédente)")
+    parser.add_argument("--json", default=None, help="Écrit aussi le résumé dans ce fichier JSON")
+    args = parser.parse_args()
+
+    runs = list_runs()
+    if args.action == "runs":
+        print("\n".join(runs))
+        return 0
+    if not runs:
+        print(f"⚠️  Aucune métrique dans {METRICS_DIR}")
+        return 1
+
+    run_id = args.run_id or runs[-1]
+    if run_id not in runs:
+        print(f"❌ Exécution inconnue : {run_id}")
+        return 1
+    previous = [r for r in runs if r < run_id]
+    baseline_id = args.baseline or (previous[-1] if previous else None)
+
+    summary = summarize(load_records(run_id))
+    baseline = summarize(load_records(baseline_id)) if baseline_id in runs else None
+    print_summary(run_id, summary, baseline)
+    if baseline:
+        print(f"(vs réf. : temps cumulé comparé à l'exécution {baseline_id})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"run_id": run_id, "baseline": baseline_id if baseline else None, "stages": summary}, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
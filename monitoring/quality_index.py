@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# 🗂️ Index SQLite des rapports qualité (data/quality/quality_index.db)
+#
+# Le validateur y enregistre chaque rapport en même temps que son JSON : dashboard et alertes
+# interrogent l'index (rapports en échec, pages triées) au lieu de relire tous les JSON à chaque exécution.
+# Les JSON déposés hors validateur (anciens rapports, copies) sont rattrapés par sync_directory :
+# seuls les fichiers dont la taille ou le mtime a changé sont relus.
+#
+# Usage : python3 monitoring/quality_index.py sync|stats
+
+import os
+import sys
+import json
+import sqlite3
+import argparse
+from datetime import datetime
+from typing import Iterator, Optional
+
+PIPELINE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PIPELINE_ROOT)
+
+from transformations.data_storage import data_path
+
+QUALITY_DIR = data_path("quality")
+INDEX_DB = os.path.join(QUALITY_DIR, "quality_index.db")
+REPORT_PREFIX = "validation_report_"
+
+COLUMNS = ("filename", "source", "rows", "completeness", "threshold", "status", "validated_at", "errors",
+           "report_path", "size", "mtime_ns", "seq")
+
+
+class QualityIndex:
+    """
+    Table reports(filename) → champs du rapport + (taille, mtime) du JSON + seq.
+    seq croît à chaque écriture : « nouveaux rapports » = seq > curseur du consommateur (table cursors).
+    """
+
+    def __init__(self, db_path: str = INDEX_DB):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS reports (
+                filename TEXT PRIMARY KEY,
+                source TEXT,
+                rows INTEGER,
+                completeness NUMERIC,
+                threshold NUMERIC,
+                status TEXT NOT NULL,
+                validated_at TEXT,
+                errors TEXT,
+                report_path TEXT,
+                size INTEGER,
+                mtime_ns INTEGER,
+                seq INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS reports_status ON reports (status, filename);
+            CREATE INDEX IF NOT EXISTS reports_seq ON reports (seq);
+            CREATE TABLE IF NOT EXISTS cursors (
+                consumer TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            """
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ==============================
+    # ✍️ Écriture
+    # ==============================
+
+    def _upsert(self, report: dict, report_path: Optional[str]) -> None:
+        st = os.stat(report_path) if report_path and os.path.exists(report_path) else None
+        self.conn.execute(
+            """
+            INSERT INTO reports (filename, source, rows, completeness, threshold, status, validated_at, errors,
+                                 report_path, size, mtime_ns, seq)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM reports))
+            ON CONFLICT (filename) DO UPDATE SET
+                source = excluded.source, rows = excluded.rows, completeness = excluded.completeness,
+                threshold = excluded.threshold, status = excluded.status, validated_at = excluded.validated_at,
+                errors = excluded.errors, report_path = excluded.report_path, size = excluded.size,
+                mtime_ns = excluded.mtime_ns, seq = excluded.seq
+            """,
+            (
+                report.get("filename", ""), report.get("source"), report.get("rows"),
+                report.get("completeness"), report.get("threshold"), report.get("status", "unknown"),
+                report.get("validated_at"), json.dumps(report.get("errors") or [], ensure_ascii=False),
+                report_path, st.st_size if st else None, st.st_mtime_ns if st else None,
+            ),
+        )
+
+    def record(self, report: dict, report_path: Optional[str] = None) -> None:
+        """Enregistre (ou remplace) le rapport d'un fichier."""
+        with self.conn:
+            self._upsert(report, report_path)
+
+    def sync_directory(self, quality_dir: str = QUALITY_DIR) -> int:
+        """
+        Indexe les validation_report_*.json absents de l'index ou modifiés (taille / mtime)
+        et retire ceux dont le JSON a été supprimé (archivage) ; retourne le nombre de rapports relus.
+        """
+        if not os.path.isdir(quality_dir):
+            return 0
+        known = {
+            row["report_path"]: (row["size"], row["mtime_ns"])
+            for row in self.conn.execute("SELECT report_path, size, mtime_ns FROM reports WHERE report_path IS NOT NULL")
+        }
+        loaded = 0
+        with self.conn:
+            for entry in os.scandir(quality_dir):
+                if not (entry.name.startswith(REPORT_PREFIX) and entry.name.endswith(".json")):
+                    continue
+                st = entry.stat()
+                seen = known.pop(entry.path, None)
+                if seen == (st.st_size, st.st_mtime_ns):
+                    continue
+                try:
+                    with open(entry.path, encoding="utf-8") as f:
+                        report = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                self._upsert(report, entry.path)
+                loaded += 1
+            gone = [path for path in known if os.path.dirname(path) == os.path.abspath(quality_dir)]
+            self.conn.executemany("DELETE FROM reports WHERE report_path = ?", [(path,) for path in gone])
+        return loaded
+
+    # ==============================
+    # 🔎 Requêtes
+    # ==============================
+
+    def counts(self) -> dict:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM reports GROUP BY status").fetchall())
+
+    def last_seq(self) -> int:
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM reports").fetchone()[0]
+
+    def reports(self, status: Optional[str] = None, since_seq: int = 0, limit: Optional[int] = None,
+                offset: int = 0) -> Iterator[dict]:
+        """Rapports (échecs d'abord, puis par nom), filtrés par statut et/ou postérieurs à since_seq."""
+        query = f"SELECT {', '.join(COLUMNS)} FROM reports WHERE seq > ?"
+        params = [since_seq]
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY status != 'failed', filename"
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        for row in self.conn.execute(query, params):
+            report = dict(row)
+            report["errors"] = json.loads(report["errors"] or "[]")
+            yield report
+
+    def cursor(self, consumer: str) -> int:
+        row = self.conn.execute("SELECT seq FROM cursors WHERE consumer = ?", (consumer,)).fetchone()
+        return row[0] if row else 0
+
+    def set_cursor(self, consumer: str, seq: int) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO cursors (consumer, seq, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (consumer) DO UPDATE SET seq = excluded.seq, updated_at = excluded.updated_at",
+                (consumer, seq, datetime.now().isoformat(timespec="seconds")),
+            )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Index SQLite des rapports qualité")
+    parser.add_argument("action", choices=["sync", "stats"])
+    parser.add_argument("--db", default=INDEX_DB, help="Base SQLite de l'index")
+    parser.add_argument("--quality-dir", default=QUALITY_DIR, help="Dossier des rapports JSON")
+    args = parser.parse_args()
+
+    with QualityIndex(args.db) as index:
+        if args.action == "sync":
+            print(f"🗂️ {index.sync_directory(args.quality_dir)} rapport(s) indexé(s) depuis {args.quality_dir}")
+        counts = index.counts()
+        print(f"📊 {sum(counts.values())} rapports : " + ", ".join(f"{k} {v}" for k, v in sorted(counts.items())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
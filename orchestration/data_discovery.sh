@@ -14,62 +14,26 @@ RAW_ARCHIVE="$ARCHIVE_DIR/archive_raw_$TIMESTAMP.tar.gz"
 
 mkdir -p "$ARCHIVE_DIR"
 
+# 🗃️ État incrémental (data/pipeline_state.db) : hash de contenu + taille/mtime
+# Un fichier n'est (re)copié que s'il est nouveau ou a changé depuis son dernier traitement réussi
+STATE_CLI="$PIPELINE_ROOT/transformations/pipeline_state.py"
+has_changed() { python3 "$STATE_CLI" changed --stage "$1" "$2"; }
+mark_processed() { python3 "$STATE_CLI" mark --stage "$1" "$2"; }
+
 echo "🟡 Démarrage du scan dans $RAW_DIR" | tee -a "$LOG_FILE"
 
-# Nombre de fichiers à extraire
+# 1. Logs API (api_logs.zip) : plus d'extraction en staging.
+# Les membres .json.gz sont lus en flux directement dans l'archive par pipeline_scheduler.py
+# et batch_validator.py (chemins virtuels api_logs.zip::membre, max_files premiers membres).
 MAX_FILES_TO_PROC="$1"
 [ -z "$MAX_FILES_TO_PROC" ] && MAX_FILES_TO_PROC=150
 API_LOGS_ZIP="$RAW_DIR/api_logs.zip"
-API_LOGS_DONE="$RAW_DIR/api_logs.zip.done"
-API_LOGS_TMP="$STAGING_DIR/api_logs_tmp"
-API_LOGS_OUT="$STAGING_DIR/api_logs"
-
-# Nombre de workers en parallèle pour la décompression
-DISCOVERY_WORKERS="$1"
-[ -z "$DISCOVERY_WORKERS" ] && DISCOVERY_WORKERS=4  # fallback si absent
-
-if [ -f "$API_LOGS_ZIP" ] && [ ! -f "$API_LOGS_DONE" ]; then
-    echo "📦 Extraction optimisée de api_logs.zip (max $MAX_FILES_TO_PROC fichiers)" | tee -a "$LOG_FILE"
-    mkdir -p "$API_LOGS_TMP" "$API_LOGS_OUT"
-
-    # 🗂️ Liste les N premiers fichiers .json.gz dans l’archive
-    FILES_TO_EXTRACT=$(unzip -Z1 "$API_LOGS_ZIP" '*.json.gz' | head -n "$MAX_FILES_TO_PROC")
-
-    # 📤 Extraction d’un coup
-    echo "$FILES_TO_EXTRACT" | xargs -I {} unzip -j "$API_LOGS_ZIP" "{}" -d "$API_LOGS_TMP" >> "$LOG_FILE"
-
-    export API_LOGS_OUT  # nécessaire pour le sous-processus
-    find "$API_LOGS_TMP" -name '*.json.gz' | parallel -j "$DISCOVERY_WORKERS" '
-        gzfile="{}"
-        filename=$(basename "$gzfile" .gz)
-        json_out="$API_LOGS_OUT/$filename"
-
-        first_char=$(gunzip -c "$gzfile" | head -c 1)
-
-        if [[ "$first_char" == "[" ]]; then
-            if gunzip -c "$gzfile" | jq -c ".[]" > "$json_out"; then
-                echo "✅ Décompressé + converti JSON array : $filename"
-            else
-                echo "❌ Conversion échouée (array mal formé) : $filename"
-                rm -f "$json_out"
-            fi
-        else
-            if gunzip -c "$gzfile" > "$json_out"; then
-                echo "✅ Décompressé JSON lines : $filename"
-            else
-                echo "❌ Décompression échouée : $filename"
-                rm -f "$json_out"
-            fi
-        fi
-    '
-
-    # Nettoyage
-    rm -rf "$API_LOGS_TMP"
-    touch "$API_LOGS_DONE"
-    echo "✅ api_logs.zip traité et marqué .done" | tee -a "$LOG_FILE"
 
+if [ -f "$API_LOGS_ZIP" ]; then
+    NB_MEMBERS=$(python3 -c "import sys, zipfile; print(sum(n.endswith('.json.gz') for n in zipfile.ZipFile(sys.argv[1]).namelist()))" "$API_LOGS_ZIP")
+    echo "📦 api_logs.zip : $NB_MEMBERS fichiers .json.gz, lus en flux (max $MAX_FILES_TO_PROC)" | tee -a "$LOG_FILE"
 else
-    echo "⏭️  api_logs.zip déjà traité ou absent" | tee -a "$LOG_FILE"
+    echo "⏭️  api_logs.zip absent" | tee -a "$LOG_FILE"
 fi
 
 
@@ -81,14 +45,13 @@ mkdir -p "$SESSION_DEST"
 if [ -d "$SESSION_SRC" ]; then
     find "$SESSION_SRC" -maxdepth 1 -type f -name "sessions_*.csv" | while read -r file; do
         filename=$(basename "$file")
-        done_marker="$SESSION_SRC/$filename.done"
 
-        if [ ! -f "$done_marker" ]; then
-            cp "$file" "$SESSION_DEST/$filename"
-            touch "$done_marker"
+        # cp -p conserve le mtime : la copie de staging a la même empreinte que le fichier brut
+        if has_changed sessions "$file"; then
+            cp -p "$file" "$SESSION_DEST/$filename"
             echo "📥 Session copiée : $filename" | tee -a "$LOG_FILE"
         else
-            echo "⏭️  Session déjà traitée : $filename" | tee -a "$LOG_FILE"
+            echo "⏭️  Session inchangée depuis le dernier traitement : $filename" | tee -a "$LOG_FILE"
         fi
     done
 else
@@ -100,13 +63,15 @@ fi
 mkdir -p "$STAGING_DIR/sales_data"
 for sales_file in "products_catalog.csv" "products_catalog.xlsx" "users_database.csv"; do
     src_file="$RAW_DIR/$sales_file"
-    done_marker="$RAW_DIR/$sales_file.done"
-    if [ -f "$src_file" ] && [ ! -f "$done_marker" ]; then
-        cp "$src_file" "$STAGING_DIR/sales_data/$sales_file"
-        touch "$done_marker"
+    case "$sales_file" in
+        users_*) stage="users" ;;
+        *) stage="products" ;;
+    esac
+    if [ -f "$src_file" ] && has_changed "$stage" "$src_file"; then
+        cp -p "$src_file" "$STAGING_DIR/sales_data/$sales_file"
         echo "📥 Fichier ventes copié : $sales_file" | tee -a "$LOG_FILE"
     else
-        echo "⏭️  Fichier déjà traité ou absent : $sales_file" | tee -a "$LOG_FILE"
+        echo "⏭️  Fichier inchangé ou absent : $sales_file" | tee -a "$LOG_FILE"
     fi
 done
 
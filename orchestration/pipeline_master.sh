@@ -7,6 +7,9 @@ LOG_DIR="$PIPELINE_ROOT/logs"        # Répertoire pour stocker les fichiers de
 mkdir -p "$LOG_DIR"                  # Création du dossier logs si nécessaire
 LOG_FILE="$LOG_DIR/pipeline_$(date '+%Y%m%d_%H%M%S').log"  # Fichier de log horodaté
 
+# Identifiant d'exécution partagé par tous les scripts Python (métriques : logs/metrics_<run_id>.jsonl)
+export PIPELINE_RUN_ID="${PIPELINE_RUN_ID:-$(date '+%Y%m%d_%H%M%S')_$$}"
+
 
 echo "📂 Répertoire racine détecté : $PIPELINE_ROOT"
 
@@ -97,12 +100,12 @@ scan_data_sources() {
 distribute_processing() {
     echo "⚙️ Lancement du traitement avec $DATA_WORKERS workers..." | tee -a "$LOG_FILE"
     # Appel du gestionnaire de traitement parallèle avec passage du nombre de workers
-    "$PIPELINE_ROOT/orchestration/worker_manager.sh" "$DATA_WORKERS" "$CHUNK_SIZE_ROWS" >> "$LOG_FILE" 2>&1
+    "$PIPELINE_ROOT/orchestration/worker_manager.sh" "$DATA_WORKERS" "$CHUNK_SIZE_ROWS" "$MAX_FILES" >> "$LOG_FILE" 2>&1
 }
 
 monitor_data_quality() {
     echo "🧪 Vérification qualité..." | tee -a "$LOG_FILE"
-    bash "$PIPELINE_ROOT/orchestration/quality_monitor.sh" "$QUALITY_THRESHOLD" "$DATA_WORKERS" >> "$LOG_FILE" 2>&1
+    bash "$PIPELINE_ROOT/orchestration/quality_monitor.sh" "$QUALITY_THRESHOLD" "$DATA_WORKERS" "$CHUNK_SIZE_ROWS" "$MAX_FILES" >> "$LOG_FILE" 2>&1
 }
 run_alert_manager() {
     echo "📣 Analyse des alertes qualité..." | tee -a "$LOG_FILE"
@@ -116,6 +119,12 @@ run_alert_manager() {
     fi
 }
 
+rollup_kpis() {
+    echo "📆 Consolidation hebdomadaire / mensuelle des KPI API..." | tee -a "$LOG_FILE"
+    # Fusion des partiels journaliers (compteurs, sommes, résumés hll_ / topk_) : les logs ne sont pas relus
+    python3 "$PIPELINE_ROOT/processing/kpi_rollup.py" --period week month >> "$LOG_FILE" 2>&1
+}
+
 consolidate_data_results() {
     echo "📦 consolidation des résultats multi-sources..." | tee -a "$LOG_FILE"
 
@@ -160,11 +169,19 @@ archive_processed_data() {
     echo "🧼 Nettoyage de data/raw et data/staging" | tee -a "$LOG_FILE"
     # find "$PIPELINE_ROOT/data/raw" -type f ! -name "*.zip" -exec rm -f {} \;
     find "$PIPELINE_ROOT/data/staging" -type f -exec rm -f {} \;
-    find "$PIPELINE_ROOT/data/raw" -type f -name "*.done" -exec rm -f {} \;
+    # L'état incrémental (data/pipeline_state.db) est conservé : seuls les fichiers modifiés seront retraités
 
     echo "✅ Archivage complet terminé." | tee -a "$LOG_FILE"
 }
 
+summarize_run_metrics() {
+    echo "⏱️ Résumé des métriques d'exécution ($PIPELINE_RUN_ID)..." | tee -a "$LOG_FILE"
+    python3 "$PIPELINE_ROOT/monitoring/instrumentation.py" summary --run-id "$PIPELINE_RUN_ID" \
+        --json "$LOG_DIR/metrics_${PIPELINE_RUN_ID}_summary.json" | tee -a "$LOG_FILE"
+    # Historique (data/metrics_history.db) : tendances du dashboard et détection de dérive
+    python3 "$PIPELINE_ROOT/monitoring/data_metrics.py" record-stages --run-id "$PIPELINE_RUN_ID" | tee -a "$LOG_FILE"
+}
+
 generate_dashboard() {
     echo "📊 Génération du dashboard HTML..." | tee -a "$LOG_FILE"
     "$PIPELINE_ROOT/monitoring/dashboard_gen.py" >> "$LOG_FILE" 2>&1
@@ -186,10 +203,12 @@ echo "🚀 DÉMARRAGE DU PIPELINE À $(date)" | tee -a "$LOG_FILE"
 initialize_data_pipeline        # Étape d'initialisation => dev ok
 scan_data_sources               # Détection des fichiers nouveaux => dev ok
 distribute_processing           # Lancement du traitement des données => dev ok
+rollup_kpis                     # KPI API par semaine / mois à partir des partitions journalières
 consolidate_data_results          # (optionnel) Fusion des résultats => dev ok
 monitor_data_quality            # Contrôle qualité avant-traitement => dev ok
 run_alert_manager
 generate_dashboard              # Génére le tableau de bord html de la qualité de donnée
+summarize_run_metrics           # Temps / CPU / mémoire / volumes par étape (vs exécution précédente)
 # archive_processed_data          # Archivage des fichiers traités
 echo "✅ PIPELINE TERMINÉ À $(date)" | tee -a "$LOG_FILE"
 # 🧹 Correction des permissions pour le runner GitHub
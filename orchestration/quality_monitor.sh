@@ -6,6 +6,7 @@
 # 📍 Chemins
 PIPELINE_ROOT="$(dirname "$0")/.."
 STAGING_DIR="$PIPELINE_ROOT/data/staging"
+API_LOGS_ZIP="$PIPELINE_ROOT/data/raw/api_logs.zip"
 CONFIG_DIR="$PIPELINE_ROOT/config"
 QUALITY_DIR="$PIPELINE_ROOT/data/quality"
 QUALITY_LOG="$QUALITY_DIR/quality_alert.txt"
@@ -13,57 +14,32 @@ QUALITY_LOG="$QUALITY_DIR/quality_alert.txt"
 mkdir -p "$QUALITY_DIR"
 > "$QUALITY_LOG"
 
-# ✅ Paramètres : seuil + workers
+# ✅ Paramètres : seuil + workers (+ taille de chunk et nb max de fichiers de api_logs.zip optionnels)
 QUALITY_THRESHOLD="$1"
 QUALITY_WORKERS="$2"
+QUALITY_CHUNK_SIZE="$3"
+MAX_FILES="$4"
 
 # Fallbacks
 [ -z "$QUALITY_THRESHOLD" ] && QUALITY_THRESHOLD=90
 [ -z "$QUALITY_WORKERS" ] && QUALITY_WORKERS=4
 
-echo "📊 Contrôle Qualité : Seuil=$QUALITY_THRESHOLD% | Workers=$QUALITY_WORKERS"
+echo "📊 Contrôle Qualité : Seuil=$QUALITY_THRESHOLD% | Workers=$QUALITY_WORKERS | Chunk=${QUALITY_CHUNK_SIZE:-fichier entier}"
 echo "🔍 Dossier à analyser : $STAGING_DIR"
 
-# Fonction de validation pour un fichier
-validate_file() {
-    file="$1"
-    filename=$(basename "$file")
-
-    # Déduire le type de source
-    if [[ "$filename" == api_logs_* ]]; then
-        source_type="logs"
-    elif [[ "$filename" == sessions_* ]]; then
-        source_type="sessions"
-    elif [[ "$filename" == users_* ]]; then
-        source_type="users"
-    elif [[ "$filename" == products_* ]]; then
-        source_type="products"
-    else
-        echo "⚠️  Type inconnu : $filename" >> "$QUALITY_LOG"
-        return
-    fi
-
-    # Appel du validateur Python
-    python3 "$PIPELINE_ROOT/processing/data_validator.py" \
-        --input "$file" \
-        --source "$source_type" \
-        --threshold "$QUALITY_THRESHOLD" \
-        --check-schema \
-        --check-anomalies \
-        --check-coherence
-
-    if [[ $? -ne 0 ]]; then
-        echo "🚫 Fichier rejeté : $filename" >> "$QUALITY_LOG"
-    else
-        echo "✅ Qualité OK : $filename"
-    fi
-}
-
-export -f validate_file
-export PIPELINE_ROOT CONFIG_DIR QUALITY_LOG QUALITY_THRESHOLD
-
-# Lancement en parallèle avec xargs
-find "$STAGING_DIR" -type f | xargs -P "$QUALITY_WORKERS" -I{} bash -c 'validate_file "$@"' _ {}
+# Validation de tout le dossier en un seul appel Python :
+# la configuration est chargée une fois, les fichiers sont répartis sur un pool de processus
+python3 "$PIPELINE_ROOT/processing/batch_validator.py" \
+    --input-dir "$STAGING_DIR" \
+    --logs-zip "$API_LOGS_ZIP" \
+    ${MAX_FILES:+--max-files "$MAX_FILES"} \
+    --threshold "$QUALITY_THRESHOLD" \
+    --workers "$QUALITY_WORKERS" \
+    --alert-log "$QUALITY_LOG" \
+    ${QUALITY_CHUNK_SIZE:+--chunksize "$QUALITY_CHUNK_SIZE"} \
+    --check-schema \
+    --check-anomalies \
+    --check-coherence
 
 echo "✅ Contrôle qualité terminé."
 exit 0
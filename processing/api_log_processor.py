@@ -4,48 +4,96 @@
 import os
 import sys
 import argparse
-import pandas as pd
 from datetime import datetime
 
 # Ajout du chemin racine pour import des modules de transformations
 pipeline_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, pipeline_root)
 
+from transformations.data_reader import iter_json_chunks, load_source_schema, path_exists, source_name
 from transformations.data_cleaner import clean_api_logs
-from transformations.data_enricher import enrich_api_logs
-from transformations.data_aggregator import aggregate_api_logs
+from transformations.deduplicator import make_deduplicator
+from transformations.data_enricher import drop_enriched, enrich_api_logs
+from transformations.data_aggregator import (
+    API_LOGS_DIMENSIONS,
+    partial_aggregate_api_logs,
+    merge_partial_aggregates,
+)
 from transformations.data_formatter import export_api_logs_partitioned
+from transformations.pipeline_state import process_if_changed
+from transformations.chunk_sizing import chunk_sizer
+from monitoring.instrumentation import iter_stage, stage
 
-# 🎯 Arguments CLI
-parser = argparse.ArgumentParser(description="Traitement des logs API")
-parser.add_argument('--input', required=True, help="Fichier JSONL (logs API ligne par ligne)")
-parser.add_argument('--chunksize', type=int, default=100_000, help="Taille des chunks (lignes)")
-args = parser.parse_args()
-
-input_path = args.input
-chunksize = args.chunksize
-print(f"🐛 chunksize reçu via argparse : {chunksize}")
-if not os.path.exists(input_path):
-    print(f"❌ Fichier introuvable : {input_path}")
-    sys.exit(1)
-
-# 📥 Lecture du JSON ligne par ligne en chunks
-try:
-    chunks = pd.read_json(input_path, lines=True, chunksize=chunksize)
-except Exception as e:
-    print(f"❌ Erreur de lecture JSONL en chunks : {e}")
-    sys.exit(1)
-
-# 💾 Accumulation des morceaux nettoyés et enrichis
-processed_chunks = []
-
-for i, chunk in enumerate(chunks):
-    print(f"🔢 Traitement du chunk {i + 1}...")
-    chunk_cleaned = clean_api_logs(chunk)
-    chunk_enriched = enrich_api_logs(chunk_cleaned, input_path, append=True)
-    processed_chunks.append(chunk_enriched)
-
-# 🧱 Concaténation + agrégation
-df_full = pd.concat(processed_chunks, ignore_index=True)
-df_agg = aggregate_api_logs(df_full)
-export_api_logs_partitioned(df_agg, input_path)
+
+def process_api_logs(input_path: str, chunksize: int = 100_000) -> dict:
+    """
+    Nettoie, enrichit et agrège un fichier de logs API, puis exporte les KPI.
+    input_path : JSON lines ou tableau JSON, .json.gz, ou membre de api_logs.zip (archive.zip::membre).
+    chunksize : nombre de lignes, ou ChunkSizer (chunks dimensionnés selon le budget mémoire du worker).
+    Chaque chunk enrichi est écrit comme une part de logs_enriched (sans verrou global).
+    Retourne les volumes traités (lignes lues / conservées).
+    """
+    # 📥 Lecture en flux (décompression à la volée, sans fichier intermédiaire),
+    # parsée par le backend configuré (json_backend) et typée selon le schéma "logs" (dtypes compacts)
+    # ⏱️ Chaque étape (par chunk) est mesurée dans logs/metrics_<run_id>.jsonl
+    source = source_name(input_path)
+    schema = load_source_schema("logs")
+    chunks = iter_stage("api_logs", "read", iter_json_chunks(
+        input_path, chunksize, column_types=schema["types"], categorical=schema["categorical"]
+    ), source)
+
+    # 🌊 Agrégation en flux : seuls les agrégats partiels (1 ligne par groupe) sont conservés
+    partial = None
+    rows_in = rows_out = 0
+    dropped = {}  # lignes retirées par étape de nettoyage, tous chunks confondus
+    deduplicator = make_deduplicator()  # request_id déjà vus dans les chunks précédents
+    drop_enriched("logs_enriched", input_path)  # parts d'une exécution précédente de ce fichier
+
+    for i, chunk in enumerate(chunks):
+        print(f"🔢 Traitement du chunk {i + 1}...")
+        rows_in += len(chunk)
+        with stage("api_logs", "clean", source, i, rows_in=len(chunk)) as m:
+            chunk_cleaned = clean_api_logs(chunk, report=dropped, deduplicator=deduplicator)
+            m["rows_out"] = len(chunk_cleaned)
+        # enrich : inclut l'écriture de la part logs_enriched
+        with stage("api_logs", "enrich", source, i, rows_in=len(chunk_cleaned)) as m:
+            chunk_enriched = enrich_api_logs(chunk_cleaned, input_path, part_index=i)
+            m["rows_out"] = len(chunk_enriched)
+        rows_out += len(chunk_enriched)
+        with stage("api_logs", "aggregate", source, i, rows_in=len(chunk_enriched)) as m:
+            partial = merge_partial_aggregates(
+                [partial, partial_aggregate_api_logs(chunk_enriched)], API_LOGS_DIMENSIONS
+            )
+            m["rows_out"] = len(partial)
+
+    # 🧱 Export : fusion avec les autres fichiers du même jour, moyennes finalisées par partition
+    if partial is None or partial.empty:
+        print("⚠️  Aucun log exploitable après nettoyage, aucun export.")
+        export_api_logs_partitioned(None, input_path)  # KPI d'une exécution précédente de ce fichier retirés
+        return {"rows_in": rows_in, "rows_out": rows_out, "dropped": dropped}
+
+    with stage("api_logs", "export", source, rows_in=len(partial)):
+        export_api_logs_partitioned(partial, input_path)
+    return {"rows_in": rows_in, "rows_out": rows_out, "dropped": dropped}
+
+
+if __name__ == "__main__":
+    # 🎯 Arguments CLI
+    parser = argparse.ArgumentParser(description="Traitement des logs API")
+    parser.add_argument('--input', required=True, help="Fichier JSONL / .json.gz ou membre d'archive (api_logs.zip::membre)")
+    parser.add_argument('--chunksize', type=int, default=100_000, help="Taille des chunks (lignes)")
+    parser.add_argument('--force', action='store_true', help="Retraite le fichier même s'il est inchangé")
+    args = parser.parse_args()
+
+    input_path = args.input
+    chunksize = chunk_sizer(args.chunksize)  # ChunkSizer si worker_memory_mb est défini
+    print(f"🐛 chunksize reçu via argparse : {chunksize}")
+    if not path_exists(input_path):
+        print(f"❌ Fichier introuvable : {input_path}")
+        sys.exit(1)
+
+    try:
+        process_if_changed("api_logs", input_path, process_api_logs, chunksize, force=args.force)
+    except ValueError as e:
+        print(f"❌ Erreur de lecture JSONL en chunks : {e}")
+        sys.exit(1)
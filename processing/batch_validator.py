@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# 🧪 Validation qualité d'un dossier complet : un seul interpréteur, un pool de processus
+
+import sys
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# 📁 Ajout du chemin racine pour import des modules de transformations
+PIPELINE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PIPELINE_ROOT)
+
+from transformations.data_reader import list_zip_members, source_name
+from transformations.data_validation import (
+    SOURCE_PREFIXES,
+    load_validation_config,
+    compile_validation_plan,
+    detect_source,
+    validate_file,
+    write_report,
+)
+from monitoring.instrumentation import stage
+
+# ===============================
+# 👷 Worker : plans compilés une seule fois par processus
+# ===============================
+
+_PLANS = {}
+
+
+def _init_worker(config: dict) -> None:
+    for _, source in SOURCE_PREFIXES:
+        _PLANS[source] = compile_validation_plan(source, config)
+
+
+def _validate_one(path: str, source: str, threshold, check_anomalies: bool, chunksize):
+    """Valide un fichier et écrit son rapport ; retourne (chemin, statut, détail)."""
+    try:
+        with stage("validator", "validate", source_name(path), data_source=source):
+            report = validate_file(path, _PLANS[source], threshold, check_anomalies, chunksize)
+    except Exception as e:
+        return path, "error", f"Erreur de lecture : {e}"
+    report_path = write_report(report)
+    return path, report["status"], report_path
+
+
+def list_files(input_dir: str):
+    """Liste récursive des fichiers (équivalent de find -type f)."""
+    for root, _, files in os.walk(input_dir):
+        for name in sorted(files):
+            yield os.path.join(root, name)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Validation qualité d'un dossier (pool de processus)")
+    parser.add_argument('--input-dir', required=True, help="Dossier à valider (ex : data/staging)")
+    parser.add_argument('--threshold', type=int, help="Seuil de complétude minimum (%)")
+    parser.add_argument('--workers', type=int, default=4, help="Nombre de processus de validation")
+    parser.add_argument('--chunksize', type=int, default=None, help="Validation par chunks (lignes)")
+    parser.add_argument('--alert-log', default=None, help="Fichier où tracer les fichiers rejetés")
+    parser.add_argument('--logs-zip', default=None, help="Archive api_logs.zip dont les membres .json.gz sont validés en flux")
+    parser.add_argument('--max-files', type=int, default=None, help="Nombre max de membres lus dans l'archive")
+    parser.add_argument('--check-schema', action='store_true', help="Valider le schéma")
+    parser.add_argument('--check-anomalies', action='store_true', help="Détecter les anomalies statistiques")
+    parser.add_argument('--check-coherence', action='store_true', help="Contrôles inter-fichiers")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.input_dir):
+        print(f"❌ Dossier introuvable : {args.input_dir}")
+        return 1
+
+    try:
+        config = load_validation_config()
+    except Exception as e:
+        print(f"❌ Erreur chargement des fichiers de configuration : {e}")
+        return 1
+
+    alerts = []
+    tasks = []
+    paths = list(list_files(args.input_dir))
+    if args.logs_zip:
+        paths += list_zip_members(args.logs_zip, max_files=args.max_files)
+    for path in paths:
+        source = detect_source(source_name(path))
+        if source is None:
+            alerts.append(f"⚠️  Type inconnu : {source_name(path)}")
+            continue
+        tasks.append((path, source))
+
+    print(f"📊 {len(tasks)} fichiers à valider avec {args.workers} workers")
+
+    nb_failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), initializer=_init_worker, initargs=(config,)) as pool:
+        futures = [
+            pool.submit(_validate_one, path, source, args.threshold, args.check_anomalies, args.chunksize)
+            for path, source in tasks
+        ]
+        for future in as_completed(futures):
+            path, status, detail = future.result()
+            filename = source_name(path)
+            if status == "passed":
+                print(f"📝 Rapport sauvegardé : {detail}")
+                print(f"✅ Qualité OK : {filename}")
+            else:
+                nb_failed += 1
+                print(f"❌ {detail}" if status == "error" else f"📝 Rapport sauvegardé : {detail}")
+                alerts.append(f"🚫 Fichier rejeté : {filename}")
+
+    if args.alert_log and alerts:
+        with open(args.alert_log, "a", encoding="utf-8") as f:
+            f.write("\n".join(alerts) + "\n")
+
+    print(f"✅ Validation terminée : {len(tasks) - nb_failed} OK / {nb_failed} rejetés")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,6 @@
 
 import sys
 import argparse
-import pandas as pd
 import os
 from datetime import datetime
 
@@ -11,64 +10,97 @@ from datetime import datetime
 pipeline_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, pipeline_root)
 
-# ==============================
-# 🎯 Argument en ligne de commande
-# ==============================
-
-parser = argparse.ArgumentParser(description="Analyse des ventes web")
-parser.add_argument('--input', required=True, help="Fichier CSV des ventes utilisateur")
-parser.add_argument('--chunksize', type=int, default=None, help="Taille de chunk pour traitement par morceaux")
-args = parser.parse_args()
-input_path = args.input
-chunksize = args.chunksize
-
-# ==============================
-# 📥 Lecture du fichier (par chunk ou complet)
-# ==============================
-
-if not os.path.exists(input_path):
-    print(f"❌ Fichier introuvable : {input_path}")
-    sys.exit(1)
-
+from transformations.data_reader import concat_chunks, read_csv_schema, source_name
 from transformations.data_cleaner import clean_user_data
-from transformations.data_enricher import enrich_user_data
+from transformations.deduplicator import make_deduplicator
+from transformations.data_enricher import drop_enriched, enrich_user_data
+from transformations.data_aggregator import aggregate_user_data
+from transformations.data_formatter import export_user_data_partitioned
+from transformations.pipeline_state import process_if_changed
+from transformations.chunk_sizing import chunk_sizer
+from monitoring.instrumentation import iter_stage, stage
+
 
-try:
+def process_users(input_path: str, chunksize: int = None) -> dict:
+    """
+    Nettoie, enrichit, agrège et exporte le fichier CSV des utilisateurs.
+    Retourne les volumes traités (lignes lues / conservées).
+    """
+    # ==============================
+    # 📥 Lecture du fichier (par chunk ou complet), typée selon le schéma "users"
+    # ==============================
+    rows_in = 0
+    dropped = {}  # lignes retirées par étape de nettoyage
+    source = source_name(input_path)  # ⏱️ étapes mesurées dans logs/metrics_<run_id>.jsonl
+    drop_enriched("sales_enriched", input_path)  # parts d'une exécution précédente de ce fichier
     if chunksize:
-        chunk_iter = pd.read_csv(input_path, chunksize=chunksize)
+        chunk_iter = iter_stage("users", "read", read_csv_schema(input_path, "users", chunksize), source)
         df_list = []
+        deduplicator = make_deduplicator()  # user_id déjà vus dans les chunks précédents
 
         for i, chunk in enumerate(chunk_iter):
             print(f"🔹 Chunk {i+1} en traitement ({len(chunk)} lignes)")
-            chunk = clean_user_data(chunk)
-            chunk = enrich_user_data(chunk, input_path)
+            rows_in += len(chunk)
+            with stage("users", "clean", source, i, rows_in=len(chunk)) as m:
+                chunk = clean_user_data(chunk, report=dropped, deduplicator=deduplicator)
+                m["rows_out"] = len(chunk)
+            with stage("users", "enrich", source, i, rows_in=len(chunk)):
+                chunk = enrich_user_data(chunk, input_path, part_index=i)
             df_list.append(chunk)
 
-        df = pd.concat(df_list, ignore_index=True)
+        df = concat_chunks(df_list)
     else:
-        df = pd.read_csv(input_path)
-        df = clean_user_data(df)
-        df = enrich_user_data(df, input_path)
+        with stage("users", "read", source) as m:
+            df = read_csv_schema(input_path, "users")
+            m["rows_out"] = len(df)
+        rows_in = len(df)
+        with stage("users", "clean", source, rows_in=len(df)) as m:
+            df = clean_user_data(df, report=dropped)
+            m["rows_out"] = len(df)
+        with stage("users", "enrich", source, rows_in=len(df)):
+            df = enrich_user_data(df, input_path)
 
     print("🧹 Nettoyage + ✨ Enrichissement OK")
 
-except Exception as e:
-    print(f"❌ Erreur de lecture ou de traitement : {e}")
-    sys.exit(1)
+    # ============================
+    # 📊 Agrégation
+    # ============================
+    with stage("users", "aggregate", source, rows_in=len(df)) as m:
+        df_agg = aggregate_user_data(df)
+        m["rows_out"] = len(df_agg)
+    print("📊 Agrégation OK")
 
-# ============================
-# 📊 Agrégation
-# ============================
-from transformations.data_aggregator import aggregate_user_data
-df_agg = aggregate_user_data(df)
-print("📊 Agrégation OK")
+    # ============================
+    # 💾 Export partitionné
+    # ============================
+    with stage("users", "export", source, rows_in=len(df_agg)):
+        export_user_data_partitioned(df_agg, input_path)
+    print("💾 Export OK")
 
-# ============================
-# 💾 Export partitionné
-# ============================
-from transformations.data_formatter import export_user_data_partitioned
-export_user_data_partitioned(df_agg, input_path)
-print("💾 Export OK")
+    return {"rows_in": rows_in, "rows_out": len(df), "dropped": dropped}
+
+
+if __name__ == "__main__":
+    # ==============================
+    # 🎯 Argument en ligne de commande
+    # ==============================
+    parser = argparse.ArgumentParser(description="Analyse des ventes web")
+    parser.add_argument('--input', required=True, help="Fichier CSV des ventes utilisateur")
+    parser.add_argument('--chunksize', type=int, default=None, help="Taille de chunk pour traitement par morceaux")
+    parser.add_argument('--force', action='store_true', help="Retraite le fichier même s'il est inchangé")
+    args = parser.parse_args()
+    input_path = args.input
+    chunksize = chunk_sizer(args.chunksize)  # ChunkSizer si worker_memory_mb est défini
+
+    if not os.path.exists(input_path):
+        print(f"❌ Fichier introuvable : {input_path}")
+        sys.exit(1)
+
+    try:
+        process_if_changed("users", input_path, process_users, chunksize, force=args.force)
+    except Exception as e:
+        print(f"❌ Erreur de lecture ou de traitement : {e}")
+        sys.exit(1)
 
-print("✅ Traitement des ventes terminé.")
-sys.exit(0)
+    print("✅ Traitement des ventes terminé.")
+    sys.exit(0)
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# 📆 Consolidation des KPI API journaliers en semaines ISO / mois (fusion des partiels et résumés, sans relire les logs)
+
+import os
+import sys
+import argparse
+
+pipeline_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, pipeline_root)
+
+from transformations.data_formatter import ROLLUP_PERIODS, rollup_api_logs
+from monitoring.instrumentation import stage
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consolidation hebdomadaire / mensuelle des KPI API")
+    parser.add_argument('--period', nargs='+', choices=sorted(ROLLUP_PERIODS), default=["week", "month"],
+                        help="Périodes à consolider")
+    parser.add_argument('--force', action='store_true', help="Reconsolide même les périodes inchangées")
+    args = parser.parse_args()
+
+    for period in args.period:
+        with stage("api_logs", "rollup", period):
+            written = rollup_api_logs(period, force=args.force)
+        for path in written:
+            print(f"📆 KPI {period} : {path}")
+        if not written:
+            print(f"⏭️  KPI {period} : aucune partition modifiée")
+    sys.exit(0)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# ⚙️ Ordonnanceur Python : traite les fichiers de staging dans un pool de processus
+
+import sys
+import argparse
+import os
+import json
+import time
+from fnmatch import fnmatch
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# 📁 Ajout du chemin racine pour import des modules
+PIPELINE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PIPELINE_ROOT)
+
+from transformations.chunk_sizing import chunk_sizer, task_memory_mb
+from transformations.data_reader import is_zip_member, list_zip_members, source_name, zip_member_info
+from transformations.data_storage import data_path, load_pipeline_config
+from transformations.pipeline_state import process_if_changed
+from processing.api_log_processor import process_api_logs
+from processing.session_processor import process_sessions
+from processing.business_processor import process_users
+from processing.product_processor import process_products
+from monitoring.instrumentation import METRICS_DIR
+
+# ==============================
+# 🧭 Routage : motif de fichier → traitement (mêmes motifs que worker_manager.sh)
+# ==============================
+
+ROUTES = [
+    (("api_logs_*.json",), "api_logs", process_api_logs),
+    (("sessions_*.csv",), "sessions", process_sessions),
+    (("users_database.csv",), "users", process_users),
+    (("products_catalog.csv", "products_catalog.xlsx"), "products", process_products),
+]
+
+
+def route_file(filename: str):
+    """Retourne la route correspondant au nom de fichier (None si non pris en charge)."""
+    for patterns, name, func in ROUTES:
+        if any(fnmatch(filename, p) for p in patterns):
+            return name, func
+    return None
+
+
+def discover_files(staging_dir: str):
+    """Liste récursive des fichiers de staging (équivalent de find -type f)."""
+    for root, _, files in os.walk(staging_dir):
+        for name in sorted(files):
+            yield os.path.join(root, name)
+
+
+def input_size(path: str) -> int:
+    """Taille du fichier (décompressée pour un membre d'archive)."""
+    return zip_member_info(path).file_size if is_zip_member(path) else os.path.getsize(path)
+
+
+# ==============================
+# 🧮 Admission selon le budget mémoire
+# ==============================
+
+def next_admissible(pending: list, reserved_mb: float, budget_mb: float, running: int) -> int:
+    """
+    Index de la première tâche en attente dont la réservation tient dans le budget restant
+    (-1 si aucune). Sans budget, ou si rien ne tourne, la première tâche est toujours admise.
+    """
+    if not budget_mb or not running:
+        return 0
+    for i, task in enumerate(pending):
+        if reserved_mb + task["memory_mb"] <= budget_mb:
+            return i
+    return -1
+
+
+# ==============================
+# 👷 Exécution d'une tâche (dans un processus du pool)
+# ==============================
+
+def run_task(name: str, func, input_path: str, chunksize: int, force: bool = False) -> dict:
+    """
+    Exécute un traitement ; chaque worker écrit ses propres parts enrichies
+    (PartSink), sans écrivain unique ni fichier partagé en append.
+    Les fichiers inchangés depuis leur dernier traitement réussi sont ignorés.
+    """
+    start = time.perf_counter()
+    try:
+        stats = process_if_changed(name, input_path, func, chunksize, force=force)
+        if stats is None:
+            return {"status": "skip", "seconds": round(time.perf_counter() - start, 3)}
+        return {"status": "ok", "seconds": round(time.perf_counter() - start, 3), **stats}
+    except Exception as e:
+        return {"status": "error", "seconds": round(time.perf_counter() - start, 3), "error": str(e)}
+
+
+def main() -> int:
+    config = load_pipeline_config()
+
+    parser = argparse.ArgumentParser(description="Traitement parallèle des fichiers de staging")
+    parser.add_argument('--staging-dir', default=data_path("staging"), help="Dossier des fichiers à traiter")
+    parser.add_argument('--workers', type=int, default=config.get("data_workers", 1), help="Nombre de processus")
+    parser.add_argument('--chunksize', type=int, default=config.get("chunk_size_rows", 100_000), help="Taille des chunks")
+    parser.add_argument('--force', action='store_true', help="Retraite tous les fichiers, même inchangés")
+    parser.add_argument('--logs-zip', default=data_path("raw", "api_logs.zip"),
+                        help="Archive dont les membres .json.gz sont lus en flux (sans extraction en staging)")
+    parser.add_argument('--max-files', type=int, default=config.get("max_files"), help="Nombre max de membres lus dans l'archive")
+    args = parser.parse_args()
+
+    # 🔎 Découverte (staging + membres de api_logs.zip) + routage
+    paths = list(discover_files(args.staging_dir)) + list_zip_members(args.logs_zip, max_files=args.max_files)
+    tasks = []
+    for path in paths:
+        route = route_file(source_name(path))
+        if route is None:
+            print(f"⚠️  Type de fichier inconnu ou non pris en charge : {source_name(path)}")
+            continue
+        name, func = route
+        tasks.append({"path": path, "name": name, "func": func})
+
+    workers = max(1, args.workers)
+    # 🧮 Budget mémoire : worker_memory_mb (chunks adaptatifs par worker), memory_budget_mb (admission)
+    worker_mb = float(config.get("worker_memory_mb", 0) or 0)
+    budget_mb = float(config.get("memory_budget_mb", 0) or 0)
+    for task in tasks:
+        task["memory_mb"] = min(task_memory_mb(input_size(task["path"]), worker_mb), budget_mb or float("inf"))
+    if budget_mb:
+        print(f"⚙️ Lancement de {len(tasks)} traitements, budget {budget_mb:.0f} Mo (≤ {workers} workers, chunk adaptatif)")
+    else:
+        print(f"⚙️ Lancement de {len(tasks)} traitements sur {workers} workers (chunk={args.chunksize})")
+
+    results = []
+    pending = list(tasks)
+    running = {}
+    reserved_mb = 0.0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            # Admission : tant qu'un worker est libre et que la réservation tient dans le budget total
+            while pending and len(running) < workers:
+                index = next_admissible(pending, reserved_mb, budget_mb, len(running))
+                if index < 0:
+                    break
+                task = pending.pop(index)
+                chunksize = chunk_sizer(args.chunksize, budget_mb=task["memory_mb"]) if (worker_mb or budget_mb) else args.chunksize
+                print(f"▶️  Traitement de {source_name(task['path'])}"
+                      + (f" (réservé : {task['memory_mb']:.0f} Mo)" if budget_mb else ""))
+                future = pool.submit(run_task, task["name"], task["func"], task["path"], chunksize, args.force)
+                running[future] = task
+                reserved_mb += task["memory_mb"]
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                reserved_mb -= task["memory_mb"]
+                path, name = task["path"], task["name"]
+                result = future.result()
+                if result["status"] == "ok":
+                    print(f"✅ Fin de traitement pour : {source_name(path)} ({result['seconds']}s)")
+                elif result["status"] == "skip":
+                    print(f"⏭️  Inchangé, ignoré : {source_name(path)}")
+                else:
+                    print(f"❌ Échec de traitement pour : {source_name(path)} : {result['error']}")
+                results.append({"file": path, "processor": name, "memory_mb": round(task["memory_mb"]), **result})
+
+    # 📋 Rapport par fichier
+    # Même dossier que les métriques (PIPELINE_LOGS_DIR, défaut logs/)
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    report_path = os.path.join(METRICS_DIR, f"scheduler_report_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4, ensure_ascii=False)
+
+    nb_errors = sum(1 for r in results if r["status"] == "error")
+    for r in sorted(results, key=lambda r: -r["seconds"]):
+        print(f"   {r['status']:<5} {r['seconds']:>9.3f}s  {r.get('rows_in', '-'):>10}  {source_name(r['file'])}")
+    print(f"✅ Tous les fichiers ont été traités ({nb_errors} échec(s)). Rapport : {report_path}")
+    return 1 if nb_errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
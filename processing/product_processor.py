@@ -4,70 +4,106 @@
 import argparse
 import os
 import sys
-import pandas as pd
 
 # 📁 Ajout du chemin racine pour import relatif
 pipeline_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, pipeline_root)
 
-# === CLI ===
-parser = argparse.ArgumentParser(description="Traitement des données produits")
-parser.add_argument('--input', required=True, help="Fichier CSV ou Excel contenant les données produits")
-parser.add_argument('--chunksize', type=int, default=None, help="Taille de chunk (en lignes) pour les gros fichiers CSV")
-args = parser.parse_args()
-input_path = args.input
-chunksize = args.chunksize
+from transformations.data_reader import concat_chunks, read_csv_schema, read_excel_schema, source_name
+from transformations.data_cleaner import clean_product_data
+from transformations.deduplicator import make_deduplicator
+from transformations.data_enricher import drop_enriched, enrich_product_data
+from transformations.data_aggregator import aggregate_product_data
+from transformations.data_formatter import export_product_data_partitioned
+from transformations.pipeline_state import process_if_changed
+from transformations.chunk_sizing import chunk_sizer
+from monitoring.instrumentation import iter_stage, stage
 
-# === Lecture avec chunks ===
-if not os.path.exists(input_path):
-    print(f"❌ Fichier introuvable : {input_path}")
-    sys.exit(1)
 
-try:
+def process_products(input_path: str, chunksize: int = None) -> dict:
+    """
+    Nettoie, enrichit, agrège et exporte un catalogue produits (CSV ou XLSX).
+    Retourne les volumes traités (lignes lues / conservées).
+    """
+    # === Lecture avec chunks (dtypes du schéma "products") ===
+    rows_in = 0
+    dropped = {}  # lignes retirées par étape de nettoyage
+    source = source_name(input_path)  # ⏱️ étapes mesurées dans logs/metrics_<run_id>.jsonl
+    drop_enriched("products_enriched", input_path)  # parts d'une exécution précédente de ce fichier
     if input_path.endswith(".csv"):
         if chunksize:
             df_chunks = []
-            for i, chunk in enumerate(pd.read_csv(input_path, chunksize=chunksize)):
+            deduplicator = make_deduplicator()  # product_id déjà vus dans les chunks précédents
+            chunks = iter_stage("products", "read", read_csv_schema(input_path, "products", chunksize), source)
+            for i, chunk in enumerate(chunks):
                 print(f"🔹 Chunk {i+1} ({len(chunk)} lignes)")
-
-                from transformations.data_cleaner import clean_product_data
-                from transformations.data_enricher import enrich_product_data
-
-                chunk = clean_product_data(chunk)
-                chunk = enrich_product_data(chunk, input_path)
+                rows_in += len(chunk)
+                with stage("products", "clean", source, i, rows_in=len(chunk)) as m:
+                    chunk = clean_product_data(chunk, report=dropped, deduplicator=deduplicator)
+                    m["rows_out"] = len(chunk)
+                with stage("products", "enrich", source, i, rows_in=len(chunk)):
+                    chunk = enrich_product_data(chunk, input_path, part_index=i)
                 df_chunks.append(chunk)
 
-            df = pd.concat(df_chunks, ignore_index=True)
+            df = concat_chunks(df_chunks)
         else:
-            df = pd.read_csv(input_path)
-            from transformations.data_cleaner import clean_product_data
-            from transformations.data_enricher import enrich_product_data
-            df = clean_product_data(df)
-            df = enrich_product_data(df, input_path)
+            with stage("products", "read", source) as m:
+                df = read_csv_schema(input_path, "products")
+                m["rows_out"] = len(df)
+            rows_in = len(df)
+            with stage("products", "clean", source, rows_in=len(df)) as m:
+                df = clean_product_data(df, report=dropped)
+                m["rows_out"] = len(df)
+            with stage("products", "enrich", source, rows_in=len(df)):
+                df = enrich_product_data(df, input_path)
 
     elif input_path.endswith(".xlsx"):
-        df = pd.read_excel(input_path)
-        from transformations.data_cleaner import clean_product_data
-        from transformations.data_enricher import enrich_product_data
-        df = clean_product_data(df)
-        df = enrich_product_data(df, input_path)
+        with stage("products", "read", source) as m:
+            df = read_excel_schema(input_path, "products")
+            m["rows_out"] = len(df)
+        rows_in = len(df)
+        with stage("products", "clean", source, rows_in=len(df)) as m:
+            df = clean_product_data(df, report=dropped)
+            m["rows_out"] = len(df)
+        with stage("products", "enrich", source, rows_in=len(df)):
+            df = enrich_product_data(df, input_path)
 
     else:
         raise ValueError("Format de fichier non supporté (CSV ou XLSX attendu)")
 
-except Exception as e:
-    print(f"❌ Erreur de lecture ou traitement : {e}")
-    sys.exit(1)
+    print("✅ Lecture, nettoyage et enrichissement terminés.")
 
-print("✅ Lecture, nettoyage et enrichissement terminés.")
+    # === Agrégation
+    with stage("products", "aggregate", source, rows_in=len(df)) as m:
+        df_agg = aggregate_product_data(df)
+        m["rows_out"] = len(df_agg)
 
-# === Agrégation
-from transformations.data_aggregator import aggregate_product_data
-df_agg = aggregate_product_data(df)
+    # === Export
+    with stage("products", "export", source, rows_in=len(df_agg)):
+        export_product_data_partitioned(df_agg, input_path)
 
-# === Export
-from transformations.data_formatter import export_product_data_partitioned
-export_product_data_partitioned(df_agg, input_path)
+    return {"rows_in": rows_in, "rows_out": len(df), "dropped": dropped}
+
+
+if __name__ == "__main__":
+    # === CLI ===
+    parser = argparse.ArgumentParser(description="Traitement des données produits")
+    parser.add_argument('--input', required=True, help="Fichier CSV ou Excel contenant les données produits")
+    parser.add_argument('--chunksize', type=int, default=None, help="Taille de chunk (en lignes) pour les gros fichiers CSV")
+    parser.add_argument('--force', action='store_true', help="Retraite le fichier même s'il est inchangé")
+    args = parser.parse_args()
+    input_path = args.input
+    chunksize = chunk_sizer(args.chunksize)  # ChunkSizer si worker_memory_mb est défini
+
+    if not os.path.exists(input_path):
+        print(f"❌ Fichier introuvable : {input_path}")
+        sys.exit(1)
+
+    try:
+        process_if_changed("products", input_path, process_products, chunksize, force=args.force)
+    except Exception as e:
+        print(f"❌ Erreur de lecture ou traitement : {e}")
+        sys.exit(1)
 
-print("✅ Traitement des produits terminé.")
-sys.exit(0)
+    print("✅ Traitement des produits terminé.")
+    sys.exit(0)
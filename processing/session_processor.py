@@ -3,91 +3,122 @@
 
 import sys
 import argparse
-import pandas as pd
 import os
 
 # 📁 Ajout du chemin racine du projet pour permettre l'import de modules dans /transformations
 pipeline_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, pipeline_root)
 
-# ==============================
-# 🎯 Lecture des arguments CLI
-# ==============================
-parser = argparse.ArgumentParser(description="Analyse des sessions web")
-parser.add_argument('--input', required=True, help="Fichier CSV des sessions utilisateur")
-parser.add_argument('--chunksize', type=int, default=None, help="Taille des chunks à lire (nombre de lignes)")
-args = parser.parse_args()
-input_path = args.input
-chunksize = args.chunksize  # None par défaut
-
-# ==============================
-# 📥 Vérification du fichier d'entrée
-# ==============================
-if not os.path.exists(input_path):
-    print(f"❌ Fichier introuvable : {input_path}")
-    sys.exit(1)
-
 # ==============================
 # 📦 Imports des fonctions métiers
 # ==============================
+from transformations.data_reader import concat_chunks, read_csv_schema, source_name
 from transformations.data_cleaner import clean_session_data
-from transformations.data_enricher import enrich_session_data
+from transformations.data_enricher import drop_enriched, enrich_session_data, export_enriched
 from transformations.data_aggregator import aggregate_session_data
 from transformations.data_formatter import export_session_data_partitioned
+from transformations.pipeline_state import process_if_changed
+from transformations.chunk_sizing import chunk_sizer
+from monitoring.instrumentation import iter_stage, stage
 
-processed_chunks = []
+DIMENSIONS = ["device_type", "browser", "referrer", "country", "city", "conversion"]
 
-# ==============================
-# 📚 Lecture du CSV (chunks ou full)
-# ==============================
-try:
+
+def process_sessions(input_path: str, chunksize: int = None) -> dict:
+    """
+    Nettoie, enrichit, agrège et exporte un fichier CSV de sessions.
+    Retourne les volumes traités (lignes lues / conservées).
+    """
+    processed_chunks = []
+    rows_in = 0
+    dropped = {}  # lignes retirées par étape de nettoyage
+    source = source_name(input_path)  # ⏱️ étapes mesurées dans logs/metrics_<run_id>.jsonl
+
+    # ==============================
+    # 📚 Lecture du CSV (chunks ou full), typée selon le schéma "sessions"
+    # ==============================
     if chunksize:
-        for i, chunk in enumerate(pd.read_csv(input_path, chunksize=chunksize)):
+        chunks = iter_stage("sessions", "read", read_csv_schema(input_path, "sessions", chunksize), source)
+        for i, chunk in enumerate(chunks):
             print(f"🔹 Chunk {i+1} lu ({len(chunk)} lignes)")
-            chunk = clean_session_data(chunk)
+            rows_in += len(chunk)
+            with stage("sessions", "clean", source, i, rows_in=len(chunk)) as m:
+                chunk = clean_session_data(chunk, report=dropped)
+                m["rows_out"] = len(chunk)
             # ⚠️ enrich_session_data ne doit plus écrire sur disque
-            chunk = enrich_session_data(chunk)
+            with stage("sessions", "enrich", source, i, rows_in=len(chunk)):
+                chunk = enrich_session_data(chunk)
             processed_chunks.append(chunk)
     else:
-        df = pd.read_csv(input_path)
-        df = clean_session_data(df)
-        df = enrich_session_data(df)  # ⚠️ sans export ici
+        with stage("sessions", "read", source) as m:
+            df = read_csv_schema(input_path, "sessions")
+            m["rows_out"] = len(df)
+        rows_in = len(df)
+        with stage("sessions", "clean", source, rows_in=len(df)) as m:
+            df = clean_session_data(df, report=dropped)
+            m["rows_out"] = len(df)
+        with stage("sessions", "enrich", source, rows_in=len(df)):
+            df = enrich_session_data(df)  # ⚠️ sans export ici
         processed_chunks.append(df)
-except Exception as e:
-    print(f"❌ Erreur de lecture ou traitement : {e}")
-    sys.exit(1)
 
-# ==============================
-# 🧩 Fusion des morceaux
-# ==============================
-df_all = pd.concat(processed_chunks, ignore_index=True)
+    # ==============================
+    # 🧩 Fusion des morceaux
+    # ==============================
+    df_all = concat_chunks(processed_chunks)
 
-# ==============================
-# 💾 Export enrichi (append unique ici)
-# ==============================
-enriched_dir = os.path.join(pipeline_root, "data", "processed", "enriched")
-os.makedirs(enriched_dir, exist_ok=True)
-enriched_path = os.path.join(enriched_dir, "sessions_enriched.csv")
+    # ==============================
+    # 💾 Export enrichi : une part par fichier source dans sessions_enriched
+    # ==============================
+    # Écriture atomique ; les parts d'une exécution précédente du même fichier sont retirées avant
+    with stage("sessions", "export_enriched", source, rows_in=len(df_all)):
+        drop_enriched("sessions_enriched", input_path)
+        enriched_path = export_enriched(df_all, "sessions_enriched", input_path)
+    print(f"💾 Données de session enrichies exportées (part) : {enriched_path}")
 
-# Évite d’écraser : append + header si nouveau fichier
-write_header = not os.path.exists(enriched_path)
-df_all.to_csv(enriched_path, index=False, mode="a", header=write_header)
-print(f"💾 Données de session enrichies exportées (append) : {enriched_path}")
+    # (Optionnel anti-duplicates si tu relances souvent la pipeline)
+    # if "session_id" in df_all.columns:
+    #     df_all = df_all.drop_duplicates(subset=["session_id"])
 
-# (Optionnel anti-duplicates si tu relances souvent la pipeline)
-# if "session_id" in df_all.columns:
-#     df_all = df_all.drop_duplicates(subset=["session_id"])
+    # ==============================
+    # 📊 Agrégation multi-dimensionnelle
+    # ==============================
+    with stage("sessions", "aggregate", source, rows_in=len(df_all)) as m:
+        df_agg = aggregate_session_data(df_all, DIMENSIONS)
+        m["rows_out"] = len(df_agg)
 
-# ==============================
-# 📊 Agrégation multi-dimensionnelle
-# ==============================
-dimensions = ["device_type", "browser", "referrer", "country", "city", "conversion"]
-df_agg = aggregate_session_data(df_all, dimensions)
+    # ==============================
+    # 💾 Export agrégé partitionné par date
+    # ==============================
+    with stage("sessions", "export", source, rows_in=len(df_agg)):
+        export_session_data_partitioned(df_agg, input_path)
 
-# ==============================
-# 💾 Export agrégé partitionné par date
-# ==============================
-export_session_data_partitioned(df_agg, input_path)
+    return {"rows_in": rows_in, "rows_out": len(df_all), "dropped": dropped}
+
+
+if __name__ == "__main__":
+    # ==============================
+    # 🎯 Lecture des arguments CLI
+    # ==============================
+    parser = argparse.ArgumentParser(description="Analyse des sessions web")
+    parser.add_argument('--input', required=True, help="Fichier CSV des sessions utilisateur")
+    parser.add_argument('--chunksize', type=int, default=None, help="Taille des chunks à lire (nombre de lignes)")
+    parser.add_argument('--force', action='store_true', help="Retraite le fichier même s'il est inchangé")
+    args = parser.parse_args()
+    input_path = args.input
+    chunksize = chunk_sizer(args.chunksize)  # ChunkSizer si worker_memory_mb est défini
+
+    # ==============================
+    # 📥 Vérification du fichier d'entrée
+    # ==============================
+    if not os.path.exists(input_path):
+        print(f"❌ Fichier introuvable : {input_path}")
+        sys.exit(1)
+
+    try:
+        process_if_changed("sessions", input_path, process_sessions, chunksize, force=args.force)
+    except Exception as e:
+        print(f"❌ Erreur de lecture ou traitement : {e}")
+        sys.exit(1)
 
-print("✅ Traitement des sessions terminé.")
-sys.exit(0)
+    print("✅ Traitement des sessions terminé.")
+    sys.exit(0)
@@ -0,0 +1,291 @@
+# transformations/anomaly_detection.py
+# Anomalies statistiques (--check-anomalies) : profil par source et par colonne comparé à un historique
+#
+# L'historique d'une source (data/sketches/<source>.json) cumule les résumés de transformations/sketches.py
+# de tous les fichiers déjà validés : il se construit au fil des exécutions, sans relire les données.
+# - colonnes numériques du schéma (integer / float) : RunningStats + TDigest
+#     valeurs aberrantes : hors des quantiles historiques [q0.1 %, q99.9 %], comptées chunk par chunk
+#     dérive de distribution : écart de moyenne (en écarts-types) ou de médiane (en IQR) du fichier
+# - colonnes catégorielles du schéma + user_id : HyperLogLog
+#     nouvelles catégories (union fichier ∪ historique) ; identifiants : variation du ratio distinctes / lignes
+# Un fichier n'est fusionné qu'une fois (empreinte du contenu). Un fichier signalé est mis en attente
+# (pending) sans modifier l'historique ; après SHIFT_CONFIRM_FILES fichiers consécutifs signalés sur
+# une même colonne, la dérive est jugée durable et leurs profils deviennent la référence de cette colonne.
+
+import os
+import json
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from transformations.data_storage import data_path, file_lock
+from transformations.pipeline_state import file_fingerprint
+from transformations.sketches import HyperLogLog, RunningStats, TDigest
+
+SKETCH_DIR = data_path("sketches")
+
+NUMERIC_TYPES = ("integer", "float")
+DISTINCT_KEY_COLUMNS = ("user_id",)
+
+MIN_BASELINE_ROWS = 1000            # valeurs historiques requises avant toute comparaison
+MIN_BASELINE_FILES = 3              # fichiers historiques requis pour le ratio de valeurs distinctes
+OUTLIER_QUANTILES = (0.001, 0.999)  # bornes historiques : 0,2 % de valeurs attendues au-delà
+OUTLIER_RATE_FACTOR = 5             # alerte si le fichier en compte 5× plus que l'historique
+OUTLIER_MIN_COUNT = 10
+MEAN_SHIFT_STD = 0.5                # |Δ moyenne| > 0,5 écart-type historique
+MEDIAN_SHIFT_IQR = 0.5              # |Δ médiane| > 0,5 IQR historique
+CATEGORICAL_MAX_DISTINCT = 1000     # en deçà : nouvelles valeurs ; au-delà (identifiants) : ratio distinct / lignes
+DISTINCT_RATIO_CHANGE = 0.5         # ratio distinct / lignes à ±50 % de la moyenne historique
+SHIFT_CONFIRM_FILES = 3             # fichiers consécutifs signalés sur une colonne : nouvelle référence
+
+
+# ==============================
+# 🧮 Profils (résumés fusionnables)
+# ==============================
+
+class ColumnProfile:
+    """Résumés d'une colonne : stats + digest (numérique), hll + ratio distinct / lignes par fichier."""
+
+    def __init__(self, stats: Optional[RunningStats] = None, digest: Optional[TDigest] = None,
+                 hll: Optional[HyperLogLog] = None, distinct_ratio: Optional[RunningStats] = None):
+        self.stats = stats
+        self.digest = digest
+        self.hll = hll
+        self.distinct_ratio = distinct_ratio
+
+    def merge(self, other: "ColumnProfile") -> "ColumnProfile":
+        for name in ("stats", "digest", "hll", "distinct_ratio"):
+            theirs = getattr(other, name)
+            if theirs is not None:
+                mine = getattr(self, name)
+                setattr(self, name, theirs if mine is None else mine.merge(theirs))
+        return self
+
+    def to_dict(self) -> dict:
+        return {name: sketch.to_dict() for name, sketch in vars(self).items() if sketch is not None}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ColumnProfile":
+        return cls(
+            stats=RunningStats.from_dict(d["stats"]) if "stats" in d else None,
+            digest=TDigest.from_dict(d["digest"]) if "digest" in d else None,
+            hll=HyperLogLog.from_dict(d["hll"]) if "hll" in d else None,
+            distinct_ratio=RunningStats.from_dict(d["distinct_ratio"]) if "distinct_ratio" in d else None,
+        )
+
+
+class SourceProfile:
+    """
+    Profils des colonnes d'une source + nombre et empreintes des fichiers résumés.
+    pending : derniers fichiers signalés consécutifs, [{"columns": [...], "profile": {...}}, ...]
+    """
+
+    def __init__(self, source: str, files: int = 0, columns: Optional[Dict[str, ColumnProfile]] = None,
+                 fingerprints: Optional[List[str]] = None, pending: Optional[List[dict]] = None):
+        self.source = source
+        self.files = files
+        self.columns = columns or {}
+        self.fingerprints = fingerprints or []
+        self.pending = pending or []
+
+    def column(self, col: str) -> ColumnProfile:
+        return self.columns.setdefault(col, ColumnProfile())
+
+    def merge(self, other: "SourceProfile") -> "SourceProfile":
+        self.files += other.files
+        self.fingerprints += [fp for fp in other.fingerprints if fp not in self.fingerprints]
+        for col, profile in other.columns.items():
+            self.column(col).merge(profile)
+        return self
+
+    def to_dict(self) -> dict:
+        return {
+            "source": self.source,
+            "files": self.files,
+            "updated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "columns": {col: profile.to_dict() for col, profile in self.columns.items()},
+            "fingerprints": self.fingerprints,
+            "pending": self.pending,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "SourceProfile":
+        columns = {col: ColumnProfile.from_dict(p) for col, p in d.get("columns", {}).items()}
+        return cls(d["source"], d.get("files", 0), columns, d.get("fingerprints"), d.get("pending"))
+
+
+# ==============================
+# 💾 Historique par source
+# ==============================
+
+def baseline_path(source: str, sketch_dir: Optional[str] = None) -> str:
+    return os.path.join(sketch_dir or SKETCH_DIR, f"{source}.json")
+
+
+def load_baseline(source: str, sketch_dir: Optional[str] = None) -> SourceProfile:
+    """Historique d'une source (vide à la première validation)."""
+    path = baseline_path(source, sketch_dir)
+    if not os.path.exists(path):
+        return SourceProfile(source)
+    with open(path, encoding="utf-8") as f:
+        return SourceProfile.from_dict(json.load(f))
+
+
+def _write_json_atomic(data: dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def merge_into_baseline(profile: SourceProfile, sketch_dir: Optional[str] = None,
+                        flagged_columns: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Ajoute le profil d'un fichier à l'historique de sa source : relecture + fusion sous verrou
+    (validations parallèles de batch_validator), puis remplacement atomique du JSON.
+    - sans flagged_columns : profil fusionné, les fichiers signalés en attente sont abandonnés
+    - avec : profil mis en attente ; SHIFT_CONFIRM_FILES fichiers consécutifs signalés sur une même
+      colonne remplacent la référence de cette colonne (les autres colonnes sont fusionnées)
+    Retourne None si l'une de ses empreintes est déjà connue (fichier revalidé).
+    """
+    path = baseline_path(profile.source, sketch_dir)
+    with file_lock(f"{os.path.splitext(path)[0]}.lock"):
+        baseline = load_baseline(profile.source, sketch_dir)
+        known = set(baseline.fingerprints)
+        known.update(fp for entry in baseline.pending for fp in entry["profile"].get("fingerprints", []))
+        if known.intersection(profile.fingerprints):
+            return None
+
+        if not flagged_columns:
+            baseline.pending = []
+            baseline.merge(profile)
+        else:
+            entry = {"columns": sorted(set(flagged_columns)), "profile": profile.to_dict()}
+            baseline.pending = (baseline.pending + [entry])[-SHIFT_CONFIRM_FILES:]
+            shifted = set.intersection(*(set(e["columns"]) for e in baseline.pending))
+            if len(baseline.pending) == SHIFT_CONFIRM_FILES and shifted:
+                confirmed = [SourceProfile.from_dict(e["profile"]) for e in baseline.pending]
+                for col in shifted:
+                    baseline.columns.pop(col, None)
+                for pending_profile in confirmed:
+                    baseline.merge(pending_profile)
+                baseline.pending = []
+        _write_json_atomic(baseline.to_dict(), path)
+    return path
+
+
+# ==============================
+# 🔍 Détection en une passe
+# ==============================
+
+class AnomalyDetector:
+    """
+    Profil du fichier en cours, construit chunk par chunk (update) et comparé à l'historique
+    chargé au départ (findings) ; commit(path, findings) l'ajoute ensuite à l'historique (ou en attente).
+    """
+
+    def __init__(self, plan: dict, sketch_dir: Optional[str] = None):
+        self.sketch_dir = sketch_dir
+        self.numeric_columns = plan.get("numeric_columns") or []
+        self.distinct_columns = plan.get("distinct_columns") or []
+        self.baseline = load_baseline(plan["source"], sketch_dir)
+        self.profile = SourceProfile(plan["source"], files=1)
+        self.rows = 0
+        self.outliers: Dict[str, int] = {}
+        self.max_z: Dict[str, float] = {}
+        self.fences = {}
+        for col in self.numeric_columns:
+            ref = self.baseline.columns.get(col)
+            if ref is not None and ref.stats is not None and ref.stats.n >= MIN_BASELINE_ROWS:
+                self.fences[col] = tuple(ref.digest.quantile(q) for q in OUTLIER_QUANTILES)
+
+    def update(self, df: pd.DataFrame) -> None:
+        self.rows += len(df)
+        for col in self.numeric_columns:
+            if col not in df.columns:
+                continue
+            values = pd.to_numeric(df[col], errors="coerce").dropna().to_numpy(dtype=np.float64)
+            profile = self.profile.column(col)
+            profile.stats = (profile.stats or RunningStats()).update(values)
+            profile.digest = (profile.digest or TDigest()).update(values)
+            if col in self.fences and len(values):
+                low, high = self.fences[col]
+                self.outliers[col] = self.outliers.get(col, 0) + int(((values < low) | (values > high)).sum())
+                ref = self.baseline.columns[col].stats
+                if ref.std > 0:
+                    z = float(np.abs(values - ref.mean).max()) / ref.std
+                    self.max_z[col] = max(self.max_z.get(col, 0.0), z)
+        for col in self.distinct_columns:
+            if col in df.columns:
+                profile = self.profile.column(col)
+                profile.hll = (profile.hll or HyperLogLog()).update(df[col])
+
+    def findings(self) -> List[dict]:
+        """Anomalies du fichier vis-à-vis de l'historique : [{column, kind, message}, ...]."""
+        found = []
+        for col in self.numeric_columns:
+            current, ref = self.profile.columns.get(col), self.baseline.columns.get(col)
+            if current is None or current.stats is None or not current.stats.n or col not in self.fences:
+                continue
+            n, expected = self.outliers.get(col, 0), 1 - OUTLIER_QUANTILES[1] + OUTLIER_QUANTILES[0]
+            if n >= OUTLIER_MIN_COUNT and n > OUTLIER_RATE_FACTOR * expected * current.stats.n:
+                low, high = self.fences[col]
+                found.append({"column": col, "kind": "outliers", "message": (
+                    f"{n} valeurs aberrantes pour '{col}' ({100 * n / current.stats.n:.2f} % hors "
+                    f"[{low:.4g}, {high:.4g}] vs {100 * expected:.1f} % historique, z max = {self.max_z.get(col, 0):.1f})"
+                )})
+
+            mean_shift = abs(current.stats.mean - ref.stats.mean) / ref.stats.std if ref.stats.std > 0 else 0.0
+            iqr = ref.digest.quantile(0.75) - ref.digest.quantile(0.25)
+            median, ref_median = current.digest.quantile(0.5), ref.digest.quantile(0.5)
+            median_shift = abs(median - ref_median) / iqr if iqr > 0 else 0.0
+            if mean_shift > MEAN_SHIFT_STD or median_shift > MEDIAN_SHIFT_IQR:
+                found.append({"column": col, "kind": "shift", "message": (
+                    f"Dérive de distribution pour '{col}' : moyenne {current.stats.mean:.4g} "
+                    f"(historique {ref.stats.mean:.4g} ± {ref.stats.std:.4g}), médiane {median:.4g} "
+                    f"(historique {ref_median:.4g})"
+                )})
+
+        for col in self.distinct_columns:
+            current = self.profile.columns.get(col)
+            if current is None or current.hll is None or not self.rows:
+                continue
+            distinct = current.hll.count()
+            ref = self.baseline.columns.get(col)
+            if ref is None or ref.hll is None:
+                continue
+            ref_distinct = ref.hll.count()
+            if ref_distinct <= CATEGORICAL_MAX_DISTINCT:
+                union = HyperLogLog(ref.hll.p, ref.hll.registers.copy()).merge(current.hll).count()
+                new_values = round(union) - round(ref_distinct)
+                if new_values > 0:
+                    found.append({"column": col, "kind": "new_values", "message": (
+                        f"{new_values} nouvelle(s) valeur(s) pour '{col}' (historique : {round(ref_distinct)} distinctes)"
+                    )})
+                continue
+            ratio = ref.distinct_ratio
+            if ratio is not None and ratio.n >= MIN_BASELINE_FILES and ratio.mean > 0:
+                change = distinct / self.rows / ratio.mean - 1
+                if abs(change) > DISTINCT_RATIO_CHANGE:
+                    found.append({"column": col, "kind": "distinct", "message": (
+                        f"Valeurs distinctes pour '{col}' : ~{distinct:.0f} pour {self.rows} lignes "
+                        f"({100 * change:+.0f} % vs ratio historique)"
+                    )})
+        return found
+
+    def commit(self, path: str, findings: List[dict]) -> Optional[str]:
+        """
+        Ajoute le profil du fichier (et son ratio distinct / lignes) à l'historique de la source,
+        une seule fois par contenu. findings (déjà calculées) : colonnes signalées, profil mis en attente.
+        Retourne le JSON écrit, None si le fichier était déjà connu.
+        """
+        for col in self.distinct_columns:
+            current = self.profile.columns.get(col)
+            if current is not None and current.hll is not None and self.rows:
+                current.distinct_ratio = RunningStats().update([current.hll.count() / self.rows])
+        self.profile.fingerprints = [file_fingerprint(path)]
+        return merge_into_baseline(self.profile, self.sketch_dir, [f["column"] for f in findings])
@@ -0,0 +1,92 @@
+# transformations/chunk_sizing.py
+# Taille de chunk adaptative (budget mémoire par worker) et réservation mémoire des tâches
+
+import os
+from typing import Optional, Union
+
+import pandas as pd
+
+MB = 1024 * 1024
+
+PROBE_ROWS = 10_000         # 1er chunk : mesure des octets par ligne
+MIN_ROWS = 1_000
+MAX_ROWS = 2_000_000
+WORKING_SET_FACTOR = 4.0    # copies intermédiaires d'un chunk (typage, nettoyage, enrichissement, export)
+TASK_BASE_MB = 150          # interpréteur + pandas + modules du pipeline
+INPUT_EXPANSION = 4.0       # mémoire / taille du fichier source, fichier entièrement chargé
+
+
+def current_rss_bytes() -> Optional[int]:
+    """RSS courant du processus (Linux, /proc/self/statm) ; None si indisponible."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ChunkSizer:
+    """
+    Taille du prochain chunk pour tenir dans budget_mb (passé comme chunksize aux lecteurs de data_reader) :
+    - 1er chunk : probe_rows lignes, dont on mesure les octets par ligne (memory_usage deep)
+    - chunks suivants : (budget - RSS courant) / (octets par ligne × WORKING_SET_FACTOR), borné à [min_rows, max_rows]
+    Le RSS est relu avant chaque chunk : ce que le traitement conserve (chunks déjà traités,
+    agrégats, déduplicateur) réduit d'autant les chunks suivants.
+    """
+
+    def __init__(self, budget_mb: float, probe_rows: int = PROBE_ROWS, min_rows: int = MIN_ROWS,
+                 max_rows: int = MAX_ROWS, working_set_factor: float = WORKING_SET_FACTOR):
+        self.budget_bytes = int(budget_mb * MB)
+        self.probe_rows = probe_rows
+        self.min_rows = min_rows
+        self.max_rows = max_rows
+        self.working_set_factor = working_set_factor
+        self.bytes_per_row: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return f"ChunkSizer(budget_mb={self.budget_bytes // MB}, bytes_per_row={self.bytes_per_row})"
+
+    def next_size(self) -> int:
+        if self.bytes_per_row is None:
+            return self.probe_rows
+        available = self.budget_bytes - (current_rss_bytes() or 0)
+        rows = int(available / (self.bytes_per_row * self.working_set_factor))
+        return min(self.max_rows, max(self.min_rows, rows))
+
+    @property
+    def measuring(self) -> bool:
+        return self.bytes_per_row is None
+
+    def observe(self, df: pd.DataFrame, raw_bytes: int = 0) -> None:
+        """
+        Mesure les octets par ligne sur le premier chunk non vide (une seule fois).
+        raw_bytes : données brutes conservées par le lecteur pendant le parsing (ex : lignes JSON).
+        """
+        if self.measuring and len(df):
+            self.bytes_per_row = (float(df.memory_usage(deep=True).sum()) + raw_bytes) / len(df)
+
+
+def chunk_sizer(chunksize: Optional[int], budget_mb: Optional[float] = None,
+                config: Optional[dict] = None) -> Union[int, None, ChunkSizer]:
+    """
+    Argument chunksize d'un processeur :
+    - budget_mb (ou worker_memory_mb de pipeline_config.yaml) > 0 : ChunkSizer dans ce budget
+    - sinon : chunksize inchangé (chunk_size_rows fixe, ou lecture complète si None)
+    """
+    if budget_mb is None:
+        if config is None:
+            from transformations.data_storage import load_pipeline_config
+            config = load_pipeline_config()
+        budget_mb = float(config.get("worker_memory_mb", 0) or 0)
+    if not budget_mb:
+        return chunksize
+    return ChunkSizer(budget_mb)
+
+
+def task_memory_mb(input_bytes: int, worker_mb: float = 0) -> float:
+    """
+    Mémoire réservée pour traiter un fichier de input_bytes octets : interpréteur + fichier chargé,
+    plafonnée à worker_mb (les chunks adaptatifs tiennent alors dans ce plafond).
+    """
+    estimate = TASK_BASE_MB + INPUT_EXPANSION * input_bytes / MB
+    return min(estimate, worker_mb) if worker_mb else estimate
@@ -1,13 +1,22 @@
 # transformations/data_aggregator.py
 
+import json
+
+import numpy as np
 import pandas as pd
-from typing import List
+from typing import Dict, List, Optional, Tuple
+
+from transformations.sketches import HyperLogLog, TopK, grouped_hll, value_hashes
+
+# observed=True : les dimensions lues en dtype category (schéma) ne génèrent pas
+# le produit cartésien de leurs catégories
+
 
 def aggregate_api_logs(df: pd.DataFrame) -> pd.DataFrame:
     """
     Agrège les logs API par date, catégorie, méthode, pays
     """
-    df_agg = df.groupby(["date", "category", "method", "country_code"]).agg(
+    df_agg = df.groupby(["date", "category", "method", "country_code"], observed=True).agg(
         count_requests=("request_id", "count"),
         avg_response_time_ms=("response_time_ms", "mean"),
         avg_payload_bytes=("payload_size_bytes", "mean"),
@@ -16,6 +25,162 @@ def aggregate_api_logs(df: pd.DataFrame) -> pd.DataFrame:
     return df_agg
 
 
+# ==============================
+# 🌊 Agrégation en flux (partiels fusionnables)
+# ==============================
+
+API_LOGS_DIMENSIONS = ["date", "category", "method", "country_code"]
+
+# ==============================
+# 🧮 Agrégats approchés (résumés fusionnables, transformations/sketches.py)
+# ==============================
+# Colonne de résumé encodée en texte, reconnue à son préfixe :
+# - hll_<nom>  : HyperLogLog (valeurs distinctes)          → KPI <nom> = estimation du nombre de distincts
+# - topk_<nom> : TopK Space-Saving (valeurs fréquentes)     → KPI <nom> = JSON [[valeur, compte], ...]
+# Les partiels conservent les résumés : une partition journalière se fusionne en semaine / mois sans relire les logs.
+
+SKETCH_TYPES = {"hll_": HyperLogLog, "topk_": TopK}
+KPI_HLL_PRECISION = 11      # 2048 registres par groupe : ~2.3 % d'erreur
+TOP_K = 5                   # valeurs publiées par KPI top-K
+
+# Résumés des logs API : colonne → (colonne source, type)
+API_LOGS_SKETCHES = {
+    "hll_distinct_users": ("user_id", "hll"),
+    "topk_top_endpoints": ("endpoint", "topk"),
+}
+SESSION_SKETCHES = {"hll_distinct_users": ("user_id", "hll")}
+
+
+def sketch_type(column: str):
+    for prefix, cls in SKETCH_TYPES.items():
+        if column.startswith(prefix):
+            return cls
+    return None
+
+
+def grouped_sketches(df: pd.DataFrame, dimensions: List[str], sketches: Dict[str, Tuple[str, str]]) -> pd.DataFrame:
+    """
+    Un résumé encodé par groupe et par colonne de sketches, dans l'ordre des groupes de
+    df.groupby(dimensions, observed=True) :
+    - hll : chaque valeur distincte du chunk hachée une fois, registres de tous les groupes en une passe numpy
+    - topk : comptes exacts (groupe, valeur) du chunk, tronqués aux TOPK_CAPACITY plus fréquents
+    """
+    grouped = df.groupby(dimensions, observed=True)
+    group_ids = grouped.ngroup().to_numpy(dtype=np.float64)  # NaN : ligne hors groupe (dimension manquante)
+    in_group = ~np.isnan(group_ids)
+    out = {}
+    for column, (source_col, kind) in sketches.items():
+        if kind == "hll":
+            mask, hashes = value_hashes(df[source_col])
+            keep = in_group[mask]
+            ids = group_ids[mask][keep].astype(np.intp)
+            out[column] = [h.encode() for h in grouped_hll(ids, grouped.ngroups, hashes[keep], KPI_HLL_PRECISION)]
+        else:
+            pairs = pd.DataFrame({"group": group_ids, "value": df[source_col].to_numpy()})[in_group]
+            counts = pairs.groupby(["group", "value"]).size().reset_index(name="n")
+            ids, values, n = counts["group"].to_numpy(np.intp), counts["value"].to_numpy(), counts["n"].to_numpy()
+            bounds = np.flatnonzero(np.diff(ids)) + 1
+            summaries = {
+                int(ids[start]): TopK.from_counts(zip(values[start:end], n[start:end]))
+                for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(ids)])
+            } if len(ids) else {}
+            out[column] = [summaries.get(g, TopK()).encode() for g in range(grouped.ngroups)]
+    return pd.DataFrame(out, index=range(grouped.ngroups))
+
+
+def merge_sketches(encoded: List[str], cls) -> Optional[str]:
+    """Fusionne les résumés encodés d'un groupe."""
+    if len(encoded) <= 1:
+        return encoded[0] if encoded else None
+    merged = cls.decode(encoded[0])
+    for text in encoded[1:]:
+        merged.merge(cls.decode(text))
+    return merged.encode()
+
+
+def finalize_sketches(df: pd.DataFrame, max_count: Optional[str] = None) -> List[str]:
+    """
+    Remplace chaque colonne de résumé par son KPI (hll_x → x, topk_x → x) ; retourne les KPI ajoutés.
+    max_count : colonne du nombre de lignes du groupe, borne des estimations HyperLogLog
+    (un petit groupe ne peut pas compter plus d'utilisateurs distincts que de lignes).
+    """
+    kpis = []
+    for column in [c for c in df.columns if sketch_type(c)]:
+        cls, name = sketch_type(column), column.split("_", 1)[1]
+        if cls is HyperLogLog:
+            df[name] = [round(HyperLogLog.decode(v).count()) if isinstance(v, str) else pd.NA for v in df[column]]
+            df[name] = df[name].astype("Int64")
+            if max_count is not None:
+                df[name] = df[name].clip(upper=df[max_count].astype("Int64"))
+        else:
+            df[name] = [json.dumps(TopK.decode(v).top(TOP_K), ensure_ascii=False) if isinstance(v, str) else None
+                        for v in df[column]]
+        kpis.append(name)
+    return kpis
+
+
+def partial_aggregate_api_logs(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Réduit un chunk de logs API en agrégats partiels (compteurs + sommes + résumés API_LOGS_SKETCHES).
+    Les partiels de plusieurs chunks se fusionnent par addition (résumés : merge).
+    """
+    partial = df.groupby(API_LOGS_DIMENSIONS, observed=True).agg(
+        count_requests=("request_id", "count"),
+        sum_response_time_ms=("response_time_ms", "sum"),
+        n_response_time_ms=("response_time_ms", "count"),
+        sum_payload_bytes=("payload_size_bytes", "sum"),
+        n_payload_bytes=("payload_size_bytes", "count"),
+        nb_cache_hits=("cache_hit", "sum")
+    ).reset_index()
+    sketches = grouped_sketches(df, API_LOGS_DIMENSIONS, API_LOGS_SKETCHES)
+    return pd.concat([partial, sketches], axis=1)
+
+
+def merge_partial_aggregates(partials: List[pd.DataFrame], dimensions: List[str]) -> pd.DataFrame:
+    """
+    Fusionne des agrégats partiels : somme des compteurs et sommes par groupe, fusion des résumés (hll_, topk_).
+    La taille du résultat est bornée par le nombre de groupes distincts.
+    """
+    partials = [p for p in partials if p is not None and not p.empty]
+    if not partials:
+        return pd.DataFrame()
+    if len(partials) == 1:
+        return partials[0]
+
+    merged = pd.concat(partials, ignore_index=True)
+    sketch_columns = [c for c in merged.columns if sketch_type(c)]
+    result = merged.drop(columns=sketch_columns).groupby(dimensions, sort=False, observed=True).sum()
+    if sketch_columns:
+        # Résumés regroupés en listes Python (même numérotation que result) : pas d'appel pandas par groupe
+        group_ids = merged.groupby(dimensions, sort=False, observed=True).ngroup().to_numpy(dtype=np.float64)
+        for column in sketch_columns:
+            buckets = [[] for _ in range(len(result))]
+            for g, text in zip(group_ids, merged[column].to_numpy()):
+                # NaN : dimension manquante (ligne hors groupe) ; texte absent : partiel antérieur aux résumés
+                if g == g and isinstance(text, str):
+                    buckets[int(g)].append(text)
+            result[column] = [merge_sketches(b, sketch_type(column)) for b in buckets]
+    return result.reset_index()
+
+
+def finalize_api_logs_aggregate(partial: pd.DataFrame, dimensions: List[str] = API_LOGS_DIMENSIONS) -> pd.DataFrame:
+    """
+    Convertit les agrégats partiels en KPI finaux (même schéma que aggregate_api_logs).
+    dimensions : API_LOGS_DIMENSIONS, ou sans "date" pour une partition journalière.
+    """
+    columns = list(dimensions) + [
+        "count_requests", "avg_response_time_ms", "avg_payload_bytes", "nb_cache_hits"
+    ]
+    if partial.empty:
+        return pd.DataFrame(columns=columns + [c.split("_", 1)[1] for c in API_LOGS_SKETCHES])
+
+    df_agg = partial.sort_values(list(dimensions)).reset_index(drop=True)
+    df_agg["avg_response_time_ms"] = df_agg["sum_response_time_ms"] / df_agg["n_response_time_ms"]
+    df_agg["avg_payload_bytes"] = df_agg["sum_payload_bytes"] / df_agg["n_payload_bytes"]
+    columns += finalize_sketches(df_agg, max_count="count_requests")
+    return df_agg[columns]
+
+
 def aggregate_session_data(df: pd.DataFrame, dimensions: List[str]) -> pd.DataFrame:
     """
     Agrégation des sessions utilisateur selon les dimensions fournies.
@@ -26,7 +191,7 @@ def aggregate_session_data(df: pd.DataFrame, dimensions: List[str]) -> pd.DataFr
         missing = list(set(dimensions) - set(df.columns))
         raise ValueError(f"Colonnes manquantes pour l'aggrégation : {missing}")
 
-    grouped = df.groupby(dimensions).agg(
+    grouped = df.groupby(dimensions, observed=True).agg(
         nb_sessions=('session_id', 'count'),
         avg_duration_min=('duration_min', 'mean'),
         avg_pages_visited=('pages_visited', 'mean'),
@@ -38,6 +203,9 @@ def aggregate_session_data(df: pd.DataFrame, dimensions: List[str]) -> pd.DataFr
         cart_abandonment_rate=('abandoned_cart', 'mean')
     ).reset_index()
 
+    # Utilisateurs distincts : KPI + résumé conservé dans l'export (fusion entre fichiers / jours)
+    grouped = pd.concat([grouped, grouped_sketches(df, dimensions, SESSION_SKETCHES)], axis=1)
+    finalize_sketches(grouped, max_count="nb_sessions")
     return grouped
 
 import pandas as pd
@@ -56,7 +224,7 @@ def aggregate_product_data(df: pd.DataFrame) -> pd.DataFrame:
         if col not in df.columns:
             raise ValueError(f"❌ Colonne manquante : {col}")
 
-    grouped = df.groupby(["date", "category", "stock_status", "is_active"]).agg(
+    grouped = df.groupby(["date", "category", "stock_status", "is_active"], observed=True).agg(
         nb_products=('product_id', 'count'),
         avg_price=('price', 'mean'),
         avg_cost=('cost', 'mean'),
@@ -81,7 +249,7 @@ def aggregate_user_data(df: pd.DataFrame) -> pd.DataFrame:
         if col not in df.columns:
             raise ValueError(f"❌ Colonne manquante : {col}")
 
-    grouped = df.groupby(["country", "customer_type", "is_premium"]).agg(
+    grouped = df.groupby(["country", "customer_type", "is_premium"], observed=True).agg(
         nb_users=("user_id", "count"),
         avg_age=("age", "mean"),
         avg_total_orders=("total_orders", "mean"),
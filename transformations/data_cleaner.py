@@ -1,58 +1,109 @@
+import numpy as np
 import pandas as pd
+from typing import Dict, Optional
 
-def clean_api_logs(df: pd.DataFrame) -> pd.DataFrame:
+# ==============================
+# 🧮 Masque combiné
+# Chaque filtre de lignes met à jour un seul masque booléen (numpy) ; le DataFrame
+# de sortie est matérialisé une seule fois à la fin (df.take), sans copie intermédiaire
+# ni affectation sur une vue (pas de SettingWithCopy, compatible Copy-on-Write).
+# ==============================
+
+
+def _drop(keep: np.ndarray, drop: np.ndarray, step: str, report: Optional[Dict[str, int]]) -> np.ndarray:
+    """Retire du masque les lignes encore conservées que `drop` élimine ; compte le retrait par étape."""
+    dropped = keep & drop
+    if report is not None:
+        report[step] = report.get(step, 0) + int(dropped.sum())
+    return keep & ~dropped
+
+
+def _missing(*columns: pd.Series) -> np.ndarray:
+    """True si au moins une des colonnes est manquante."""
+    return np.logical_or.reduce([col.isna().to_numpy() for col in columns])
+
+
+def _duplicated(values: pd.Series, keep: np.ndarray, deduplicator=None) -> np.ndarray:
     """
-    Nettoyage des logs API : suppression erreurs, nulls, doublons
+    Doublons (hors première occurrence) parmi les seules lignes encore conservées.
+    Avec un deduplicator (transformations.deduplicator), les clés des chunks précédents comptent aussi.
     """
-    df = df[df["status_code"] != 500]
-    df = df.drop_duplicates(subset=["request_id"])
-    df = df.dropna()
-    return df
+    dup = np.zeros(len(values), dtype=bool)
+    rows = np.flatnonzero(keep)
+    if deduplicator is not None:
+        dup[rows] = deduplicator.duplicated(values.iloc[rows])
+    else:
+        dup[rows] = values.iloc[rows].duplicated().to_numpy()
+    return dup
+
+
+def _select(df: pd.DataFrame, keep: np.ndarray, **columns: pd.Series) -> pd.DataFrame:
+    """Unique matérialisation : lignes conservées + colonnes converties."""
+    rows = np.flatnonzero(keep)
+    out = df.take(rows)
+    for name, values in columns.items():
+        out[name] = values.iloc[rows]
+    return out
 
-def clean_session_data(df: pd.DataFrame) -> pd.DataFrame:
+
+def clean_api_logs(df: pd.DataFrame, report: Optional[Dict[str, int]] = None, deduplicator=None) -> pd.DataFrame:
+    """
+    Nettoyage des logs API : suppression erreurs, doublons, nulls (dans cet ordre)
+    - report : dict optionnel, cumule le nombre de lignes retirées par étape
+    - deduplicator : KeyDeduplicator partagé entre chunks (request_id), sinon doublons du chunk seul
+    """
+    keep = np.ones(len(df), dtype=bool)
+    keep = _drop(keep, df["status_code"].eq(500).fillna(False).to_numpy(dtype=bool), "status_500", report)
+    keep = _drop(keep, _duplicated(df["request_id"], keep, deduplicator), "duplicates", report)
+    keep = _drop(keep, _missing(*(df[col] for col in df.columns)), "missing_values", report)
+    return _select(df, keep)
+
+def clean_session_data(df: pd.DataFrame, report: Optional[Dict[str, int]] = None) -> pd.DataFrame:
     """
     Nettoyage des données de session :
     - Suppression des lignes avec session_id, start_time ou end_time manquants
     - Conversion robuste des timestamps
     - Suppression des lignes avec timestamps invalides
     """
+    keep = np.ones(len(df), dtype=bool)
 
     # Supprimer les lignes sans identifiants essentiels
-    df = df.dropna(subset=['session_id', 'start_time', 'end_time'])
+    keep = _drop(keep, _missing(df["session_id"], df["start_time"], df["end_time"]), "missing_ids", report)
 
     # Conversion des timestamps
-    df['start_time'] = pd.to_datetime(df['start_time'], errors='coerce')
-    df['end_time'] = pd.to_datetime(df['end_time'], errors='coerce')
+    start_time = pd.to_datetime(df["start_time"], errors="coerce")
+    end_time = pd.to_datetime(df["end_time"], errors="coerce")
 
     # Supprimer les lignes avec timestamps invalides
-    df = df.dropna(subset=['start_time', 'end_time'])
+    keep = _drop(keep, _missing(start_time, end_time), "invalid_timestamps", report)
 
-    return df
+    return _select(df, keep, start_time=start_time, end_time=end_time)
 
-def clean_product_data(df: pd.DataFrame) -> pd.DataFrame:
+def clean_product_data(df: pd.DataFrame, report: Optional[Dict[str, int]] = None, deduplicator=None) -> pd.DataFrame:
     """
     Nettoyage des données produits :
     - Suppression des produits sans identifiant, prix ou stock
     - Suppression des doublons sur product_id
     - Normalisation des types de données
     """
-    df = df.dropna(subset=["product_id", "price", "stock"])
-    df = df.drop_duplicates(subset=["product_id"])
+    keep = np.ones(len(df), dtype=bool)
+    keep = _drop(keep, _missing(df["product_id"], df["price"], df["stock"]), "missing_required", report)
+    keep = _drop(keep, _duplicated(df["product_id"], keep, deduplicator), "duplicates", report)
 
     # Conversions de types
-    df["price"] = pd.to_numeric(df["price"], errors="coerce")
-    df["cost"] = pd.to_numeric(df["cost"], errors="coerce")
-    df["stock"] = pd.to_numeric(df["stock"], errors="coerce")
-    df["created_at"] = pd.to_datetime(df["created_at"], errors="coerce")
+    price = pd.to_numeric(df["price"], errors="coerce")
+    cost = pd.to_numeric(df["cost"], errors="coerce")
+    stock = pd.to_numeric(df["stock"], errors="coerce")
+    created_at = pd.to_datetime(df["created_at"], errors="coerce")
 
-    df = df.dropna(subset=["price", "cost", "stock", "created_at"])
+    keep = _drop(keep, _missing(price, cost, stock, created_at), "invalid_values", report)
 
-    return df
+    return _select(df, keep, price=price, cost=cost, stock=stock, created_at=created_at)
 
 # transformations/data_cleaner.py
 
 
-def clean_user_data(df: pd.DataFrame) -> pd.DataFrame:
+def clean_user_data(df: pd.DataFrame, report: Optional[Dict[str, int]] = None, deduplicator=None) -> pd.DataFrame:
     """
     Nettoyage des données utilisateurs :
     - Suppression des doublons
@@ -60,19 +111,23 @@ def clean_user_data(df: pd.DataFrame) -> pd.DataFrame:
     - Gestion des valeurs manquantes
     - Uniformisation des types
     """
-    df = df.drop_duplicates(subset=["user_id"])
-    
+    keep = np.ones(len(df), dtype=bool)
+    keep = _drop(keep, _duplicated(df["user_id"], keep, deduplicator), "duplicates", report)
+
     # Conversion des dates
-    df["registration_date"] = pd.to_datetime(df["registration_date"], errors="coerce")
-    df["last_login"] = pd.to_datetime(df["last_login"], errors="coerce")
+    registration_date = pd.to_datetime(df["registration_date"], errors="coerce")
+    last_login = pd.to_datetime(df["last_login"], errors="coerce")
 
     # Gestion des valeurs manquantes
-    df = df.dropna(subset=["user_id", "registration_date", "last_login"])
-    
-    # Conversion des types
-    df["is_premium"] = df["is_premium"].astype(bool)
-    df["age"] = pd.to_numeric(df["age"], errors="coerce")
-    df["total_orders"] = pd.to_numeric(df["total_orders"], errors="coerce")
-    df["total_spent"] = pd.to_numeric(df["total_spent"], errors="coerce")
+    keep = _drop(keep, _missing(df["user_id"], registration_date, last_login), "missing_required", report)
 
-    return df
+    # Conversion des types
+    return _select(
+        df, keep,
+        registration_date=registration_date,
+        last_login=last_login,
+        is_premium=df["is_premium"].astype(bool),
+        age=pd.to_numeric(df["age"], errors="coerce"),
+        total_orders=pd.to_numeric(df["total_orders"], errors="coerce"),
+        total_spent=pd.to_numeric(df["total_spent"], errors="coerce"),
+    )
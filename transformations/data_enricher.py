@@ -1,49 +1,113 @@
 # transformations/data_enricher.py
 
+import numpy as np
 import pandas as pd
-import os
 
-def enrich_api_logs(df: pd.DataFrame, input_path: str = None, append: bool = False) -> pd.DataFrame:
+from transformations.data_storage import PartSink
+
+# ==============================
+# 🏷️ Règles de classification (ordonnées : la première qui matche gagne)
+# ==============================
+
+ENDPOINT_RULES = [
+    (("/checkout",), "checkout"),
+    (("/cart",), "cart"),
+    (("/categories",), "catalog"),
+    (("/login", "/auth"), "auth"),
+    (("/products",), "product"),
+]
+
+REFERRER_RULES = [
+    (("ads",), "ads"),
+    (("facebook", "social"), "social"),
+    (("direct",), "direct"),
+]
+
+DEVICE_RULES = [
+    ("desktop", "desktop"),
+    ("tablet", "tablet"),
+    ("mobile", "mobile"),
+]
+
+STOCK_RULES = [
+    (10, "low"),
+    (100, "medium"),
+]
+
+
+def drop_enriched(name: str, input_path: str) -> int:
     """
-    Enrichissement des logs API : catégorisation des endpoints + ajout date
-    - Si input_path est fourni, le fichier sera automatiquement exporté
-    - Si append=True, les données seront ajoutées au fichier existant sans écrasement
+    Retire de la table partagée <name> les parts d'une exécution précédente du fichier,
+    une fois avant ses chunks (un fichier retraité sans aucun chunk ne laisse pas de parts périmées).
     """
+    return PartSink(name).drop_source(input_path)
+
+
+def export_enriched(df: pd.DataFrame, name: str, input_path: str, part_index: int = 0) -> str:
+    """Exporte un chunk enrichi comme part n° part_index de la table partagée <name>."""
+    return PartSink(name).write_part(df, input_path, part_index)
+
+
+def _select(series: pd.Series, conditions, labels, default: str) -> pd.Series:
+    """np.select vectorisé : la première condition vraie donne le label."""
+    conditions = [np.asarray(c, dtype=bool) for c in conditions]
+    values = np.select(conditions, labels, default=default)
+    return pd.Series(values, index=series.index)
 
-    def classify_endpoint(endpoint):
-        if "/checkout" in endpoint:
-            return "checkout"
-        elif "/cart" in endpoint:
-            return "cart"
-        elif "/categories" in endpoint:
-            return "catalog"
-        elif "/login" in endpoint or "/auth" in endpoint:
-            return "auth"
-        elif "/products" in endpoint:
-            return "product"
-        else:
-            return "other"
+
+def classify_by_patterns(series: pd.Series, rules, default: str = "other", na_label: str = None) -> pd.Series:
+    """
+    Classification par sous-chaînes : rules = [((motif, ...), label), ...].
+    - Une règle matche si l'un de ses motifs est contenu dans la valeur
+    - Si na_label est fourni, les valeurs manquantes reçoivent ce label en priorité
+    """
+    conditions, labels = [], []
+    if na_label is not None:
+        conditions.append(series.isna().to_numpy())
+        labels.append(na_label)
+    for patterns, label in rules:
+        mask = np.zeros(len(series), dtype=bool)
+        for pattern in patterns:
+            mask |= series.str.contains(pattern, regex=False, na=False).to_numpy(dtype=bool)
+        conditions.append(mask)
+        labels.append(label)
+    return _select(series, conditions, labels, default)
+
+
+def classify_by_values(series: pd.Series, rules, default: str = "unknown") -> pd.Series:
+    """Classification par égalité stricte : rules = [(valeur, label), ...]."""
+    conditions = [series.eq(value).fillna(False).to_numpy(dtype=bool) for value, _ in rules]
+    labels = [label for _, label in rules]
+    return _select(series, conditions, labels, default)
+
+
+def classify_by_thresholds(series: pd.Series, rules, default: str) -> pd.Series:
+    """
+    Classification par seuils croissants : rules = [(seuil, label), ...] avec valeur <= seuil.
+    Les valeurs manquantes ne satisfont aucun seuil et reçoivent le label par défaut.
+    """
+    conditions = [series.le(threshold).fillna(False).to_numpy(dtype=bool) for threshold, _ in rules]
+    labels = [label for _, label in rules]
+    return _select(series, conditions, labels, default)
+
+
+def enrich_api_logs(df: pd.DataFrame, input_path: str = None, part_index: int = 0) -> pd.DataFrame:
+    """
+    Enrichissement des logs API : catégorisation des endpoints + ajout date
+    - Si input_path est fourni, le chunk est exporté comme part de logs_enriched
+    - part_index : numéro du chunk (parts précédentes du fichier retirées au préalable par drop_enriched)
+    """
 
     # 🔹 Catégorisation des endpoints
-    df["category"] = df["endpoint"].apply(classify_endpoint)
+    df["category"] = classify_by_patterns(df["endpoint"], ENDPOINT_RULES, default="other")
 
     # 🔹 Ajout de la date à partir du timestamp
     df["date"] = pd.to_datetime(df["timestamp"]).dt.date.astype(str)
 
-    # 💾 Export automatique si demandé
+    # 💾 Export automatique si demandé (format selon pipeline_config.yaml)
     if input_path:
-        enriched_dir = os.path.abspath(
-            os.path.join(os.path.dirname(__file__), "..", "data", "processed", "enriched")
-        )
-        os.makedirs(enriched_dir, exist_ok=True)
-        output_file = os.path.join(enriched_dir, "logs_enriched.csv")
-
-        if append and os.path.exists(output_file):
-            df.to_csv(output_file, mode="a", header=False, index=False)
-            print(f"➕ Append vers : {output_file}")
-        else:
-            df.to_csv(output_file, index=False)
-            print(f"💾 Export (écrasement) vers : {output_file}")
+        output_file = export_enriched(df, "logs_enriched", input_path, part_index)
+        print(f"➕ Part écrite : {output_file}")
 
     return df
 
@@ -62,32 +126,12 @@ def enrich_session_data(df: pd.DataFrame) -> pd.DataFrame:
     df["duration_min"] = (df["end_time"] - df["start_time"]).dt.total_seconds() / 60
 
     # Type de trafic (referrer)
-    def classify_referrer(ref):
-        if pd.isna(ref):
-            return "unknown"
-        elif "ads" in ref:
-            return "ads"
-        elif "facebook" in ref or "social" in ref:
-            return "social"
-        elif "direct" in ref:
-            return "direct"
-        else:
-            return "other"
-
-    df["traffic_source"] = df["referrer"].apply(classify_referrer)
+    df["traffic_source"] = classify_by_patterns(
+        df["referrer"], REFERRER_RULES, default="other", na_label="unknown"
+    )
 
     # Catégorie de device
-    def classify_device(device):
-        if device == "desktop":
-            return "desktop"
-        elif device == "tablet":
-            return "tablet"
-        elif device == "mobile":
-            return "mobile"
-        else:
-            return "unknown"
-
-    df["device_category"] = df["device_type"].apply(classify_device)
+    df["device_category"] = classify_by_values(df["device_type"], DEVICE_RULES, default="unknown")
 
     # Comportement utilisateur
     df["is_bounce"] = df["bounce_rate"] == True
@@ -100,7 +144,7 @@ def enrich_session_data(df: pd.DataFrame) -> pd.DataFrame:
 import pandas as pd
 from datetime import datetime, timedelta
 
-def enrich_product_data(df: pd.DataFrame, input_path: str = None) -> pd.DataFrame:
+def enrich_product_data(df: pd.DataFrame, input_path: str = None, part_index: int = 0) -> pd.DataFrame:
     """
     Enrichissement des données produits :
     - Calcul de la marge
@@ -112,29 +156,19 @@ def enrich_product_data(df: pd.DataFrame, input_path: str = None) -> pd.DataFram
     df["margin_pct"] = ((df["price"] - df["cost"]) / df["cost"]) * 100
 
     # 🔹 Statut de stock : low, medium, high
-    def classify_stock(stock):
-        if stock <= 10:
-            return "low"
-        elif stock <= 100:
-            return "medium"
-        else:
-            return "high"
-    df["stock_status"] = df["stock"].apply(classify_stock)
+    df["stock_status"] = classify_by_thresholds(df["stock"], STOCK_RULES, default="high")
 
     # 🔹 Produit récent : créé il y a moins de 30 jours
     now = datetime.now()
-    df["is_new"] = df["created_at"].apply(lambda x: (now - x).days <= 30)
+    df["is_new"] = ((now - df["created_at"]).dt.days <= 30).to_numpy(dtype=bool)
     df["created_at"] = pd.to_datetime(df["created_at"], errors="coerce")
     df["date"] = df["created_at"].dt.date.astype(str)
     if input_path:
-        enriched_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "processed", "enriched"))
-        os.makedirs(enriched_dir, exist_ok=True)
-        output_file = os.path.join(enriched_dir, "products_enriched.csv")
-        df.to_csv(output_file, index=False)
+        output_file = export_enriched(df, "products_enriched", input_path, part_index)
         print(f"💾 Données de produits enrichies exportées vers : {output_file}")
     return df
 
-def enrich_user_data(df: pd.DataFrame, input_path: str = None) -> pd.DataFrame:
+def enrich_user_data(df: pd.DataFrame, input_path: str = None, part_index: int = 0) -> pd.DataFrame:
     """
     Enrichissement des données utilisateurs :
     - Typologie client
@@ -142,16 +176,13 @@ def enrich_user_data(df: pd.DataFrame, input_path: str = None) -> pd.DataFrame:
     - Jours depuis dernière connexion
     """
 
-    # Type de client
-    def classify_customer(row):
-        if row["is_premium"]:
-            return "premium"
-        elif row["total_orders"] == 0:
-            return "new"
-        else:
-            return "returning"
-
-    df["customer_type"] = df.apply(classify_customer, axis=1)
+    # Type de client (premium > nouveau > récurrent)
+    df["customer_type"] = _select(
+        df["is_premium"],
+        [df["is_premium"].astype(bool), df["total_orders"].eq(0).fillna(False)],
+        ["premium", "new"],
+        default="returning",
+    )
 
     # Score de fidélité
     df["loyalty_score"] = (
@@ -165,9 +196,6 @@ def enrich_user_data(df: pd.DataFrame, input_path: str = None) -> pd.DataFrame:
         pd.Timestamp.now() - df["last_login"]
     ).dt.days
     if input_path:
-        enriched_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "processed", "enriched"))
-        os.makedirs(enriched_dir, exist_ok=True)
-        output_file = os.path.join(enriched_dir, "sales_enriched.csv")
-        df.to_csv(output_file, index=False)
+        output_file = export_enriched(df, "sales_enriched", input_path, part_index)
         print(f"💾 Données de ventes enrichies exportées vers : {output_file}")
     return df
@@ -1,29 +1,273 @@
 # transformations/data_formatter.py
 
 import os
+import json
+import uuid
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, List, Optional, Set, Tuple
 
-def export_api_logs_partitioned(df_agg: pd.DataFrame, input_path: str):
+from transformations.data_aggregator import API_LOGS_DIMENSIONS, finalize_api_logs_aggregate, merge_partial_aggregates
+from transformations.data_reader import source_name
+from transformations.data_storage import (
+    data_path, file_lock, find_table, load_pipeline_config, read_table, remove_table, table_fingerprint, write_table,
+    write_table_atomic,
+)
+
+# ==============================
+# 🗂️ Écriture partitionnée partagée
+# ==============================
+
+def export_threads(config: Optional[dict] = None) -> int:
+    """Threads d'écriture des partitions (export_threads de pipeline_config.yaml, défaut 4)."""
+    config = config if config is not None else load_pipeline_config()
+    return max(1, int(config.get("export_threads", 4)))
+
+
+def write_partitioned(
+    df: pd.DataFrame,
+    root: str,
+    partition_col: str,
+    file_name: Callable[[str], str],
+    threads: Optional[int] = None,
+    write: Callable[[pd.DataFrame, str], str] = write_table,
+) -> List[str]:
     """
-    Écrit les fichiers agrégés dans /data/processed/api_logs/YYYY-MM-DD/
+    Écrit une table par valeur de partition_col dans root/<valeur>/<file_name(valeur)>.<format>.
+    - Un seul groupby (ordre des lignes conservé dans chaque partition) au lieu d'un filtre par valeur
+    - Partitions écrites en parallèle par un pool de threads borné (CSV ou Parquet selon output_format)
+    - write(part, base) : écriture d'une partition (défaut write_table, remplace le fichier)
+    La colonne de partition n'est pas écrite (elle est portée par le dossier).
     """
-    processed_root = os.path.abspath(
-        os.path.join(os.path.dirname(__file__), "..", "data", "processed", "api_logs")
-    )
+    groups = [
+        (str(value), part.drop(columns=[partition_col]))
+        for value, part in df.groupby(partition_col, sort=False, observed=True)
+    ]
+    if not groups:
+        return []
+
+    def write_group(value: str, part: pd.DataFrame) -> str:
+        return write(part, os.path.join(root, value, file_name(value)))
+
+    threads = min(threads or export_threads(), len(groups))
+    if threads == 1:
+        return [write_group(value, part) for value, part in groups]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(lambda group: write_group(*group), groups))
+
+
+PARTITION_SOURCES = "_sources.json"   # source → valeurs des partitions qu'elle a écrites
+
+
+def _partition_sources(root: str) -> dict:
+    path = os.path.join(root, PARTITION_SOURCES)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def record_partitions(root: str, source: str, values: List[str]) -> Tuple[List[str], Set[str]]:
+    """
+    Enregistre les partitions écrites par une source dans root/_sources.json (sous verrou).
+    Retourne celles de son traitement précédent et celles encore enregistrées pour les autres sources.
+    """
+    path = os.path.join(root, PARTITION_SOURCES)
+    os.makedirs(root, exist_ok=True)
+    with file_lock(f"{os.path.splitext(path)[0]}.lock"):
+        sources = _partition_sources(root)
+        previous = sources.get(source, [])
+        sources[source] = sorted(values)
+        tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(sources, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    others = {value for name, held in sources.items() if name != source for value in held}
+    return previous, others
+
+
+def partition_values(df: Optional[pd.DataFrame], partition_col: str) -> List[str]:
+    """Valeurs de partition_col écrites par write_partitioned (vide si df est None ou vide)."""
+    if df is None or df.empty:
+        return []
+    return [str(value) for value in df[partition_col].dropna().unique()]
+
+
+def replace_partitioned(
+    df: Optional[pd.DataFrame],
+    root: str,
+    partition_col: str,
+    file_name: Callable[[str], str],
+    input_path: str,
+) -> List[str]:
+    """
+    write_partitioned pour la sortie d'un fichier source : les partitions de son traitement précédent
+    qu'il ne produit plus sont supprimées (toutes si df est None ou vide), sauf si une autre source
+    les a écrites depuis.
+    """
+    values = partition_values(df, partition_col)
+    previous, others = record_partitions(root, source_name(input_path), values)
+    for value in sorted(set(previous) - set(values) - others):
+        remove_table(os.path.join(root, value, file_name(value)))
+    if not values:
+        return []
+    return write_partitioned(df, root, partition_col, file_name)
+
+
+# ==============================
+# ➕ Partitions KPI fusionnables (plusieurs fichiers sources par date)
+# ==============================
+
+def _write_api_logs_kpi(partials: pd.DataFrame, base: str, dimensions: List[str]) -> str:
+    by_source = [group.drop(columns=["source"]) for _, group in partials.groupby("source", sort=False)]
+    kpi = finalize_api_logs_aggregate(merge_partial_aggregates(by_source, dimensions), dimensions)
+    return write_table_atomic(kpi, f"{base}_kpi")
+
+
+def _read_api_logs_partials(partials_base: str, dimensions: List[str]) -> Optional[pd.DataFrame]:
+    if find_table(partials_base) is None:
+        return None
+    return read_table(partials_base, dtype={c: "string" for c in ["source"] + dimensions})
+
+
+def merge_api_logs_partition(partial: pd.DataFrame, base: str, source: str) -> str:
+    """
+    Fusionne les agrégats partiels d'une source dans une partition journalière, sous verrou :
+    - <base>_partials : compteurs et sommes par source (la source retraitée remplace sa contribution)
+    - <base>_kpi      : KPI finaux recalculés sur toutes les sources (remplacement atomique)
+    """
+    dimensions = [d for d in API_LOGS_DIMENSIONS if d != "date"]
+    partials_base = f"{base}_partials"
+    with file_lock(f"{base}.lock"):
+        frames = []
+        stored = _read_api_logs_partials(partials_base, dimensions)
+        if stored is not None:
+            frames.append(stored[stored["source"] != source])
+        partial = partial.copy()
+        partial.insert(0, "source", source)
+        frames.append(partial)
+        partials = pd.concat(frames, ignore_index=True)
+        write_table_atomic(partials, partials_base)
+        return _write_api_logs_kpi(partials, base, dimensions)
+
+
+def drop_api_logs_source(base: str, source: str) -> bool:
+    """
+    Retire la contribution d'une source d'une partition journalière (sous verrou) et recalcule son KPI ;
+    une partition sans autre source est supprimée. Retourne True si la partition a été modifiée.
+    """
+    dimensions = [d for d in API_LOGS_DIMENSIONS if d != "date"]
+    partials_base = f"{base}_partials"
+    with file_lock(f"{base}.lock"):
+        stored = _read_api_logs_partials(partials_base, dimensions)
+        if stored is None or not (stored["source"] == source).any():
+            return False
+        partials = stored[stored["source"] != source].reset_index(drop=True)
+        if partials.empty:
+            remove_table(partials_base)
+            remove_table(f"{base}_kpi")
+        else:
+            write_table_atomic(partials, partials_base)
+            _write_api_logs_kpi(partials, base, dimensions)
+        return True
+
+
+def export_api_logs_partitioned(df_partial: Optional[pd.DataFrame], input_path: str):
+    """
+    Écrit les agrégats dans /data/processed/api_logs/YYYY-MM-DD/ :
+    df_partial (partial_aggregate_api_logs) est fusionné avec les fichiers déjà traités pour la même date,
+    api_logs_<date>_kpi reste juste quel que soit l'ordre d'arrivée des fichiers.
+    Source retraitée : sa contribution est retirée des dates où elle n'apparaît plus (_sources.json),
+    de toutes si df_partial est None ou vide (aucun log exploitable).
+    """
+    processed_root = data_path("processed", "api_logs")
     os.makedirs(processed_root, exist_ok=True)
 
-    for date_str in df_agg["date"].unique():
-        partition_path = os.path.join(processed_root, date_str)
-        os.makedirs(partition_path, exist_ok=True)
+    source = source_name(input_path)
+    dates = partition_values(df_partial, "date")
+    previous, _ = record_partitions(processed_root, source, dates)
+    for date_str in sorted(set(previous) - set(dates)):
+        base = os.path.join(processed_root, date_str, f"api_logs_{date_str}")
+        if drop_api_logs_source(base, source) and find_table(f"{base}_partials") is None:
+            invalidate_rollups(date_str)
+    if not dates:
+        return
+
+    write_partitioned(
+        df_partial, processed_root, "date", lambda date_str: f"api_logs_{date_str}",
+        write=lambda part, base: merge_api_logs_partition(part, base, source),
+    )
+
+# ==============================
+# 📆 Consolidation hebdomadaire / mensuelle des KPI API
+# ==============================
+
+ROLLUP_PERIODS = {
+    "week": lambda day: "{}-W{:02d}".format(*day.isocalendar()[:2]),
+    "month": lambda day: day.strftime("%Y-%m"),
+}
+
+
+def _latest_change(bases: List[str]) -> int:
+    return max((mtime for base in bases for _, _, mtime in table_fingerprint(base)), default=0)
+
+
+def invalidate_rollups(date_str: str) -> None:
+    """
+    Supprime les consolidations contenant une date dont la partition a disparu : la période est
+    recalculée par le prochain rollup_api_logs (le mtime des partitions restantes ne le déclencherait pas).
+    """
+    day = datetime.strptime(date_str, "%Y-%m-%d")
+    for period, period_key in ROLLUP_PERIODS.items():
+        key = period_key(day)
+        out_base = data_path("processed", "api_logs_rollup", period, key, f"api_logs_{key}")
+        remove_table(f"{out_base}_partials")
+        remove_table(f"{out_base}_kpi")
+
+
+def rollup_api_logs(period: str, force: bool = False) -> List[str]:
+    """
+    Consolide les partitions journalières data/processed/api_logs/<date>/ par semaine ISO ou par mois :
+    les partiels de chaque jour (compteurs, sommes, résumés hll_ / topk_) sont fusionnés, sans relire les logs.
+    Écrit data/processed/api_logs_rollup/<period>/<clé>/api_logs_<clé>_partials et _kpi ;
+    une période dont aucune partition n'a changé depuis sa dernière consolidation est conservée (sauf force).
+    """
+    if period not in ROLLUP_PERIODS:
+        raise ValueError(f"❌ Période non supportée : {period}")
+    daily_root = data_path("processed", "api_logs")
+    dimensions = [d for d in API_LOGS_DIMENSIONS if d != "date"]
+
+    by_key = {}
+    for date_str in sorted(os.listdir(daily_root)) if os.path.isdir(daily_root) else []:
+        try:
+            day = datetime.strptime(date_str, "%Y-%m-%d")
+        except ValueError:
+            continue
+        base = os.path.join(daily_root, date_str, f"api_logs_{date_str}_partials")
+        if find_table(base) is not None:
+            by_key.setdefault(ROLLUP_PERIODS[period](day), []).append(base)
+
+    written = []
+    for key, bases in by_key.items():
+        out_base = data_path("processed", "api_logs_rollup", period, key, f"api_logs_{key}")
+        if not force and _latest_change([f"{out_base}_kpi"]) >= _latest_change(bases):
+            continue
+        os.makedirs(os.path.dirname(out_base), exist_ok=True)
+        frames = [
+            read_table(base, dtype={c: "string" for c in ["source"] + dimensions}).drop(columns=["source"])
+            for base in bases
+        ]
+        partial = merge_partial_aggregates(frames, dimensions)
+        write_table_atomic(partial, f"{out_base}_partials")
+        written.append(write_table_atomic(finalize_api_logs_aggregate(partial, dimensions), f"{out_base}_kpi"))
+    return written
 
-        df_day = df_agg[df_agg["date"] == date_str].drop(columns=["date"])
-        output_file = os.path.join(partition_path, f"api_logs_{date_str}_kpi.csv")
-        df_day.to_csv(output_file, index=False)
-        # print(f"✅ Fichier généré : {output_file}")
 
 def export_session_data_partitioned(df: pd.DataFrame, input_path: str, data_type: str = "sessions") -> None:
     """
-    Exporte un DataFrame analysé vers un fichier CSV partitionné par date.
+    Exporte un DataFrame analysé vers un fichier partitionné par date (CSV ou Parquet).
+    Les partitions d'un traitement précédent du fichier absentes de df sont supprimées.
 
     Args:
         df (pd.DataFrame): DataFrame contenant une colonne 'date' pour partition.
@@ -31,71 +275,42 @@ def export_session_data_partitioned(df: pd.DataFrame, input_path: str, data_type
         data_type (str): Type de données (par défaut : 'sessions', peut être 'api_logs'...).
     """
 
+    processed_root = data_path("processed", "sessions")
     if df.empty:
         print("⚠️  Le DataFrame est vide, aucun fichier généré.")
-        return
-
-    if "date" not in df.columns:
+    elif "date" not in df.columns:
         raise ValueError("❌ La colonne 'date' est requise pour effectuer un export partitionné.")
-
-    processed_root = os.path.abspath(
-        os.path.join(os.path.dirname(__file__), "..", "data", "processed", "sessions")
-    )
     os.makedirs(processed_root, exist_ok=True)
 
-    # Nom de base du fichier (ex: sessions_20250723.csv → sessions_20250723_aggregated.csv)
+    # Nom de base du fichier (ex: sessions_20250723.csv → sessions_20250723_aggregated.<format>)
     base_name = os.path.basename(input_path).replace(".csv", "").replace(".json", "")
-    output_base = f"{base_name}_aggregated.csv"
+    output_base = f"{base_name}_aggregated"
 
     # Export pour chaque date
-    for date_str in df["date"].unique():
-        partition_path = os.path.join(processed_root, date_str)
-        os.makedirs(partition_path, exist_ok=True)
-
-        df_day = df[df["date"] == date_str].drop(columns=["date"])
-        output_path = os.path.join(partition_path, output_base)
-        df_day.to_csv(output_path, index=False)
-
-        # print(f"✅ Fichier généré : {output_path}")
+    replace_partitioned(df, processed_root, "date", lambda date_str: output_base, input_path)
 
 def export_product_data_partitioned(df_agg: pd.DataFrame, input_path: str):
     """
     Export des données produits agrégées dans /data/processed/products/YYYY-MM-DD/
+    (partitions d'un traitement précédent du fichier absentes de df_agg supprimées)
     """
     if "date" not in df_agg.columns:
         raise ValueError("❌ La colonne 'date' est requise pour effectuer un export partitionné.")
 
-    processed_root = os.path.abspath(
-        os.path.join(os.path.dirname(__file__), "..", "data", "processed", "products")
-    )
+    processed_root = data_path("processed", "products")
     os.makedirs(processed_root, exist_ok=True)
 
-    for date_str in df_agg["date"].unique():
-        partition_path = os.path.join(processed_root, date_str)
-        os.makedirs(partition_path, exist_ok=True)
-
-        df_day = df_agg[df_agg["date"] == date_str].drop(columns=["date"])
-        output_file = os.path.join(partition_path, f"products_{date_str}_summary.csv")
-        df_day.to_csv(output_file, index=False)
-        # print(f"✅ Fichier généré : {output_file}")
+    replace_partitioned(df_agg, processed_root, "date", lambda date_str: f"products_{date_str}_summary", input_path)
 
 def export_user_data_partitioned(df_agg: pd.DataFrame, input_path: str):
     """
     Exporte les données agrégées des utilisateurs dans /data/processed/users/<country>/...
+    (partitions d'un traitement précédent du fichier absentes de df_agg supprimées)
     """
     if "country" not in df_agg.columns:
         raise ValueError("❌ La colonne 'country' est requise pour effectuer un export partitionné.")
 
-    processed_root = os.path.abspath(
-        os.path.join(os.path.dirname(__file__), "..", "data", "processed", "sales")
-    )
+    processed_root = data_path("processed", "sales")
     os.makedirs(processed_root, exist_ok=True)
 
-    for country in df_agg["country"].unique():
-        partition_path = os.path.join(processed_root, country)
-        os.makedirs(partition_path, exist_ok=True)
-
-        df_country = df_agg[df_agg["country"] == country].drop(columns=["country"])
-        output_file = os.path.join(partition_path, f"users_{country}_summary.csv")
-        df_country.to_csv(output_file, index=False)
-        # print(f"✅ Fichier généré : {output_file}")
\ No newline at end of file
+    replace_partitioned(df_agg, processed_root, "country", lambda country: f"users_{country}_summary", input_path)
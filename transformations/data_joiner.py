@@ -1,17 +1,48 @@
 #!/usr/bin/env python3
 import os
 import sys
+import shutil
+import argparse
+import tempfile
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 
 # =======================================
 # 📁 Localisation des fichiers
 # =======================================
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-ENRICHED_DIR = os.path.join(BASE_DIR, "data", "processed", "enriched")
-OUTPUT_DIR = os.path.join(BASE_DIR, "data", "processed", "joined")
+sys.path.insert(0, BASE_DIR)
+
+from transformations.data_storage import (
+    concat_table_files, data_path, find_table, iter_table, load_pipeline_config, read_table, write_table,
+)
+from transformations.dimension_cache import cached_dimension
+from monitoring.instrumentation import stage
+
+ENRICHED_DIR = data_path("processed", "enriched")
+OUTPUT_DIR = data_path("processed", "joined")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Colonnes réellement utilisées par la jointure (lecture sélective)
+USER_COLUMNS = [
+    "user_id", "email", "first_name", "last_name", "age", "gender", "country", "city",
+    "registration_date", "is_premium", "total_orders", "total_spent", "last_login",
+    "customer_type", "loyalty_score", "days_since_last_login",
+]
+SESSION_COLUMNS = [
+    "session_id", "user_id", "start_time", "end_time", "duration_seconds", "pages_visited",
+    "products_viewed", "products_added_to_cart", "conversion", "total_spent", "device_type",
+    "browser", "referrer", "bounce_rate", "country", "city", "duration_min", "traffic_source",
+    "device_category", "is_bounce", "is_conversion", "abandoned_cart", "date",
+]
+LOG_COLUMNS = [
+    "session_id", "user_id", "timestamp", "request_id", "endpoint", "method", "status_code",
+    "response_time_ms", "user_agent", "ip_address", "country_code", "payload_size_bytes",
+    "cache_hit", "error_message", "category", "date",
+]
+
 # ---------------------------------------
 # 🔧 Helpers
 # ---------------------------------------
@@ -23,79 +54,103 @@ def normalize_keys(df: pd.DataFrame, keys=("user_id", "session_id")) -> pd.DataF
     return df
 
 def parse_dates_safe(df: pd.DataFrame, cols) -> pd.DataFrame:
-    """to_datetime(errors='coerce') pour les colonnes de dates."""
+    """to_datetime(errors='coerce') pour les colonnes de dates (déjà typées en Parquet : ignorées)."""
     for c in cols:
-        if c in df.columns:
+        if c in df.columns and not pd.api.types.is_datetime64_any_dtype(df[c]):
             df[c] = pd.to_datetime(df[c], errors="coerce")
     return df
 
-def read_csv_force_types(path: str, force_string_cols=("user_id","session_id")) -> pd.DataFrame:
-    """Lecture robuste avec dtype forcé et low_memory=False."""
-    dtype = {c: "string" for c in force_string_cols}
-    return pd.read_csv(path, dtype=dtype, low_memory=False)
-
-def safe_load(path: str, force_cols=("user_id","session_id")) -> pd.DataFrame:
-    if not os.path.exists(path):
-        print(f"⚠️  Fichier manquant (skip) : {path}")
-        return pd.DataFrame()
+def safe_load(base: str, force_cols=("user_id","session_id"), columns=None) -> pd.DataFrame:
+    """Lecture CSV/Parquet transparente (chemin sans extension), clés forcées en string."""
+    dtype = {c: "string" for c in force_cols}
     try:
-        df = read_csv_force_types(path, force_cols)
-        return df
+        return read_table(base, columns=columns, dtype=dtype)
+    except FileNotFoundError:
+        print(f"⚠️  Fichier manquant (skip) : {base}")
+        return pd.DataFrame()
     except Exception as e:
-        print(f"❌ Erreur de lecture {path}: {e}")
+        print(f"❌ Erreur de lecture {base}: {e}")
         return pd.DataFrame()
 
+def safe_iter(base: str, force_cols=("user_id","session_id"), columns=None, chunksize=None):
+    """Comme safe_load, mais en flux (chunks de chunksize lignes)."""
+    dtype = {c: "string" for c in force_cols}
+    try:
+        yield from iter_table(base, columns=columns, dtype=dtype, chunksize=chunksize)
+    except FileNotFoundError:
+        print(f"⚠️  Fichier manquant (skip) : {base}")
+    except Exception as e:
+        print(f"❌ Erreur de lecture {base}: {e}")
+
 # =======================================
-# 📅 Chargement
+# 📅 Chemins et schéma de sortie
 # =======================================
-users_path    = os.path.join(ENRICHED_DIR, "sales_enriched.csv")
-sessions_path = os.path.join(ENRICHED_DIR, "sessions_enriched.csv")
-logs_path     = os.path.join(ENRICHED_DIR, "logs_enriched.csv")
-
-df_users    = safe_load(users_path,    ("user_id",))
-df_sessions = safe_load(sessions_path, ("user_id","session_id"))
-df_logs     = safe_load(logs_path,     ("user_id","session_id"))
-
-# Si sessions vides => rien à faire
-if df_sessions.empty:
-    print("⚠️ sessions_enriched.csv est vide ou absent — arrêt.")
-    sys.exit(0)
-
-# 🤧 Normalisation des clés (⚠️ réassignation explicite)
-df_users    = normalize_keys(df_users,    ("user_id",))
-df_sessions = normalize_keys(df_sessions, ("user_id","session_id"))
-df_logs     = normalize_keys(df_logs,     ("user_id","session_id"))
-
-# 🗓️ Parsing dates utiles
-df_users    = parse_dates_safe(df_users,    ["registration_date", "last_login"])
-df_sessions = parse_dates_safe(df_sessions, ["start_time", "end_time", "date"])
-df_logs     = parse_dates_safe(df_logs,     ["timestamp", "date"])
-
-# 🪜 Déduplication (avec garde-fous)
-if "user_id" in df_users.columns and not df_users.empty:
-    sort_cols = [c for c in ["user_id","last_login"] if c in df_users.columns]
-    if sort_cols:
-        df_users = df_users.sort_values(by=sort_cols, ascending=[True] + [False]*(len(sort_cols)-1))
-    df_users = df_users.drop_duplicates(subset=["user_id"], keep="first")
-
-if {"session_id","user_id"} <= set(df_logs.columns) and not df_logs.empty:
-    sort_cols = [c for c in ["session_id","user_id","timestamp"] if c in df_logs.columns]
-    if sort_cols:
+users_path    = os.path.join(ENRICHED_DIR, "sales_enriched")
+sessions_path = os.path.join(ENRICHED_DIR, "sessions_enriched")
+logs_path     = os.path.join(ENRICHED_DIR, "logs_enriched")
+output_base   = os.path.join(OUTPUT_DIR, "combined_sessions_data")
+
+# 📅 Colonnes cibles (créées si manquantes pour stabiliser le schéma)
+# après le merge avec suffixes=("", "_log"), la date des logs s’appelle 'date_log'
+cols = [
+    "session_id","user_id","start_time","end_time","duration_seconds","pages_visited",
+    "products_viewed","products_added_to_cart","conversion","total_spent_x","device_type",
+    "browser","referrer","bounce_rate","country_x","city_x","duration_min","traffic_source",
+    "device_category","is_bounce","is_conversion","abandoned_cart","date",
+    "email","first_name","last_name","age","gender","country_y","city_y","registration_date",
+    "is_premium","total_orders","total_spent_y","last_login","customer_type","loyalty_score",
+    "days_since_last_login","timestamp","request_id","endpoint","method","status_code",
+    "response_time_ms","user_agent","ip_address","country_code","payload_size_bytes",
+    "cache_hit","error_message","category","date_log"
+]
+
+MISSING_COLUMNS = ["email", "first_name", "last_name", "total_spent_y", "timestamp", "endpoint"]
+
+# =======================================
+# 🧹 Préparation des tables
+# =======================================
+def prepare_users(df_users: pd.DataFrame) -> pd.DataFrame:
+    """Clés normalisées, dates parsées, 1 ligne par user_id (last_login le plus récent)."""
+    df_users = normalize_keys(df_users, ("user_id",))
+    df_users = parse_dates_safe(df_users, ["registration_date", "last_login"])
+    if "user_id" in df_users.columns and not df_users.empty:
+        sort_cols = [c for c in ["user_id","last_login"] if c in df_users.columns]
+        if sort_cols:
+            df_users = df_users.sort_values(by=sort_cols, ascending=[True] + [False]*(len(sort_cols)-1))
+        df_users = df_users.drop_duplicates(subset=["user_id"], keep="first")
+    return df_users
+
+def prepare_sessions(df_sessions: pd.DataFrame) -> pd.DataFrame:
+    df_sessions = normalize_keys(df_sessions, ("user_id","session_id"))
+    return parse_dates_safe(df_sessions, ["start_time", "end_time", "date"])
+
+def prepare_logs(df_logs: pd.DataFrame) -> pd.DataFrame:
+    df_logs = normalize_keys(df_logs, ("user_id","session_id"))
+    return parse_dates_safe(df_logs, ["timestamp", "date"])
+
+def latest_logs(df_logs: pd.DataFrame) -> pd.DataFrame:
+    """
+    1 log par (session_id, user_id) : le plus récent (timestamp desc).
+    Tri stable : à timestamp égal, la première ligne lue est conservée,
+    ce qui permet d'appliquer la réduction chunk par chunk.
+    """
+    if {"session_id","user_id"} <= set(df_logs.columns) and not df_logs.empty:
+        sort_cols = [c for c in ["session_id","user_id","timestamp"] if c in df_logs.columns]
         # session_id asc, user_id asc, timestamp desc si présent
         ascending = [True, True] + ([False] if "timestamp" in sort_cols else [])
-        # Ajustement longueur ascending = longueur sort_cols
-        if len(ascending) != len(sort_cols):
-            ascending = [True]*len(sort_cols)
-        df_logs = df_logs.sort_values(by=sort_cols, ascending=ascending)
-    df_logs = df_logs.drop_duplicates(subset=["session_id","user_id"], keep="first")
-
-# 🔗 Jointures (partir des sessions)
-try:
+        df_logs = df_logs.sort_values(by=sort_cols, ascending=ascending, kind="stable")
+        df_logs = df_logs.drop_duplicates(subset=["session_id","user_id"], keep="first")
+    return df_logs
+
+# =======================================
+# 🔗 Jointure (partir des sessions)
+# =======================================
+def join_sessions(df_sessions: pd.DataFrame, df_users: pd.DataFrame, df_logs: pd.DataFrame) -> pd.DataFrame:
+    """sessions ⟕ users (m:1) ⟕ logs (1:1), projeté sur le schéma fixe `cols`."""
     # join users (m:1)
     if "user_id" in df_users.columns:
         df_merged = pd.merge(df_sessions, df_users, on="user_id", how="left")
     else:
-        print("⚠️  'user_id' manquant dans users — join users ignorée.")
         df_merged = df_sessions.copy()
 
     # join logs (1:1) sur (session_id,user_id) ; suffixe _log pour colonnes logs
@@ -106,62 +161,279 @@ try:
             how="left",
             suffixes=("", "_log")
         )
-    else:
+
+    for c in cols:
+        if c not in df_merged.columns:
+            df_merged[c] = pd.NA
+    return df_merged[cols]
+
+def warn_missing_keys(df_users: pd.DataFrame, df_logs: pd.DataFrame) -> None:
+    if "user_id" not in df_users.columns:
+        print("⚠️  'user_id' manquant dans users — join users ignorée.")
+    if not {"session_id","user_id"} <= set(df_logs.columns):
         print("⚠️  (session_id,user_id) manquants dans logs — join logs ignorée.")
-except Exception as e:
-    print(f"❌ Erreur lors des jointures : {e}")
-    sys.exit(1)
 
-# 📅 Colonnes cibles (crée celles manquantes pour stabiliser le schéma)
-cols = [
-    "session_id","user_id","start_time","end_time","duration_seconds","pages_visited",
-    "products_viewed","products_added_to_cart","conversion","total_spent_x","device_type",
-    "browser","referrer","bounce_rate","country_x","city_x","duration_min","traffic_source",
-    "device_category","is_bounce","is_conversion","abandoned_cart","date",
-    "email","first_name","last_name","age","gender","country_y","city_y","registration_date",
-    "is_premium","total_orders","total_spent_y","last_login","customer_type","loyalty_score",
-    "days_since_last_login","timestamp","request_id","endpoint","method","status_code",
-    "response_time_ms","user_agent","ip_address","country_code","payload_size_bytes",
-    "cache_hit","error_message","category","date_log"
-]
-# map vers les colonnes effectives après suffixe logs
-if "date_log" not in df_merged.columns and "date_log" not in cols:
-    cols.append("date_log")
-if "date_log" not in df_merged.columns and "date" in df_merged.columns:
-    # après le merge avec suffixes=("", "_log"), la date des logs s’appelle normalement 'date_log'
-    # si ce n’est pas le cas (colonnes différentes), on ne touche pas ici
-    pass
-
-for c in cols:
-    if c not in df_merged.columns:
-        df_merged[c] = pd.NA
-
-# 🔄 Export CSV final
-output_path = os.path.join(OUTPUT_DIR, "combined_sessions_data.csv")
-try:
-    df_merged[cols].to_csv(output_path, index=False)
+# =======================================
+# 🔮 Diagnostic (cumulable chunk par chunk)
+# =======================================
+def key_hashes(df: pd.DataFrame, keys) -> np.ndarray:
+    """Hash uint64 distincts des clés (remplace les sets de tuples Python)."""
+    if df.empty:
+        return np.empty(0, dtype=np.uint64)
+    return np.unique(pd.util.hash_pandas_object(df[list(keys)], index=False).to_numpy())
+
+def new_diagnostics() -> dict:
+    return {
+        "sessions": 0,
+        "unmatched_users": [],
+        "sessions_without_logs": [],
+        "missing": {c: 0 for c in MISSING_COLUMNS},
+    }
+
+def update_diagnostics(diag: dict, df_sessions, df_merged, user_ids: np.ndarray, log_keys: np.ndarray) -> None:
+    diag["sessions"] += len(df_sessions)
+    if user_ids is not None and "user_id" in df_sessions.columns:
+        ids = key_hashes(df_sessions[["user_id"]].dropna(), ["user_id"])
+        diag["unmatched_users"].append(ids[~np.isin(ids, user_ids)])
+    if log_keys is not None and {"session_id","user_id"} <= set(df_sessions.columns):
+        keys = key_hashes(df_sessions, ["session_id", "user_id"])
+        diag["sessions_without_logs"].append(keys[~np.isin(keys, log_keys)])
+    for col in MISSING_COLUMNS:
+        diag["missing"][col] += int(df_merged[col].isna().sum())
+
+def summarize_diagnostics(diag: dict, df_users: pd.DataFrame, df_logs: pd.DataFrame, user_ids, log_keys) -> dict:
+    """Compteurs finaux (additionnables entre buckets disjoints sur user_id)."""
+    def nb_distinct(arrays):
+        return len(np.unique(np.concatenate(arrays))) if arrays else 0
+
+    return {
+        "sessions": diag["sessions"],
+        "users": len(df_users),
+        "logs": len(df_logs),
+        "unmatched_users": nb_distinct(diag["unmatched_users"]) if user_ids is not None else None,
+        "sessions_without_logs": nb_distinct(diag["sessions_without_logs"]) if log_keys is not None else None,
+        "missing": diag["missing"],
+    }
+
+def merge_summaries(summaries) -> dict:
+    merged = {"sessions": 0, "users": 0, "logs": 0, "unmatched_users": None,
+              "sessions_without_logs": None, "missing": {c: 0 for c in MISSING_COLUMNS}}
+    for summary in summaries:
+        for k in ("sessions", "users", "logs"):
+            merged[k] += summary[k]
+        for k in ("unmatched_users", "sessions_without_logs"):
+            if summary[k] is not None:
+                merged[k] = (merged[k] or 0) + summary[k]
+        for c in MISSING_COLUMNS:
+            merged["missing"][c] += summary["missing"][c]
+    return merged
+
+def print_diagnostics(summary: dict) -> None:
+    print("\n--- Diagnostic ---")
+    print(f"Sessions: {summary['sessions']:,} | Users: {summary['users']:,} | Logs: {summary['logs']:,}")
+    if summary["unmatched_users"] is not None:
+        print(f"User IDs sans correspondance: {summary['unmatched_users']}")
+    if summary["sessions_without_logs"] is not None:
+        print(f"Sessions sans logs: {summary['sessions_without_logs']}")
+    for col in MISSING_COLUMNS:
+        pct = round(100 * np.divide(summary["missing"][col], summary["sessions"]), 2) if summary["sessions"] else float("nan")
+        print(f"Manquants {col}: {pct}%")
+
+# =======================================
+# 🚀 Modes d'exécution
+# =======================================
+def load_logs_streaming(chunksize: int) -> pd.DataFrame:
+    """Logs réduits au fil de l'eau : seul le dernier log par (session_id, user_id) est gardé."""
+    df_logs = pd.DataFrame()
+    for chunk in safe_iter(logs_path, ("user_id","session_id"), LOG_COLUMNS, chunksize):
+        chunk = latest_logs(prepare_logs(chunk))
+        df_logs = latest_logs(pd.concat([df_logs, chunk], ignore_index=True)) if not df_logs.empty else chunk
+    return df_logs
+
+def join_and_write(session_chunks, df_users: pd.DataFrame, df_logs: pd.DataFrame, base: str):
+    """
+    Joint les chunks de sessions et les écrit dans <base> (append après le 1er chunk).
+    Retourne (chemin écrit ou None si aucune session, résumé du diagnostic).
+    """
+    user_ids = key_hashes(df_users, ["user_id"]) if "user_id" in df_users.columns else None
+    log_keys = key_hashes(df_logs, ["session_id", "user_id"]) if {"session_id","user_id"} <= set(df_logs.columns) else None
+
+    diag = new_diagnostics()
+    output_path = None
+    for i, df_sessions in enumerate(session_chunks):
+        with stage("joiner", "join", chunk=i, rows_in=len(df_sessions)) as m:
+            df_sessions = prepare_sessions(df_sessions)
+            try:
+                df_merged = join_sessions(df_sessions, df_users, df_logs)
+            except Exception as e:
+                raise RuntimeError(f"❌ Erreur lors des jointures : {e}") from e
+            m["rows_out"] = len(df_merged)
+
+        # 🔄 Export (CSV ou Parquet selon pipeline_config.yaml), écrit chunk par chunk
+        with stage("joiner", "write", chunk=i, rows_in=len(df_merged)):
+            try:
+                output_path = write_table(df_merged, base, append=i > 0)
+            except Exception as e:
+                raise RuntimeError(f"❌ Erreur export : {e}") from e
+        update_diagnostics(diag, df_sessions, df_merged, user_ids, log_keys)
+
+    return output_path, summarize_diagnostics(diag, df_users, df_logs, user_ids, log_keys)
+
+# ---------------------------------------
+# 🧩 Mode partitionné : buckets hash(user_id) % N joints en parallèle
+# ---------------------------------------
+TABLES = {
+    # nom : (chemin, clés forcées en string, colonnes)
+    "users": (users_path, ("user_id",), USER_COLUMNS),
+    "sessions": (sessions_path, ("user_id","session_id"), SESSION_COLUMNS),
+    "logs": (logs_path, ("user_id","session_id"), LOG_COLUMNS),
+}
+
+def bucket_base(bucket_root: str, name: str, bucket: int) -> str:
+    return os.path.join(bucket_root, name, f"bucket-{bucket:04d}")
+
+def user_buckets(df: pd.DataFrame, nb_buckets: int) -> np.ndarray:
+    """Bucket de chaque ligne : hash de user_id normalisé (même bucket pour toutes les tables)."""
+    if "user_id" not in df.columns:
+        return np.zeros(len(df), dtype=np.uint64)
+    key = df["user_id"].astype("string").str.strip()
+    return pd.util.hash_pandas_object(key, index=False).to_numpy() % np.uint64(nb_buckets)
+
+def partition_table(name: str, bucket_root: str, nb_buckets: int, chunksize: int):
+    """Répartit une table enrichie en buckets sur disque ; retourne son schéma (None si absente)."""
+    base, force_cols, columns = TABLES[name]
+    schema = None
+    for chunk in safe_iter(base, force_cols, columns, chunksize):
+        if schema is None:
+            schema = list(chunk.columns)
+        chunk = chunk.reindex(columns=schema)
+        for bucket, part in chunk.groupby(user_buckets(chunk, nb_buckets), sort=False):
+            write_table(part, bucket_base(bucket_root, name, int(bucket)), append=True)
+    return schema
+
+def load_bucket(bucket_root: str, name: str, bucket: int, schema) -> pd.DataFrame:
+    """Table d'un bucket ; bucket vide → DataFrame vide au schéma global (suffixes de merge identiques)."""
+    _, force_cols, _ = TABLES[name]
+    base = bucket_base(bucket_root, name, bucket)
+    if schema is None:
+        return pd.DataFrame()
+    if find_table(base) is None:
+        return pd.DataFrame({c: pd.Series(dtype="string" if c in force_cols else "object") for c in schema})
+    return read_table(base, dtype={c: "string" for c in force_cols if c in schema})
+
+def join_bucket(bucket_root: str, bucket: int, schemas: dict) -> dict:
+    """Jointure complète d'un bucket (exécutée dans un processus du pool)."""
+    with stage("joiner", "join_bucket", chunk=bucket) as m:
+        result = _join_bucket(bucket_root, bucket, schemas)
+        m["rows_out"] = result["summary"]["sessions"]
+    return result
+
+def _join_bucket(bucket_root: str, bucket: int, schemas: dict) -> dict:
+    df_users = prepare_users(load_bucket(bucket_root, "users", bucket, schemas["users"]))
+    df_logs = latest_logs(prepare_logs(load_bucket(bucket_root, "logs", bucket, schemas["logs"])))
+    df_sessions = load_bucket(bucket_root, "sessions", bucket, schemas["sessions"])
+    chunks = [df_sessions] if not df_sessions.empty else []
+    output_path, summary = join_and_write(chunks, df_users, df_logs, bucket_base(bucket_root, "joined", bucket))
+    return {"bucket": bucket, "output": output_path, "summary": summary}
+
+def run_partitioned(chunksize: int, nb_buckets: int, workers: int):
+    """Partitionne les 3 tables sur user_id, joint chaque bucket en parallèle puis concatène les sorties."""
+    bucket_root = tempfile.mkdtemp(prefix="_buckets-", dir=OUTPUT_DIR)
+    try:
+        with stage("joiner", "partition", buckets=nb_buckets):
+            schemas = {name: partition_table(name, bucket_root, nb_buckets, chunksize) for name in TABLES}
+        if schemas["sessions"] is None:
+            return None, None
+
+        print(f"🧩 Jointure de {nb_buckets} buckets sur {workers} workers")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(join_bucket, bucket_root, b, schemas) for b in range(nb_buckets)]
+            results = sorted((f.result() for f in futures), key=lambda r: r["bucket"])
+
+        outputs = [r["output"] for r in results if r["output"] is not None]
+        with stage("joiner", "concat", rows_in=len(outputs)):
+            output_path = concat_table_files(outputs, output_base) if outputs else None
+        users_stub = pd.DataFrame(columns=schemas["users"] or [])
+        logs_stub = pd.DataFrame(columns=schemas["logs"] or [])
+        warn_missing_keys(users_stub, logs_stub)
+        return output_path, merge_summaries(r["summary"] for r in results)
+    finally:
+        shutil.rmtree(bucket_root, ignore_errors=True)
+
+def run_join(mode: str = "streaming", chunksize: int = 100_000, buckets: int = 1, workers: int = 1,
+             use_cache: bool = True) -> int:
+    """
+    memory      : les trois tables sont chargées en entier
+    streaming   : users + logs dédupliqués en mémoire (tables de dimension),
+                  sessions lues et écrites par chunks → mémoire bornée par les dimensions
+    partitioned : les trois tables réparties en buckets hash(user_id) sur disque,
+                  chaque bucket joint dans un pool de processus (sortie au même schéma `cols`)
+    use_cache   : dimensions préparées (users, dernier log par session) relues depuis data/cache
+                  tant que leurs tables source n'ont pas changé (modes memory / streaming)
+    """
+    try:
+        if mode == "partitioned":
+            output_path, summary = run_partitioned(chunksize, max(1, buckets), max(1, workers))
+        else:
+            with stage("joiner", "load_users") as m:
+                df_users = cached_dimension(
+                    "users", users_path,
+                    lambda: prepare_users(safe_load(users_path, ("user_id",), USER_COLUMNS)),
+                    columns=USER_COLUMNS, enabled=use_cache,
+                )
+                m["rows_out"] = len(df_users)
+            if mode == "memory":
+                with stage("joiner", "load_logs") as m:
+                    df_logs = cached_dimension(
+                        "latest_logs", logs_path,
+                        lambda: latest_logs(prepare_logs(safe_load(logs_path, ("user_id","session_id"), LOG_COLUMNS))),
+                        columns=LOG_COLUMNS, enabled=use_cache,
+                    )
+                    m["rows_out"] = len(df_logs)
+                with stage("joiner", "load_sessions") as m:
+                    df_sessions = safe_load(sessions_path, ("user_id","session_id"), SESSION_COLUMNS)
+                    m["rows_out"] = len(df_sessions)
+                session_chunks = [df_sessions] if not df_sessions.empty else []
+            else:
+                with stage("joiner", "load_logs") as m:
+                    df_logs = cached_dimension(
+                        "latest_logs", logs_path, lambda: load_logs_streaming(chunksize),
+                        columns=LOG_COLUMNS, enabled=use_cache,
+                    )
+                    m["rows_out"] = len(df_logs)
+                session_chunks = safe_iter(sessions_path, ("user_id","session_id"), SESSION_COLUMNS, chunksize)
+            warn_missing_keys(df_users, df_logs)
+            output_path, summary = join_and_write(session_chunks, df_users, df_logs, output_base)
+    except RuntimeError as e:
+        print(e)
+        return 1
+
+    # Si sessions vides => rien à faire
+    if output_path is None:
+        print("⚠️ sessions_enriched est vide ou absent — arrêt.")
+        return 0
+
     print(f"✅ Fichier exporté : {output_path}")
-except Exception as e:
-    print(f"❌ Erreur export : {e}")
-    sys.exit(1)
-
-# 🔮 Diagnostic enrichi
-def pct_missing(s):
-    return round(100 * s.isna().mean(), 2)
-
-print("\n--- Diagnostic ---")
-print(f"Sessions: {len(df_sessions):,} | Users: {len(df_users):,} | Logs: {len(df_logs):,}")
-
-if "user_id" in df_sessions.columns and "user_id" in df_users.columns:
-    users_in_sessions = set(df_sessions["user_id"].dropna())
-    users_in_users = set(df_users["user_id"].dropna())
-    print(f"User IDs sans correspondance: {len(users_in_sessions - users_in_users)}")
-
-if {"session_id","user_id"} <= set(df_sessions.columns) and {"session_id","user_id"} <= set(df_logs.columns):
-    keys_sessions = set(zip(df_sessions["session_id"], df_sessions["user_id"]))
-    keys_logs = set(zip(df_logs["session_id"], df_logs["user_id"]))
-    print(f"Sessions sans logs: {len(keys_sessions - keys_logs)}")
-
-for col in ["email", "first_name", "last_name", "total_spent_y", "timestamp", "endpoint"]:
-    if col in df_merged.columns:
-        print(f"Manquants {col}: {pct_missing(df_merged[col])}%")
+    print_diagnostics(summary)
+    return 0
+
+def main() -> int:
+    config = load_pipeline_config()
+    workers = config.get("data_workers", 1)
+    parser = argparse.ArgumentParser(description="Jointure sessions ⟕ users ⟕ logs")
+    parser.add_argument('--mode', choices=["memory", "streaming", "partitioned"], default=config.get("join_mode", "streaming"),
+                        help="memory : tout en mémoire ; streaming : sessions par chunks ; partitioned : buckets user_id en parallèle")
+    parser.add_argument('--chunksize', type=int, default=config.get("chunk_size_rows", 100_000),
+                        help="Taille des chunks de lecture (modes streaming / partitioned)")
+    parser.add_argument('--workers', type=int, default=workers, help="Processus du pool (mode partitioned)")
+    parser.add_argument('--buckets', type=int, default=config.get("join_buckets", workers),
+                        help="Nombre de buckets hash(user_id) (mode partitioned)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Reconstruit les dimensions sans lire ni écrire data/cache")
+    args = parser.parse_args()
+    use_cache = config.get("dimension_cache", True) and not args.no_cache
+    with stage("joiner", "total", mode=args.mode):
+        return run_join(args.mode, args.chunksize, args.buckets, args.workers, use_cache)
+
+if __name__ == "__main__":
+    sys.exit(main())
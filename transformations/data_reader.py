@@ -0,0 +1,423 @@
+# transformations/data_reader.py
+# Lecture des logs API directement depuis api_logs.zip (membres .json.gz), sans fichiers de staging
+
+import io
+import os
+import re
+import gzip
+import json
+import zipfile
+import importlib.util
+from contextlib import contextmanager
+from fnmatch import fnmatch
+from functools import lru_cache, partial
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from transformations.chunk_sizing import ChunkSizer
+
+# Chemin virtuel d'un membre d'archive : data/raw/api_logs.zip::dossier/api_logs_001.json.gz
+ZIP_MEMBER_SEP = "::"
+READ_BLOCK_SIZE = 1024 * 1024
+
+PIPELINE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SCHEMAS_PATH = os.path.join(PIPELINE_ROOT, "config", "data_schemas.json")
+
+# Backends de parsing JSON lines ; json_backend: auto choisit parmi AUTO_JSON_BACKENDS (par ordre de préférence)
+JSON_BACKENDS = ("pyarrow", "orjson", "pandas")
+AUTO_JSON_BACKENDS = ("orjson", "pandas")
+
+
+# ==============================
+# 🧭 Chemins virtuels (archive::membre)
+# ==============================
+
+def is_zip_member(path: str) -> bool:
+    return ZIP_MEMBER_SEP in path
+
+
+def split_zip_member(path: str) -> Tuple[str, Optional[str]]:
+    """Retourne (chemin de l'archive, membre) ; membre None pour un fichier ordinaire."""
+    if not is_zip_member(path):
+        return path, None
+    archive, member = path.split(ZIP_MEMBER_SEP, 1)
+    return archive, member
+
+
+def source_name(path: str) -> str:
+    """
+    Nom logique du fichier (sans dossier ni .gz) : api_logs_001.json
+    Identique au nom de l'ancien fichier extrait en staging (routage, rapports, état incrémental).
+    """
+    name = os.path.basename(split_zip_member(path)[1] or path)
+    return name[:-3] if name.endswith(".gz") else name
+
+
+def path_exists(path: str) -> bool:
+    archive, member = split_zip_member(path)
+    if member is None:
+        return os.path.exists(path)
+    if not zipfile.is_zipfile(archive):
+        return False
+    with zipfile.ZipFile(archive) as zf:
+        return member in zf.NameToInfo
+
+
+def zip_member_info(path: str) -> zipfile.ZipInfo:
+    archive, member = split_zip_member(path)
+    with zipfile.ZipFile(archive) as zf:
+        return zf.getinfo(member)
+
+
+def list_zip_members(archive: str, pattern: str = "*.json.gz", max_files: Optional[int] = None) -> List[str]:
+    """Chemins virtuels des N premiers membres correspondant au motif (ordre de l'archive)."""
+    if not os.path.isfile(archive):
+        return []
+    with zipfile.ZipFile(archive) as zf:
+        members = [
+            info.filename for info in zf.infolist()
+            if not info.is_dir() and fnmatch(os.path.basename(info.filename), pattern)
+        ]
+    if max_files:
+        members = members[:max_files]
+    return [f"{archive}{ZIP_MEMBER_SEP}{m}" for m in members]
+
+
+# ==============================
+# 📥 Flux texte (membre d'archive, .gz ou fichier ordinaire)
+# ==============================
+
+@contextmanager
+def open_text(path: str):
+    """Ouvre un fichier en flux texte UTF-8, décompressé à la volée (aucune copie sur disque)."""
+    archive, member = split_zip_member(path)
+    name = member or path
+    with zipfile.ZipFile(archive) if member else open(path, "rb") as source:
+        raw = source.open(member) if member else source
+        try:
+            binary = gzip.GzipFile(fileobj=raw) if name.endswith(".gz") else raw
+            yield io.TextIOWrapper(binary, encoding="utf-8")
+        finally:
+            raw.close()
+
+
+def _iter_array_elements(stream, buffer: str) -> Iterator[str]:
+    """
+    Éléments d'un tableau JSON lus en flux (équivalent de jq -c '.[]'),
+    sans charger le tableau entier : raw_decode sur un tampon glissant.
+    """
+    decoder = json.JSONDecoder()
+    pos = buffer.index("[") + 1
+    while True:
+        # Séparateurs (espaces, virgules) et fin de tableau
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer):
+                break
+            more = stream.read(READ_BLOCK_SIZE)
+            if not more:
+                raise ValueError("Tableau JSON tronqué (']' manquant)")
+            buffer, pos = more, 0
+        if buffer[pos] == "]":
+            return
+
+        try:
+            obj, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            more = stream.read(READ_BLOCK_SIZE)
+            if not more:
+                raise
+            buffer, pos = buffer[pos:] + more, 0
+            continue
+        yield json.dumps(obj, ensure_ascii=False)
+        pos = end
+        if pos > READ_BLOCK_SIZE:
+            buffer, pos = buffer[pos:], 0
+
+
+def iter_json_lines(stream) -> Iterator[str]:
+    """
+    Une ligne JSON par enregistrement, que la source soit en JSON lines ou en tableau JSON.
+    Le format est détecté sur le premier caractère utile, sans relire la source.
+    """
+    buffer = ""
+    while not buffer.strip():
+        more = stream.read(4096)
+        if not more:
+            return
+        buffer += more
+
+    if buffer.lstrip()[0] == "[":
+        yield from _iter_array_elements(stream, buffer)
+        return
+
+    # JSON lines : le tampon déjà lu est recollé devant la suite du flux
+    for line in _chain_lines(buffer, stream):
+        line = line.strip()
+        if line:
+            yield line
+
+
+def _chain_lines(buffer: str, stream) -> Iterator[str]:
+    # Découpage sur "\n" uniquement (U+2028 est autorisé dans une chaîne JSON)
+    head, sep, last = buffer.rpartition("\n")
+    if sep:
+        yield from head.split("\n")
+    # Dernière ligne du tampon incomplète : complétée par la première ligne du flux
+    yield last + stream.readline()
+    yield from stream
+
+
+# ==============================
+# 🧩 Types de colonnes (config/data_schemas.json)
+# ==============================
+
+@lru_cache(maxsize=None)
+def load_source_schema(source: str, path: str = SCHEMAS_PATH) -> dict:
+    """
+    Schéma de lecture d'une source :
+    - types : {colonne: string|integer|float|boolean|datetime} (required_columns + optional_columns)
+    - categorical : colonnes à faible cardinalité lues en dtype category
+    """
+    with open(path, encoding="utf-8") as f:
+        schema = json.load(f)[source]
+    types = dict(schema["required_columns"])
+    types.update(schema.get("optional_columns", {}))
+    return {"types": types, "categorical": list(schema.get("categorical_columns", []))}
+
+
+def load_column_types(source: str) -> Dict[str, str]:
+    return load_source_schema(source)["types"]
+
+
+INTEGER_DTYPES = (("Int8", 2**7), ("Int16", 2**15), ("Int32", 2**31), ("Int64", 2**63))
+
+
+def _to_integer(s: pd.Series) -> pd.Series:
+    """Entier nullable le plus compact (Int8 → Int64) ; valeurs non entières : float conservé."""
+    num = pd.to_numeric(s, errors="coerce")
+    values = num.dropna()
+    if not (values % 1 == 0).all():
+        return num
+    low, high = (values.min(), values.max()) if not values.empty else (0, 0)
+    for dtype, bound in INTEGER_DTYPES:
+        if -bound <= low and high < bound:
+            return num.astype(dtype)
+    return num
+
+
+def apply_column_types(df: pd.DataFrame, column_types: Optional[Dict[str, str]], categorical=()) -> pd.DataFrame:
+    """
+    Applique les types du schéma (colonnes absentes ignorées, valeurs invalides → NA).
+    - entiers réduits au plus petit type nullable, chaînes déclarées catégorielles en category
+    - les flottants restent en float64 : les agrégats (sommes, moyennes) ne perdent pas en précision
+    - les booléens sont laissés au lecteur (True/False inférés, valeurs manquantes conservées)
+    """
+    for col, kind in (column_types or {}).items():
+        if col not in df.columns:
+            continue
+        s = df[col]
+        if col in categorical:
+            if not isinstance(s.dtype, pd.CategoricalDtype):
+                df[col] = s.astype("category")
+        elif kind == "datetime":
+            if not pd.api.types.is_datetime64_any_dtype(s):
+                df[col] = pd.to_datetime(s, errors="coerce", format="ISO8601")
+        elif kind == "integer":
+            df[col] = _to_integer(s)
+        elif kind == "float":
+            df[col] = pd.to_numeric(s, errors="coerce").astype("float64")
+        elif kind == "string":
+            df[col] = s.astype("string")
+    return df
+
+
+def concat_chunks(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """pd.concat qui conserve le dtype category (catégories différentes d'un chunk à l'autre)."""
+    df = pd.concat(frames, ignore_index=True)
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype) and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
+# ==============================
+# 📄 CSV / Excel typés par le schéma
+# ==============================
+
+def read_options(source: str, header) -> dict:
+    """
+    dtype / parse_dates pour pd.read_csv ou pd.read_excel, limités aux colonnes présentes
+    (les colonnes non déclarées dans le schéma sont lues telles quelles).
+    """
+    schema = load_source_schema(source)
+    present = [c for c in header if c in schema["types"]]
+    dtype = {}
+    for col in present:
+        if col in schema["categorical"]:
+            dtype[col] = "category"
+        elif schema["types"][col] == "string":
+            dtype[col] = "string"
+    parse_dates = [c for c in present if schema["types"][c] == "datetime" and c not in dtype]
+    return {"dtype": dtype, "parse_dates": parse_dates}
+
+
+def _typed(df: pd.DataFrame, source: str) -> pd.DataFrame:
+    # Dates déjà parsées à la lecture (sinon laissées au nettoyage, plus tolérant sur les formats)
+    schema = load_source_schema(source)
+    types = {c: t for c, t in schema["types"].items() if t != "datetime"}
+    return apply_column_types(df, types, schema["categorical"])
+
+
+def read_csv_schema(path: str, source: str, chunksize: Union[int, ChunkSizer, None] = None):
+    """
+    pd.read_csv piloté par config/data_schemas.json (même retour : DataFrame, ou itérateur avec chunksize).
+    chunksize peut être un ChunkSizer : la taille de chaque chunk est alors choisie avant sa lecture.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    if isinstance(chunksize, ChunkSizer):
+        return _iter_csv_adaptive(path, source, header, chunksize)
+    reader = pd.read_csv(path, chunksize=chunksize, low_memory=False, **read_options(source, header))
+    if not chunksize:
+        return _typed(reader, source)
+    return (_typed(chunk, source) for chunk in reader)
+
+
+def _iter_csv_adaptive(path: str, source: str, header, sizer: ChunkSizer) -> Iterator[pd.DataFrame]:
+    with pd.read_csv(path, iterator=True, low_memory=False, **read_options(source, header)) as reader:
+        while True:
+            try:
+                chunk = _typed(reader.get_chunk(sizer.next_size()), source)
+            except StopIteration:
+                return
+            sizer.observe(chunk)
+            yield chunk
+
+
+def read_excel_schema(path: str, source: str) -> pd.DataFrame:
+    header = pd.read_excel(path, nrows=0).columns
+    return _typed(pd.read_excel(path, **read_options(source, header)), source)
+
+
+# ==============================
+# ⚡ Backends de parsing (orjson, pyarrow.json, pandas)
+# ==============================
+
+def available_json_backends() -> List[str]:
+    return [b for b in JSON_BACKENDS if b == "pandas" or importlib.util.find_spec(b) is not None]
+
+
+def get_json_backend(name: Optional[str] = None) -> str:
+    """Backend demandé (ou json_backend de pipeline_config.yaml), repli pandas s'il n'est pas installé."""
+    if name is None:
+        from transformations.data_storage import load_pipeline_config
+        name = load_pipeline_config().get("json_backend", "auto")
+    name = str(name).lower()
+    available = available_json_backends()
+    if name == "auto":
+        return next(b for b in AUTO_JSON_BACKENDS if b in available)
+    if name not in JSON_BACKENDS:
+        raise ValueError(f"❌ json_backend non supporté : {name} (attendu : auto, {', '.join(JSON_BACKENDS)})")
+    if name not in available:
+        print(f"⚠️  {name} absent : repli sur le parseur pandas")
+        return "pandas"
+    return name
+
+
+def _parse_orjson(lines: List[str]) -> pd.DataFrame:
+    import orjson
+    # Un seul appel natif pour tout le chunk
+    return pd.DataFrame(orjson.loads("[" + ",".join(lines) + "]"))
+
+
+@lru_cache(maxsize=None)
+def _pyarrow_schema(column_types: Tuple[Tuple[str, str], ...]):
+    """
+    Schéma explicite pyarrow des colonnes déclarées : sans lui, pyarrow convertit les horodatages
+    en UTC naïf (perte du décalage, mauvaise partition de date). Les dates sont lues en chaîne,
+    converties ensuite par apply_column_types comme pour les autres backends.
+    """
+    import pyarrow as pa
+    arrow_types = {"string": pa.string(), "datetime": pa.string(), "integer": pa.int64(),
+                   "float": pa.float64(), "boolean": pa.bool_()}
+    return pa.schema([(col, arrow_types[kind]) for col, kind in column_types if kind in arrow_types])
+
+
+def _parse_pyarrow(lines: List[str], column_types: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    import pyarrow as pa
+    import pyarrow.json as pa_json
+    data = "\n".join(lines).encode("utf-8")
+    options = pa_json.ReadOptions(block_size=max(READ_BLOCK_SIZE, len(data)))
+    schema = _pyarrow_schema(tuple((column_types or {}).items()))
+    try:
+        table = pa_json.read_json(io.BytesIO(data), read_options=options,
+                                  parse_options=pa_json.ParseOptions(explicit_schema=schema))
+    except pa.ArrowInvalid:
+        # Valeur d'un autre type que le schéma (ex : "status_code": "oops") : le parseur pandas
+        # la conserve, apply_column_types la remplace par NA au lieu d'échouer sur tout le fichier
+        return _parse_pandas(lines)
+    # Colonnes du schéma absentes du chunk : ajoutées (vides) par pyarrow, pas par les autres backends.
+    # Seules les colonnes entièrement nulles sont candidates ; présentes si leur nom apparaît comme clé
+    # ("col" suivi de ':'), une valeur égale au nom de colonne ne compte pas.
+    # Ordre des colonnes aligné sur celui des clés (schéma d'abord chez pyarrow)
+    absent = [
+        col for col in schema.names
+        if table.column(col).null_count == table.num_rows
+        and not re.search(rb'(?<!\\)"' + re.escape(col.encode("utf-8")) + rb'"\s*:', data)
+    ]
+    df = table.drop_columns(absent).to_pandas() if absent else table.to_pandas()
+    first_keys = [col for col in json.loads(lines[0]) if col in df.columns] if lines else []
+    if first_keys and first_keys != list(df.columns[:len(first_keys)]):
+        df = df[first_keys + [col for col in df.columns if col not in first_keys]]
+    return df
+
+
+def _parse_pandas(lines: List[str]) -> pd.DataFrame:
+    return pd.read_json(io.StringIO("\n".join(lines)), lines=True, precise_float=True)
+
+
+PARSERS = {"pyarrow": _parse_pyarrow, "orjson": _parse_orjson, "pandas": _parse_pandas}
+
+
+# ==============================
+# 🧱 DataFrames par chunks
+# ==============================
+
+def iter_json_chunks(
+    path: str,
+    chunksize: Union[int, ChunkSizer, None] = None,
+    column_types: Optional[Dict[str, str]] = None,
+    backend: Optional[str] = None,
+    categorical=(),
+) -> Iterator[pd.DataFrame]:
+    """
+    DataFrames de chunksize lignes (un seul DataFrame sans chunksize) pour un fichier
+    JSON / JSON lines, éventuellement .gz ou membre de api_logs.zip.
+    - column_types / categorical : schéma appliqué à chaque chunk (ex : load_source_schema("logs"))
+    - backend : orjson | pyarrow | pandas (défaut : json_backend de la configuration)
+    - chunksize peut être un ChunkSizer : taille choisie avant chaque chunk (budget mémoire)
+    """
+    name = get_json_backend(backend)
+    parse = PARSERS[name]
+    if name == "pyarrow":
+        # Types du schéma imposés au parseur (pas d'inférence différente des autres backends)
+        parse = partial(_parse_pyarrow, column_types=column_types)
+    sizer = chunksize if isinstance(chunksize, ChunkSizer) else None
+    limit = sizer.next_size() if sizer else chunksize
+    with open_text(path) as stream:
+        batch = []
+        for line in iter_json_lines(stream):
+            batch.append(line)
+            if limit and len(batch) >= limit:
+                df = apply_column_types(parse(batch), column_types, categorical)
+                if sizer and sizer.measuring:
+                    # Les lignes brutes (str Python, ~49 octets d'en-tête) coexistent avec le DataFrame au parsing
+                    sizer.observe(df, raw_bytes=sum(len(line) + 49 for line in batch))
+                batch = []  # lignes brutes libérées avant le traitement du chunk
+                yield df
+                if sizer:
+                    limit = sizer.next_size()
+        if batch:
+            yield apply_column_types(parse(batch), column_types, categorical)
@@ -0,0 +1,411 @@
+# transformations/data_storage.py
+# Lecture / écriture des tables produites par le pipeline (CSV ou Parquet)
+
+import os
+import re
+import glob
+import json
+import fcntl
+import shutil
+import uuid
+import importlib.util
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import yaml
+
+from transformations.data_reader import source_name
+
+PIPELINE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CONFIG_PATH = os.path.join(PIPELINE_ROOT, "config", "pipeline_config.yaml")
+# PIPELINE_DATA_DIR : dossier data/ alternatif (benchmarks, exécutions isolées)
+DATA_DIR = os.environ.get("PIPELINE_DATA_DIR") or os.path.join(PIPELINE_ROOT, "data")
+
+SUPPORTED_FORMATS = ("csv", "parquet")
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet"}
+
+
+# ==============================
+# ⚙️ Configuration
+# ==============================
+
+def data_path(*parts: str) -> str:
+    """Chemin absolu sous le dossier data/ du pipeline (PIPELINE_DATA_DIR si défini)."""
+    return os.path.join(DATA_DIR, *parts)
+
+
+@lru_cache(maxsize=None)
+def load_pipeline_config(path: str = CONFIG_PATH) -> dict:
+    """Charge config/pipeline_config.yaml (une seule fois par processus)."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def parquet_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def get_output_format(config: Optional[dict] = None) -> str:
+    """
+    Format de sortie configuré (output_format), avec repli CSV si pyarrow est absent.
+    """
+    config = load_pipeline_config() if config is None else config
+    fmt = str(config.get("output_format", "csv")).lower()
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"❌ output_format non supporté : {fmt} (attendu : {SUPPORTED_FORMATS})")
+    if fmt == "parquet" and not parquet_available():
+        print("⚠️  pyarrow absent : repli sur le format CSV")
+        return "csv"
+    return fmt
+
+
+def get_output_compression(config: Optional[dict] = None) -> Optional[str]:
+    """Compression Parquet configurée (output_compression), None si désactivée."""
+    config = load_pipeline_config() if config is None else config
+    compression = config.get("output_compression", "snappy")
+    if compression in (None, False) or str(compression).lower() == "none":
+        return None
+    return str(compression).lower()
+
+
+# ==============================
+# 💾 Écriture
+# ==============================
+
+def table_path(base: str, fmt: Optional[str] = None) -> str:
+    """Ajoute l'extension du format au chemin de base (sans extension)."""
+    fmt = fmt or get_output_format()
+    return base + EXTENSIONS[fmt]
+
+
+def _remove_path(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def write_table(df: pd.DataFrame, base: str, append: bool = False, fmt: Optional[str] = None) -> str:
+    """
+    Écrit un DataFrame au format configuré et retourne le chemin écrit.
+    - CSV : append classique (en-tête uniquement à la création)
+    - Parquet : append = nouveau fichier part-*.parquet dans le dossier <base>.parquet/
+    """
+    fmt = fmt or get_output_format()
+    path = table_path(base, fmt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if fmt == "csv":
+        if append and os.path.exists(path):
+            df.to_csv(path, mode="a", header=False, index=False)
+        else:
+            df.to_csv(path, index=False)
+        return path
+
+    compression = get_output_compression()
+    if not append:
+        _remove_path(path)
+        df.to_parquet(path, index=False, compression=compression)
+        return path
+
+    # Append Parquet : un dossier dataset, un fichier par écriture
+    if os.path.isfile(path):
+        tmp_dir = path + ".tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        os.replace(path, os.path.join(tmp_dir, "part-00000.parquet"))
+        os.replace(tmp_dir, path)
+    os.makedirs(path, exist_ok=True)
+    part_file = os.path.join(path, f"part-{uuid.uuid4().hex}.parquet")
+    df.to_parquet(part_file, index=False, compression=compression)
+    return path
+
+
+def write_table_atomic(df: pd.DataFrame, base: str, fmt: Optional[str] = None) -> str:
+    """
+    Remplace une table en une seule opération (écriture dans un fichier temporaire puis os.replace) :
+    un lecteur voit l'ancienne ou la nouvelle version, jamais un fichier partiel.
+    """
+    fmt = fmt or get_output_format()
+    path = table_path(base, fmt)
+    tmp_base = os.path.join(os.path.dirname(base), f".tmp-{uuid.uuid4().hex}-{os.path.basename(base)}")
+    tmp_path = write_table(df, tmp_base, fmt=fmt)
+    if os.path.isdir(path):
+        _remove_path(path)
+    os.replace(tmp_path, path)
+    return path
+
+
+@contextmanager
+def file_lock(lock_path: str):
+    """Verrou exclusif inter-processus (fcntl) sur lock_path."""
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def concat_table_files(files: List[str], base: str, fmt: Optional[str] = None) -> str:
+    """
+    Assemble des fichiers de même schéma (écrits par write_table) en une seule table <base>.
+    - CSV : concaténation brute des octets (en-tête du premier fichier uniquement)
+    - Parquet : dataset <base>.parquet/ dont les fichiers sont déplacés, sans réécriture
+    Les fichiers source sont consommés ; la table finale remplace l'ancienne de façon atomique.
+    """
+    fmt = fmt or get_output_format()
+    path = table_path(base, fmt)
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if fmt == "csv":
+        with open(tmp_path, "wb") as out:
+            for i, part in enumerate(files):
+                with open(part, "rb") as f:
+                    if i > 0:
+                        f.readline()
+                    shutil.copyfileobj(f, out)
+    else:
+        os.makedirs(tmp_path)
+        for i, part in enumerate(files):
+            for j, part_file in enumerate(_parquet_files(part)):
+                os.replace(part_file, os.path.join(tmp_path, f"part-{i:05d}-{j:05d}.parquet"))
+
+    _remove_path(path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def remove_table(base: str) -> bool:
+    """Supprime une table écrite par write_table, quel que soit son format ; False si elle n'existait pas."""
+    removed = False
+    for fmt in SUPPORTED_FORMATS:
+        path = base + EXTENSIONS[fmt]
+        if os.path.exists(path):
+            _remove_path(path)
+            removed = True
+    return removed
+
+
+# ==============================
+# 📥 Lecture
+# ==============================
+
+def find_table(base: str) -> Optional[str]:
+    """
+    Retrouve une table écrite par write_table, quel que soit son format.
+    Le format configuré est essayé en premier.
+    """
+    preferred = get_output_format()
+    formats = [preferred] + [f for f in SUPPORTED_FORMATS if f != preferred]
+    for fmt in formats:
+        path = base + EXTENSIONS[fmt]
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _parquet_files(path: str) -> List[str]:
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "*.parquet")))
+    return [path]
+
+
+def _parquet_columns(path: str) -> List[str]:
+    import pyarrow.parquet as pq
+    return pq.read_schema(path).names
+
+
+def _table_files(base: str) -> List[str]:
+    """Fichiers composant une table (PartSink, fichier CSV/Parquet ou dataset Parquet)."""
+    if PartSink.exists(base):
+        return PartSink(os.path.basename(base), root=os.path.dirname(base)).part_files()
+    path = find_table(base)
+    if path is None:
+        raise FileNotFoundError(f"Table introuvable : {base}.(csv|parquet)")
+    return [path] if path.endswith(EXTENSIONS["csv"]) else _parquet_files(path)
+
+
+def _read_file(part: str, columns, dtype, chunksize: Optional[int]) -> Iterator[pd.DataFrame]:
+    if part.endswith(EXTENSIONS["csv"]):
+        usecols = (lambda c: c in columns) if columns else None
+        csv_dtype = {c: t for c, t in (dtype or {}).items() if not columns or c in columns}
+        reader = pd.read_csv(part, usecols=usecols, dtype=csv_dtype or None, low_memory=False, chunksize=chunksize)
+        yield from (reader if chunksize else [reader])
+        return
+
+    wanted = None
+    if columns:
+        available = set(_parquet_columns(part))
+        wanted = [c for c in columns if c in available]
+    if not chunksize:
+        yield pd.read_parquet(part, columns=wanted)
+        return
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(part).iter_batches(batch_size=chunksize, columns=wanted):
+        yield batch.to_pandas()
+
+
+def iter_table(
+    base: str,
+    columns: Optional[List[str]] = None,
+    dtype: Optional[Dict[str, str]] = None,
+    chunksize: Optional[int] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Lecture en flux d'une table (mêmes sources et options que read_table).
+    chunksize : nombre de lignes max par DataFrame (None : un DataFrame par fichier).
+    """
+    for part in _table_files(base):
+        for df in _read_file(part, columns, dtype, chunksize):
+            yield _apply_dtype(df, dtype)
+
+
+def read_table(
+    base: str,
+    columns: Optional[List[str]] = None,
+    dtype: Optional[Dict[str, str]] = None,
+) -> pd.DataFrame:
+    """
+    Lit une table CSV ou Parquet (fichier, dataset Parquet ou PartSink via son manifest).
+    - columns : colonnes à charger (les colonnes absentes sont ignorées)
+    - dtype : types forcés (appliqués à la lecture en CSV, après lecture en Parquet)
+    """
+    frames = list(iter_table(base, columns=columns, dtype=dtype))
+    if len(frames) == 1:
+        return frames[0]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return _apply_dtype(df, dtype)
+
+
+def table_fingerprint(base: str) -> List[tuple]:
+    """
+    Empreinte d'une table sans la lire : (fichier, taille, mtime_ns) de chaque fichier qui la compose.
+    Liste vide si la table est absente.
+    """
+    try:
+        files = _table_files(base)
+    except FileNotFoundError:
+        return []
+    fingerprint = []
+    for path in sorted(files):
+        st = os.stat(path)
+        fingerprint.append((os.path.relpath(path, os.path.dirname(base)), st.st_size, st.st_mtime_ns))
+    return fingerprint
+
+
+def _apply_dtype(df: pd.DataFrame, dtype: Optional[Dict[str, str]]) -> pd.DataFrame:
+
+    if dtype:
+        present = {c: t for c, t in dtype.items() if c in df.columns and str(df[c].dtype) != t}
+        if present:
+            df = df.astype(present)
+    return df
+
+
+# ==============================
+# 🧩 Tables partagées en parts (écritures concurrentes sûres)
+# ==============================
+
+class PartSink:
+    """
+    Table partagée écrite par plusieurs workers sans écrivain unique :
+    <root>/<name>/part-<source>-<index>.<ext>  (fichier temporaire + os.replace)
+    <root>/<name>/_manifest.json               (parts validées, mis à jour sous verrou)
+    Chaque worker écrit ses propres parts : aucune écriture entrelacée possible.
+    """
+
+    MANIFEST = "_manifest.json"
+    LOCK = "_manifest.lock"
+
+    def __init__(self, name: str, root: Optional[str] = None, fmt: Optional[str] = None):
+        self.name = name
+        self.root = root or data_path("processed", "enriched")
+        self.path = os.path.join(self.root, name)
+        self.fmt = fmt or get_output_format()
+
+    @staticmethod
+    def exists(base: str) -> bool:
+        return os.path.isfile(os.path.join(base, PartSink.MANIFEST))
+
+    @staticmethod
+    def source_key(input_path: str) -> str:
+        """Identifiant de source utilisable dans un nom de fichier (membres d'archive inclus)."""
+        return re.sub(r"[^A-Za-z0-9._-]", "_", source_name(input_path))
+
+    # --- Manifest ---
+
+    def _locked(self):
+        return file_lock(os.path.join(self.path, self.LOCK))
+
+    def _read_manifest(self) -> dict:
+        manifest_path = os.path.join(self.path, self.MANIFEST)
+        if not os.path.exists(manifest_path):
+            return {"parts": {}}
+        with open(manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: dict) -> None:
+        manifest_path = os.path.join(self.path, self.MANIFEST)
+        tmp_path = f"{manifest_path}.tmp-{uuid.uuid4().hex}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, manifest_path)
+
+    # --- Écriture ---
+
+    def write_part(self, df: pd.DataFrame, source: str, index: int = 0) -> str:
+        """Écrit une part de façon atomique puis l'enregistre dans le manifest."""
+        os.makedirs(self.path, exist_ok=True)
+        part_name = f"part-{self.source_key(source)}-{index:05d}{EXTENSIONS[self.fmt]}"
+        part_path = os.path.join(self.path, part_name)
+        tmp_path = os.path.join(self.path, f".tmp-{uuid.uuid4().hex}-{part_name}")
+
+        if self.fmt == "csv":
+            df.to_csv(tmp_path, index=False)
+        else:
+            df.to_parquet(tmp_path, index=False, compression=get_output_compression())
+        os.replace(tmp_path, part_path)
+
+        with self._locked():
+            manifest = self._read_manifest()
+            manifest["parts"][part_name] = {
+                "source": self.source_key(source),
+                "rows": int(len(df)),
+                "written_at": datetime.utcnow().isoformat() + "Z",
+            }
+            self._write_manifest(manifest)
+        return part_path
+
+    def drop_source(self, source: str) -> int:
+        """Retire (manifest puis fichiers) toutes les parts d'une source ; retourne leur nombre."""
+        if not os.path.isdir(self.path):
+            return 0
+        key = self.source_key(source)
+        with self._locked():
+            manifest = self._read_manifest()
+            dropped = [p for p, meta in manifest["parts"].items() if meta.get("source") == key]
+            for part_name in dropped:
+                del manifest["parts"][part_name]
+            self._write_manifest(manifest)
+        for part_name in dropped:
+            part_path = os.path.join(self.path, part_name)
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        return len(dropped)
+
+    # --- Lecture ---
+
+    def part_files(self) -> List[str]:
+        """Parts validées (listées dans le manifest), dans l'ordre des noms."""
+        manifest = self._read_manifest()
+        return [os.path.join(self.path, p) for p in sorted(manifest["parts"])]
+
+    def read(self, columns: Optional[List[str]] = None, dtype: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        return read_table(self.path, columns=columns, dtype=dtype)
@@ -0,0 +1,314 @@
+# transformations/data_validation.py
+# Moteur de validation : règles compilées une fois, évaluées en une seule passe par chunk
+
+import os
+import json
+import sqlite3
+from datetime import datetime
+from typing import Iterator, Optional
+
+import pandas as pd
+import yaml
+
+from transformations.anomaly_detection import DISTINCT_KEY_COLUMNS, NUMERIC_TYPES, AnomalyDetector
+from transformations.data_reader import iter_json_chunks, source_name
+from transformations.data_storage import data_path
+from monitoring.data_metrics import MetricsStore
+from monitoring.instrumentation import RUN_ID
+from monitoring.quality_index import INDEX_DB, REPORT_PREFIX, QualityIndex
+
+PIPELINE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CONFIG_DIR = os.path.join(PIPELINE_ROOT, "config")
+QUALITY_DIR = data_path("quality")
+
+# ==============================
+# 📏 Règles métier supportées : (masque des violations, message)
+# ==============================
+
+RULE_CHECKS = {
+    "allowed_range": (
+        lambda s, v: ~s.between(v[0], v[1]),
+        "{n} valeurs hors intervalle {value} pour '{col}'",
+    ),
+    "min_value": (
+        lambda s, v: s < v,
+        "{n} valeurs < {value} pour '{col}'",
+    ),
+    "max_value": (
+        lambda s, v: s > v,
+        "{n} valeurs > {value} pour '{col}'",
+    ),
+    "allowed_values": (
+        lambda s, v: ~s.isin(v),
+        "{n} valeurs non autorisées pour '{col}'",
+    ),
+    "not_allowed_values": (
+        lambda s, v: s.isin(v),
+        "{n} valeurs interdites pour '{col}'",
+    ),
+}
+
+# Préfixes de fichiers → type de source (mêmes motifs que l'orchestration)
+SOURCE_PREFIXES = [
+    ("api_logs_", "logs"),
+    ("sessions_", "sessions"),
+    ("users_", "users"),
+    ("products_", "products"),
+]
+
+# Anomalies simples (--check-anomalies)
+MAX_SESSION_DURATION_MIN = 180
+MAX_TOTAL_SPENT = 10000
+
+
+# ==============================
+# 📚 Configuration + plan
+# ==============================
+
+def load_validation_config(config_dir: str = CONFIG_DIR) -> dict:
+    """Charge schémas, règles métier et seuils qualité (une fois par processus)."""
+    with open(os.path.join(config_dir, "data_schemas.json")) as f:
+        schema_config = json.load(f)
+    with open(os.path.join(config_dir, "business_rules.yaml")) as f:
+        business_rules = yaml.safe_load(f) or {}
+    with open(os.path.join(config_dir, "quality_thresholds.yaml")) as f:
+        thresholds = yaml.safe_load(f) or {}
+
+    return {
+        "schemas": schema_config,
+        "business_rules": business_rules,
+        "global_threshold": thresholds.get("global_threshold", 95),
+    }
+
+
+def compile_validation_plan(source: str, config: dict) -> dict:
+    """
+    Compile les règles d'une source en plan d'exécution :
+    - expected_columns : colonnes requises (None si aucun schéma)
+    - rules : {colonne: [(règle, valeur, masque, message), ...]} dans l'ordre du YAML
+    - numeric_columns / distinct_columns : colonnes profilées par la détection d'anomalies
+    """
+    source_schema = config["schemas"].get(source)
+    expected_columns = None
+    if source_schema is not None and "required_columns" in source_schema:
+        expected_columns = list(source_schema["required_columns"].keys())
+    schema = source_schema or {}
+    column_types = {**schema.get("required_columns", {}), **schema.get("optional_columns", {})}
+
+    rules = {}
+    for col, constraints in (config["business_rules"].get(source) or {}).items():
+        for rule, value in (constraints or {}).items():
+            if rule not in RULE_CHECKS:
+                continue
+            mask_fn, message = RULE_CHECKS[rule]
+            rules.setdefault(col, []).append((rule, value, mask_fn, message))
+
+    return {
+        "source": source,
+        "expected_columns": expected_columns,
+        "rules": rules,
+        "numeric_columns": [col for col, kind in column_types.items() if kind in NUMERIC_TYPES],
+        "distinct_columns": schema.get("categorical_columns", []) + [col for col in DISTINCT_KEY_COLUMNS if col in column_types],
+        "global_threshold": config["global_threshold"],
+    }
+
+
+def detect_source(filename: str) -> Optional[str]:
+    """Déduit le type de source d'après le nom de fichier (None si inconnu)."""
+    for prefix, source in SOURCE_PREFIXES:
+        if filename.startswith(prefix):
+            return source
+    return None
+
+
+# ==============================
+# 📥 Lecture (complète ou par chunks)
+# ==============================
+
+def iter_input_chunks(path: str, chunksize: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Itère sur le fichier à valider (CSV, JSON, XLSX, Parquet).
+    JSON : tableau ou JSON lines, éventuellement .gz ou membre de api_logs.zip (archive.zip::membre).
+    Sans chunksize, un seul DataFrame est produit.
+    """
+    ext = os.path.splitext(source_name(path))[1].lower()
+
+    if ext == ".csv":
+        if chunksize:
+            yield from pd.read_csv(path, chunksize=chunksize)
+        else:
+            yield pd.read_csv(path)
+    elif ext == ".json":
+        # Parseur pandas sans typage imposé : les types réels du fichier sont contrôlés
+        yield from iter_json_chunks(path, chunksize, backend="pandas")
+    elif ext == ".xlsx":
+        yield pd.read_excel(path, engine="openpyxl")
+    elif ext == ".parquet":
+        if chunksize:
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+                yield batch.to_pandas()
+        else:
+            yield pd.read_parquet(path)
+    else:
+        raise ValueError(f"Format non supporté : {ext}")
+
+
+# ==============================
+# 🔍 Évaluation en une passe
+# ==============================
+
+def new_validation_state(detector: Optional[AnomalyDetector] = None) -> dict:
+    return {
+        "rows": 0,
+        "columns": None,
+        "missing": 0,
+        "violations": {},
+        "long_sessions": 0,
+        "max_total_spent": None,
+        "detector": detector,
+        "anomalies": [],
+    }
+
+
+def update_validation_state(plan: dict, state: dict, df: pd.DataFrame, check_anomalies: bool = False) -> dict:
+    """
+    Met à jour les compteurs avec un chunk : une seule passe sur les colonnes,
+    chaque règle est un comptage de masque (aucune copie de lignes).
+    """
+    if state["columns"] is None:
+        state["columns"] = list(df.columns)
+    state["rows"] += len(df)
+
+    for col in df.columns:
+        series = df[col]
+        state["missing"] += int(series.isna().sum())
+
+        for rule, value, mask_fn, _ in plan["rules"].get(col, []):
+            key = (col, rule)
+            state["violations"][key] = state["violations"].get(key, 0) + int(mask_fn(series, value).sum())
+
+        if check_anomalies:
+            if col == "duration_min":
+                state["long_sessions"] += int((series > MAX_SESSION_DURATION_MIN).sum())
+            elif col == "total_spent":
+                chunk_max = series.max()
+                if pd.notna(chunk_max) and (state["max_total_spent"] is None or chunk_max > state["max_total_spent"]):
+                    state["max_total_spent"] = chunk_max
+
+    if check_anomalies and state.get("detector") is not None:
+        state["detector"].update(df)
+
+    return state
+
+
+def build_report(plan: dict, state: dict, filename: str, threshold: Optional[int] = None,
+                 check_anomalies: bool = False) -> dict:
+    """Construit le rapport JSON (mêmes champs que la validation historique)."""
+    errors = []
+    validation_passed = True
+    columns = state["columns"] or []
+
+    # 🔢 Schéma
+    if plan["expected_columns"] is None:
+        errors.append(f"⚠️ Aucun schéma défini pour la source : {plan['source']}")
+        validation_passed = False
+    else:
+        missing_columns = [col for col in plan["expected_columns"] if col not in columns]
+        for col in missing_columns:
+            errors.append(f"Colonne manquante (schema) : {col}")
+        if missing_columns:
+            validation_passed = False
+
+    # 🔍 Règles métier
+    violations = {}
+    for col, col_rules in plan["rules"].items():
+        if col not in columns:
+            continue
+        for rule, value, _, message in col_rules:
+            n = state["violations"].get((col, rule), 0)
+            if n:
+                violations[f"{col}.{rule}"] = n
+                errors.append(message.format(n=n, value=value, col=col))
+                validation_passed = False
+
+    # 🔢 Anomalies simples
+    if check_anomalies:
+        if state["long_sessions"]:
+            errors.append(f"{state['long_sessions']} sessions > 3h détectées")
+            validation_passed = False
+        if state["max_total_spent"] is not None and state["max_total_spent"] > MAX_TOTAL_SPENT:
+            errors.append(f"Montant très élevé : {state['max_total_spent']}")
+            validation_passed = False
+
+    # 📈 Anomalies statistiques (historique de la source)
+    anomalies = []
+    if check_anomalies and state.get("detector") is not None:
+        anomalies = state["anomalies"] = state["detector"].findings()
+        errors.extend(a["message"] for a in anomalies)
+        validation_passed = validation_passed and not anomalies
+
+    # 📊 Complétude
+    total_cells = state["rows"] * len(columns)
+    missing_cells = state["missing"]
+    completeness = 100 * (1 - (missing_cells / total_cells)) if total_cells else float("nan")
+    threshold = threshold if threshold else plan["global_threshold"]
+
+    if completeness < threshold:
+        errors.append(f"Complétude insuffisante ({completeness:.2f}%) < seuil {threshold}%")
+        validation_passed = False
+
+    return {
+        "filename": filename,
+        "source": plan["source"],
+        "rows": int(state["rows"]),
+        "columns": int(len(columns)),
+        "missing_values": int(missing_cells),
+        "completeness": round(completeness, 2),
+        "threshold": threshold,
+        "status": "passed" if validation_passed else "failed",
+        "validated_at": datetime.utcnow().isoformat() + "Z",
+        "violations": violations,
+        "anomalies": {f"{a['column']}.{a['kind']}": a["message"] for a in anomalies} if check_anomalies else None,
+        "errors": errors if errors else None,
+    }
+
+
+def validate_file(path: str, plan: dict, threshold: Optional[int] = None, check_anomalies: bool = False,
+                  chunksize: Optional[int] = None) -> dict:
+    """
+    Valide un fichier (éventuellement par chunks) et retourne son rapport.
+    check_anomalies : le profil statistique du fichier est ensuite ajouté à l'historique de la source
+    (une fois par contenu ; en attente s'il est signalé, ignoré s'il viole les règles métier).
+    """
+    detector = AnomalyDetector(plan) if check_anomalies else None
+    state = new_validation_state(detector)
+    for chunk in iter_input_chunks(path, chunksize):
+        update_validation_state(plan, state, chunk, check_anomalies)
+    report = build_report(plan, state, source_name(path), threshold, check_anomalies)
+    if detector is not None and not report["violations"]:
+        detector.commit(path, state["anomalies"])
+    return report
+
+
+def write_report(report: dict, quality_dir: str = QUALITY_DIR) -> str:
+    """
+    Écrit validation_report_<fichier>.json dans data/quality/ et l'enregistre dans quality_index.db
+    (un index indisponible n'empêche pas l'écriture : le JSON sera rattrapé par sync_directory),
+    puis ajoute ses mesures à l'historique (data/metrics_history.db).
+    """
+    os.makedirs(quality_dir, exist_ok=True)
+    report_path = os.path.join(quality_dir, f"{REPORT_PREFIX}{report['filename']}.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    try:
+        with QualityIndex(os.path.join(quality_dir, os.path.basename(INDEX_DB))) as index:
+            index.record(report, report_path)
+    except sqlite3.Error as e:
+        print(f"⚠️  Index qualité non mis à jour ({e}) : {report_path}")
+    try:
+        with MetricsStore() as store:
+            store.record_report(report, RUN_ID)
+    except sqlite3.Error as e:
+        print(f"⚠️  Historique des métriques non mis à jour ({e}) : {report_path}")
+    return report_path
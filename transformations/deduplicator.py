@@ -0,0 +1,129 @@
+# transformations/deduplicator.py
+# Déduplication inter-chunks à mémoire bornée (request_id, user_id, product_id)
+
+import math
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+DEDUP_MODES = ("exact", "bloom", "chunk")
+
+
+def key_hashes(values: pd.Series) -> np.ndarray:
+    """Hash uint64 de chaque clé (stable d'un chunk à l'autre, NA compris)."""
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+
+class ExactKeySet:
+    """
+    Ensemble exact des hash déjà vus : 8 octets par clé, rangés en runs triés
+    (fusionnés par tailles géométriques, recherche par np.searchsorted).
+    Collision de hash 64 bits négligeable (~n² / 2^65).
+    """
+
+    def __init__(self):
+        self.runs: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self.runs)
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self.runs:
+            pos = np.searchsorted(run, hashes)
+            pos[pos == len(run)] = 0
+            found |= run[pos] == hashes
+        return found
+
+    def add(self, hashes: np.ndarray) -> None:
+        """Ajoute des hash absents de l'ensemble (et distincts entre eux)."""
+        if not len(hashes):
+            return
+        self.runs.append(np.sort(hashes))
+        while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            last = self.runs.pop()
+            self.runs[-1] = np.sort(np.concatenate([self.runs[-1], last]), kind="mergesort")
+
+    @property
+    def nbytes(self) -> int:
+        return sum(run.nbytes for run in self.runs)
+
+
+class BloomKeySet:
+    """
+    Filtre de Bloom (bits packés, k positions par double hachage du hash 64 bits).
+    Mémoire fixe ~ -capacity·ln(p) / ln(2)² bits ; une clé nouvelle est prise pour un
+    doublon avec une probabilité ~ error_rate (jamais l'inverse).
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.k = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _positions(self, hashes: np.ndarray) -> np.ndarray:
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        i = np.arange(self.k, dtype=np.uint64)[:, None]
+        return (h1 + i * h2) % np.uint64(self.size)
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        pos = self._positions(hashes)
+        bits = (self.bits[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=0)
+
+    def add(self, hashes: np.ndarray) -> None:
+        pos = self._positions(hashes).ravel()
+        np.bitwise_or.at(self.bits, pos >> np.uint64(3), np.left_shift(1, pos & np.uint64(7)).astype(np.uint8))
+        self.count += len(hashes)
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+
+class KeyDeduplicator:
+    """
+    Doublons d'une clé sur toute la durée d'un fichier, quel que soit le découpage en chunks.
+    duplicated(values) : True pour les clés déjà vues (chunks précédents ou plus haut dans le chunk).
+    """
+
+    def __init__(self, mode: str = "exact", capacity: int = 10_000_000, error_rate: float = 0.001):
+        if mode not in ("exact", "bloom"):
+            raise ValueError(f"❌ Mode de déduplication non supporté : {mode} (attendu : {', '.join(DEDUP_MODES)})")
+        self.mode = mode
+        self.seen = ExactKeySet() if mode == "exact" else BloomKeySet(capacity, error_rate)
+
+    def duplicated(self, values: pd.Series) -> np.ndarray:
+        hashes = key_hashes(values)
+        # Doublons internes au chunk (première occurrence conservée), puis clés des chunks précédents
+        dup = pd.Series(hashes).duplicated().to_numpy().copy()
+        first = np.flatnonzero(~dup)
+        dup[first] = self.seen.contains(hashes[first])
+        self.seen.add(hashes[first[~dup[first]]])
+        return dup
+
+
+def make_deduplicator(config: Optional[dict] = None) -> Optional[KeyDeduplicator]:
+    """
+    Déduplicateur selon pipeline_config.yaml :
+    - dedup_mode : exact (défaut) | bloom | chunk (ancien comportement, doublons par chunk uniquement)
+    - dedup_bloom_capacity / dedup_bloom_error_rate : dimensionnement du filtre de Bloom
+    Retourne None en mode chunk.
+    """
+    if config is None:
+        from transformations.data_storage import load_pipeline_config
+        config = load_pipeline_config()
+    mode = str(config.get("dedup_mode", "exact")).lower()
+    if mode == "chunk":
+        return None
+    return KeyDeduplicator(
+        mode,
+        capacity=int(config.get("dedup_bloom_capacity", 10_000_000)),
+        error_rate=float(config.get("dedup_bloom_error_rate", 0.001)),
+    )
@@ -0,0 +1,81 @@
+# transformations/dimension_cache.py
+# Cache disque des tables de dimension préparées (users dédupliqués, dernier log par session)
+
+import os
+import glob
+import json
+import uuid
+import hashlib
+from typing import Callable, Optional
+
+import pandas as pd
+
+from transformations.data_storage import data_path, table_fingerprint
+
+CACHE_DIR = data_path("cache")
+
+# À incrémenter si la préparation des dimensions change (invalide tous les caches)
+CACHE_VERSION = 1
+
+
+def cache_key(name: str, base: str, columns=None) -> str:
+    """Clé du cache : version + colonnes lues + empreinte (nom, taille, mtime) des fichiers source."""
+    payload = {
+        "name": name,
+        "version": CACHE_VERSION,
+        "columns": list(columns or []),
+        "source": table_fingerprint(base),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def cached_dimension(
+    name: str,
+    base: str,
+    build: Callable[[], pd.DataFrame],
+    columns=None,
+    enabled: bool = True,
+    cache_dir: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Retourne la dimension `name` construite par build() à partir de la table `base`.
+    - Cache présent pour l'empreinte courante de la source : relu (pickle, dtypes conservés)
+    - Sinon build() puis écriture atomique ; les caches des versions précédentes sont supprimés
+    Une dimension vide (source absente ou illisible) n'est jamais mise en cache.
+    """
+    if not enabled:
+        return build()
+
+    cache_dir = cache_dir or CACHE_DIR
+    path = os.path.join(cache_dir, f"{name}-{cache_key(name, base, columns)}.pkl")
+    if os.path.exists(path):
+        try:
+            df = pd.read_pickle(path)
+            print(f"♻️  Dimension {name} lue depuis le cache : {path}")
+            return df
+        except Exception as e:
+            print(f"⚠️  Cache illisible ({e}), reconstruction : {path}")
+
+    df = build()
+    if df.empty:
+        return df
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.tmp-{uuid.uuid4().hex}"
+    try:
+        df.to_pickle(tmp)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"⚠️  Écriture du cache impossible ({e}) : {path}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return df
+
+    for old in glob.glob(os.path.join(cache_dir, f"{name}-*.pkl")):
+        if old != path:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+    print(f"💾 Dimension {name} mise en cache : {path}")
+    return df
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# transformations/pipeline_state.py
+# État persistant des fichiers traités (SQLite) : ré-exécutions incrémentales et idempotentes
+
+import os
+import sys
+import sqlite3
+import hashlib
+import argparse
+from datetime import datetime
+from typing import Callable, Optional
+
+PIPELINE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PIPELINE_ROOT)
+
+from transformations.data_reader import is_zip_member, source_name, zip_member_info
+from transformations.data_storage import data_path
+from monitoring import instrumentation
+
+STATE_DB = data_path("pipeline_state.db")
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    """Hash SHA-256 du contenu, lu par blocs."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path: str) -> str:
+    """Empreinte du contenu : CRC32 stocké dans l'archive pour un membre de zip (sans décompression), sinon SHA-256."""
+    if is_zip_member(path):
+        return f"crc32:{zip_member_info(path).CRC:08x}"
+    return file_sha256(path)
+
+
+class PipelineState:
+    """
+    Table files(stage, name) → taille, mtime, hash du dernier contenu traité avec succès.
+    - Taille + mtime identiques : inchangé sans relire le fichier
+    - Sinon le hash tranche (un simple touch ne déclenche pas de retraitement)
+    """
+
+    def __init__(self, db_path: str = STATE_DB):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                stage TEXT NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                processed_at TEXT NOT NULL,
+                PRIMARY KEY (stage, name)
+            )
+            """
+        )
+        self.conn.commit()
+        self._hashes = {}
+
+    @staticmethod
+    def key(path: str) -> str:
+        """Les fichiers sont identifiés par leur nom (identique en raw, en staging et dans api_logs.zip)."""
+        return source_name(path)
+
+    @staticmethod
+    def _stat(path: str):
+        """(taille, mtime_ns) ; pour un membre d'archive, taille décompressée et date du membre."""
+        if is_zip_member(path):
+            info = zip_member_info(path)
+            return info.file_size, int(datetime(*info.date_time).timestamp()) * 10**9
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+
+    def _hash(self, path: str, size: int, mtime_ns: int) -> str:
+        cache_key = (os.path.abspath(path), size, mtime_ns)
+        if cache_key not in self._hashes:
+            self._hashes[cache_key] = file_fingerprint(path)
+        return self._hashes[cache_key]
+
+    def has_changed(self, stage: str, path: str) -> bool:
+        """True si le fichier est nouveau ou si son contenu a changé depuis le dernier succès."""
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, sha256 FROM files WHERE stage = ? AND name = ?",
+            (stage, self.key(path)),
+        ).fetchone()
+        if row is None:
+            return True
+
+        st_size, st_mtime_ns = self._stat(path)
+        size, mtime_ns, sha = row
+        if st_size == size and st_mtime_ns == mtime_ns:
+            return False
+        if st_size != size or self._hash(path, st_size, st_mtime_ns) != sha:
+            return True
+
+        # Contenu identique (simple touch / copie) : on rafraîchit le mtime pour le prochain passage
+        self.conn.execute(
+            "UPDATE files SET mtime_ns = ? WHERE stage = ? AND name = ?",
+            (st_mtime_ns, stage, self.key(path)),
+        )
+        self.conn.commit()
+        return False
+
+    def mark_processed(self, stage: str, path: str) -> None:
+        """Enregistre le contenu courant comme traité avec succès."""
+        st_size, st_mtime_ns = self._stat(path)
+        sha = self._hash(path, st_size, st_mtime_ns)
+        self.conn.execute(
+            """
+            INSERT INTO files (stage, name, size, mtime_ns, sha256, processed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (stage, name) DO UPDATE SET
+                size = excluded.size, mtime_ns = excluded.mtime_ns,
+                sha256 = excluded.sha256, processed_at = excluded.processed_at
+            """,
+            (stage, self.key(path), st_size, st_mtime_ns, sha, datetime.utcnow().isoformat() + "Z"),
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def process_if_changed(stage: str, input_path: str, func: Callable, *args, force: bool = False, **kwargs) -> Optional[dict]:
+    """
+    Exécute func(input_path, ...) seulement si le fichier a changé, puis l'enregistre.
+    Retourne None si le fichier est ignoré (inchangé).
+    Les sorties précédentes sont remplacées par le traitement (parts par source, partitions).
+    Durée totale et volumes enregistrés comme étape "total" de l'instrumentation.
+    """
+    state = PipelineState()
+    try:
+        with instrumentation.stage(stage, "total", source_name(input_path)) as record:
+            if not force and not state.has_changed(stage, input_path):
+                print(f"⏭️  Fichier inchangé depuis le dernier traitement : {source_name(input_path)}")
+                record["skipped"] = True
+                return None
+            result = func(input_path, *args, **kwargs)
+            if isinstance(result, dict):
+                record["rows_in"] = result.get("rows_in")
+                record["rows_out"] = result.get("rows_out")
+        state.mark_processed(stage, input_path)
+        return result
+    finally:
+        state.close()
+
+
+# ==============================
+# 🖥️ CLI (utilisée par data_discovery.sh)
+#   changed : code retour 0 si le fichier doit être (re)traité, 1 sinon
+#   mark    : enregistre le fichier comme traité
+# ==============================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="État incrémental des fichiers du pipeline")
+    parser.add_argument("action", choices=["changed", "mark"])
+    parser.add_argument("--stage", required=True, help="Étape (ex : sessions, api_logs_zip)")
+    parser.add_argument("path", help="Fichier à vérifier / enregistrer")
+    args = parser.parse_args()
+
+    state = PipelineState()
+    try:
+        if args.action == "changed":
+            sys.exit(0 if state.has_changed(args.stage, args.path) else 1)
+        state.mark_processed(args.stage, args.path)
+    finally:
+        state.close()
@@ -0,0 +1,291 @@
+# transformations/sketches.py
+# Résumés statistiques en flux, fusionnables et sérialisables en JSON :
+# - RunningStats : moyenne / variance (Welford, fusion de Chan), min, max
+# - TDigest : quantiles approchés (centroïdes à pas k(q) = δ/2π·asin(2q-1), précis aux extrémités)
+# - HyperLogLog : nombre de valeurs distinctes (2^p registres, erreur ~1.04/√2^p)
+# - TopK : valeurs les plus fréquentes (résumé Space-Saving fusionnable, compteurs bornés)
+# Chaque résumé se met à jour par chunk (numpy vectorisé) et se fusionne avec un autre (merge) :
+# un historique se construit sans jamais relire les données déjà vues.
+
+import math
+import json
+import zlib
+import base64
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from transformations.deduplicator import key_hashes
+
+TDIGEST_DELTA = 200        # ~100 centroïdes : ~1 % d'erreur relative au-delà de q99
+HLL_PRECISION = 12          # 4096 registres : ~1.6 % d'erreur, 4 Ko par colonne
+TOPK_CAPACITY = 20          # compteurs conservés par résumé TopK
+
+
+# ==============================
+# 📐 Moyenne / variance
+# ==============================
+
+class RunningStats:
+    """Moyenne et variance en une passe : Welford par chunk, fusion de Chan entre résumés."""
+
+    def __init__(self, n: int = 0, mean: float = 0.0, m2: float = 0.0,
+                 min: Optional[float] = None, max: Optional[float] = None):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+        self.min = min
+        self.max = max
+
+    def __repr__(self) -> str:
+        return f"RunningStats(n={self.n}, mean={self.mean:.6g}, std={self.std:.6g})"
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def _combine(self, n: int, mean: float, m2: float, lo: float, hi: float) -> None:
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+
+    def update(self, values: np.ndarray) -> "RunningStats":
+        values = np.asarray(values, dtype=np.float64)
+        if len(values):
+            mean = float(values.mean())
+            self._combine(len(values), mean, float(((values - mean) ** 2).sum()),
+                          float(values.min()), float(values.max()))
+        return self
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        if other.n:
+            self._combine(other.n, other.mean, other.m2, other.min, other.max)
+        return self
+
+    def to_dict(self) -> dict:
+        return {"n": self.n, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "RunningStats":
+        return cls(**d)
+
+
+# ==============================
+# 📊 Quantiles
+# ==============================
+
+class TDigest:
+    """
+    t-digest par fusion : les valeurs d'un chunk (poids 1) et les centroïdes existants sont triés
+    puis regroupés par intervalle unitaire de k(q) ; ~δ/2 centroïdes, petits aux extrémités.
+    """
+
+    def __init__(self, delta: int = TDIGEST_DELTA, means=None, weights=None):
+        self.delta = delta
+        self.means = np.asarray(means if means is not None else [], dtype=np.float64)
+        self.weights = np.asarray(weights if weights is not None else [], dtype=np.float64)
+
+    def __repr__(self) -> str:
+        return f"TDigest(delta={self.delta}, centroids={len(self.means)}, n={self.count:g})"
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        order = np.argsort(means, kind="mergesort")
+        means, weights = means[order], weights[order]
+        cum = np.cumsum(weights)
+        q = (cum - weights / 2) / cum[-1]
+        k = self.delta / (2 * math.pi) * np.arcsin(2 * q - 1)
+        bucket = np.floor(k - k[0]).astype(np.int64)
+        w = np.bincount(bucket, weights=weights)
+        m = np.bincount(bucket, weights=weights * means)
+        keep = w > 0
+        self.weights, self.means = w[keep], m[keep] / w[keep]
+
+    def update(self, values: np.ndarray) -> "TDigest":
+        values = np.asarray(values, dtype=np.float64)
+        if len(values):
+            self._compress(np.concatenate([self.means, values]),
+                           np.concatenate([self.weights, np.ones(len(values))]))
+        return self
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        if len(other.means):
+            self._compress(np.concatenate([self.means, other.means]),
+                           np.concatenate([self.weights, other.weights]))
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Quantile q ∈ [0, 1] par interpolation entre centres de centroïdes (NaN si vide)."""
+        if not len(self.means):
+            return float("nan")
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * self.count, centers, self.means))
+
+    def to_dict(self) -> dict:
+        return {"delta": self.delta, "means": self.means.tolist(), "weights": self.weights.tolist()}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "TDigest":
+        return cls(d["delta"], d["means"], d["weights"])
+
+
+# ==============================
+# 🔢 Valeurs distinctes
+# ==============================
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    """Longueur en bits de chaque uint64 non nul (exacte : deux moitiés de 32 bits en float64)."""
+    hi = (x >> np.uint64(32)).astype(np.float64)
+    lo = (x & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(hi > 0, np.frexp(hi)[1] + 32, np.frexp(lo)[1])
+
+
+def _hll_positions(hashes: np.ndarray, p: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(registre, rang) de chaque hash : p premiers bits, zéros de tête du reste + 1."""
+    p = np.uint64(p)
+    idx = (hashes >> (np.uint64(64) - p)).astype(np.intp)
+    # Bit sentinelle : rang plafonné à 64 - p + 1
+    rest = (hashes << p) | (np.uint64(1) << (p - np.uint64(1)))
+    return idx, (65 - _bit_length(rest)).astype(np.uint8)
+
+
+def value_hashes(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (masque des valeurs non nulles, hash de ces valeurs) : chaque valeur distincte n'est hachée
+    qu'une fois (factorize), les hash sont ensuite répartis par ligne.
+    """
+    codes, uniques = pd.factorize(values)
+    mask = codes >= 0
+    return mask, key_hashes(pd.Series(uniques))[codes[mask]]
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sur les hash 64 bits de deduplicator.key_hashes (stables d'une exécution à l'autre) :
+    registre = p premiers bits, rang = zéros de tête du reste + 1. Fusion = maximum des registres.
+    encode() / decode() : forme texte compacte (registres compressés) pour une cellule de table.
+    """
+
+    def __init__(self, p: int = HLL_PRECISION, registers: Optional[np.ndarray] = None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    def __repr__(self) -> str:
+        return f"HyperLogLog(p={self.p}, count≈{self.count():.0f})"
+
+    def add_hashes(self, hashes: np.ndarray) -> "HyperLogLog":
+        if len(hashes):
+            idx, rank = _hll_positions(hashes, self.p)
+            np.maximum.at(self.registers, idx, rank)
+        return self
+
+    def update(self, values: pd.Series) -> "HyperLogLog":
+        # Valeurs dédoublonnées avant hachage : ajouter deux fois une valeur ne change pas les registres
+        return self.add_hashes(key_hashes(pd.Series(values.dropna().unique())))
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.p != self.p:
+            raise ValueError(f"❌ Précisions HyperLogLog différentes : {self.p} / {other.p}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> float:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / float(np.ldexp(1.0, -self.registers.astype(np.int32)).sum())
+        zeros = int((self.registers == 0).sum())
+        if estimate <= 2.5 * self.m and zeros:
+            return self.m * math.log(self.m / zeros)   # comptage linéaire (petites cardinalités)
+        return estimate
+
+    def to_dict(self) -> dict:
+        return {"p": self.p, "registers": base64.b64encode(self.registers.tobytes()).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "HyperLogLog":
+        registers = np.frombuffer(base64.b64decode(d["registers"]), dtype=np.uint8).copy()
+        return cls(d["p"], registers)
+
+    def encode(self) -> str:
+        return base64.b64encode(zlib.compress(self.registers.tobytes(), 1)).decode("ascii")
+
+    @classmethod
+    def decode(cls, text: str) -> "HyperLogLog":
+        registers = np.frombuffer(zlib.decompress(base64.b64decode(text)), dtype=np.uint8).copy()
+        return cls(len(registers).bit_length() - 1, registers)
+
+
+def grouped_hll(groups: np.ndarray, n_groups: int, hashes: np.ndarray, p: int = HLL_PRECISION) -> List[HyperLogLog]:
+    """Un HyperLogLog par groupe (groups : numéro de groupe de chaque hash), en une seule passe numpy."""
+    registers = np.zeros((n_groups, 1 << p), dtype=np.uint8)
+    if len(hashes):
+        idx, rank = _hll_positions(hashes, p)
+        np.maximum.at(registers, (groups, idx), rank)
+    return [HyperLogLog(p, registers[g]) for g in range(n_groups)]
+
+
+# ==============================
+# 🏆 Valeurs les plus fréquentes
+# ==============================
+
+class TopK:
+    """
+    Résumé Space-Saving fusionnable : au plus capacity compteurs {valeur: [compte, erreur]}.
+    floor majore le compte de toute valeur non suivie : une valeur absente d'un résumé y compte
+    pour floor à la fusion, et le compte réel d'une valeur suivie est dans [compte - erreur, compte].
+    """
+
+    def __init__(self, capacity: int = TOPK_CAPACITY, counters: Optional[Dict[str, list]] = None, floor: int = 0):
+        self.capacity = capacity
+        self.counters = counters or {}
+        self.floor = floor
+
+    def __repr__(self) -> str:
+        return f"TopK(capacity={self.capacity}, top={self.top(3)})"
+
+    def _truncate(self) -> "TopK":
+        if len(self.counters) > self.capacity:
+            ranked = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)
+            self.floor = max(self.floor, ranked[self.capacity][1][0])
+            self.counters = dict(ranked[:self.capacity])
+        return self
+
+    @classmethod
+    def from_counts(cls, counts: Iterable[Tuple[object, int]], capacity: int = TOPK_CAPACITY) -> "TopK":
+        """Résumé exact d'un chunk (counts : couples (valeur, compte))."""
+        return cls(capacity, {str(k): [int(n), 0] for k, n in counts if n > 0})._truncate()
+
+    def merge(self, other: "TopK") -> "TopK":
+        merged = {}
+        for key in self.counters.keys() | other.counters.keys():
+            mine = self.counters.get(key, [self.floor, self.floor])
+            theirs = other.counters.get(key, [other.floor, other.floor])
+            merged[key] = [mine[0] + theirs[0], mine[1] + theirs[1]]
+        self.counters = merged
+        self.floor += other.floor
+        return self._truncate()
+
+    def top(self, n: int = 10) -> List[Tuple[str, int]]:
+        ranked = sorted(self.counters.items(), key=lambda kv: (-kv[1][0], kv[0]))
+        return [(key, count) for key, (count, _) in ranked[:n]]
+
+    def encode(self) -> str:
+        return json.dumps({"capacity": self.capacity, "floor": self.floor, "counters": self.counters},
+                          separators=(",", ":"), ensure_ascii=False)
+
+    @classmethod
+    def decode(cls, text: str) -> "TopK":
+        d = json.loads(text)
+        return cls(d["capacity"], d["counters"], d["floor"])